@@ -1,6 +1,13 @@
 import os
+import threading
+from typing import Any, Callable, Optional
+
 import streamlit as st
 
+from cancellation import CancelToken
+from jobs import Job, get_job_queue
+from llm.fairness import INTERACTIVE, use_workload
+
 
 # Default session values
 DEFAULTS = {
@@ -19,6 +26,12 @@ DEFAULTS = {
     "writer_temp": 0.85,
     "judge_temp": 0.15,
     "judge_passes": 3,
+    "adaptive_passes": True,
+    "time_budget": 90,
+    "parallel_drafts": 1,
+    "fused_review": False,
+    "paragraph_refine": False,
+    "prejudge": True,
     "genre": "🐉 Adventure",
     "length": "medium",
     "animation_mode": None,
@@ -46,3 +59,46 @@ def get_api_key() -> str:
 
 def set_api_key(val: str):
     st.session_state["user_api_key"] = val.strip()
+
+
+def start_job(slot: str, work: Callable[[Job], Any], token: CancelToken, poll_interval: float = 1.0) -> Job:
+    """Queue ``work`` as this session's ``slot`` job ("story", "remix"), cancelling the one it replaces.
+
+    The job outlives script reruns; it is cancelled if the session
+    disconnects (tab closed or navigated away).
+    """
+    previous = current_job(slot)
+    if previous is not None:
+        previous.cancel("superseded by a newer request")
+    session_id = _session_id()
+    with use_workload(INTERACTIVE, session=session_id):
+        job = get_job_queue().submit(work, owner=session_id, token=token)
+    st.session_state[f"{slot}_job"] = job.id
+    if session_id is not None:
+        threading.Thread(target=_watch_session, args=(session_id, token, job.wait, poll_interval), daemon=True).start()
+    return job
+
+
+def current_job(slot: str) -> Optional[Job]:
+    job_id = st.session_state.get(f"{slot}_job")
+    return get_job_queue().get(job_id) if job_id else None
+
+
+def clear_job(slot: str) -> None:
+    st.session_state.pop(f"{slot}_job", None)
+
+
+def _session_id() -> Optional[str]:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+def _watch_session(session_id: str, token: CancelToken, finished: Callable[[float], bool], poll_interval: float):
+    from streamlit.runtime import Runtime
+
+    while not finished(poll_interval):
+        if Runtime.exists() and not Runtime.instance().is_active_session(session_id):
+            token.cancel("session closed")
+            return
@@ -32,6 +32,17 @@ section[data-testid="stSidebar"] { background-color: #261C15; border-right: 1px
     animation: float 6s ease-in-out infinite;
 }
 
+/* STREAMING PAGE PREVIEW */
+.page-preview {
+    background: #fdfbf7;
+    border: 8px solid #3e2b1f; border-left: 20px solid #2a1b15;
+    border-radius: 5px 15px 15px 5px;
+    padding: 30px 40px;
+    box-shadow: 0 20px 50px rgba(0,0,0,0.6);
+    color: #2b1c0f !important; font-size: 1.2rem; line-height: 1.6;
+}
+.page-preview.drop-cap::first-letter { font-family: 'Cinzel', serif; font-size: 3em; float: left; line-height: 0.8; margin-right: 0.1em; color: #8b6c42; }
+
 /* CUSTOM WIDGET STYLING */
 div[data-baseweb="select"] > div { background-color: rgba(0,0,0,0.3) !important; border-color: #8b6c42 !important; color: white !important; }
 .stTextArea textarea { background-color: rgba(0,0,0,0.3) !important; border: 1px solid #8b6c42 !important; color: #e8d5b0 !important; }
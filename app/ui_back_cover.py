@@ -32,6 +32,9 @@ def render_back_cover():
                     st.write(f"**Round {idx} {status} {score_text}:** {critique}")
             else:
                 st.write(f"**Judge's Feedback:** {st.session_state.story_data.get('judge_critique', 'No feedback available.')}")
+            degraded = st.session_state.story_data.get("degraded", [])
+            if degraded:
+                st.caption(f"To stay within the time budget we skipped: {', '.join(degraded)}.")
             st.write("**Themes:** Friendship, Courage, Whimsy")
 
         critique = st.text_area("Suggestion Box", placeholder="e.g. Make the ending happier...", label_visibility="collapsed")
@@ -1,8 +1,10 @@
 import streamlit as st
 import streamlit.components.v1 as components
+from cancellation import CancelToken
+from jobs import CANCELLED, FAILED, QueueFull
 from story_engine import StoryGenerator
 from app.audio import build_audio_block
-from app.state import get_api_key
+from app.state import clear_job, current_job, get_api_key, start_job
 from app.ui_desk import _split_text_into_pages
 
 
@@ -71,21 +73,19 @@ def render_book(audio_url: str, generate_audio_fn):
     components.html(book_html, height=650, scrolling=False)
 
     if anim_mode == "closing":
-        try:
+        if current_job("remix") is None:
             critique = st.session_state.get("remix_critique", "Make it better")
-            key = get_api_key()
-            sg = StoryGenerator(writer_temperature=st.session_state.writer_temp, api_key=key)
             current_full_story = st.session_state.story_data["content"]
-            new_version = sg.refine_story(current_full_story, critique)
-            st.session_state.story_data["content"] = new_version
-            st.session_state.pages = _split_text_into_pages(new_version)
-            st.session_state.current_page = 0
-            st.session_state.animation_mode = "opening"
-            st.rerun()
-        except Exception as e:
-            st.error(f"Remix failed: {e}")
-            st.session_state.animation_mode = None
-            st.rerun()
+            token = CancelToken()
+            sg = StoryGenerator(writer_temperature=st.session_state.writer_temp, api_key=get_api_key(), cancel_token=token)
+            try:
+                start_job("remix", lambda job: sg.refine_story(current_full_story, critique), token)
+            except QueueFull:
+                st.error("Remix failed: the storyteller is busy, please try again in a moment.")
+                st.session_state.animation_mode = None
+                return
+        _remix_progress()
+        return
     if anim_mode == "opening":
         st.session_state.animation_mode = None
         st.rerun()
@@ -134,6 +134,52 @@ def render_book(audio_url: str, generate_audio_fn):
     st.markdown(build_audio_block(audio_url, narrator_html, music_vol, version), unsafe_allow_html=True)
 
 
+@st.fragment(run_every=1.0)
+def _remix_progress():
+    job = current_job("remix")
+    if job is None:
+        return
+    if not job.done:
+        st.caption("🪄 Rewriting the story...")
+        return
+    clear_job("remix")
+    if job.status == CANCELLED:
+        st.session_state.animation_mode = None
+        return
+    if job.status == FAILED:
+        st.error(f"Remix failed: {job.error}")
+        st.session_state.animation_mode = None
+        st.rerun()
+    new_version = job.result
+    st.session_state.story_data["content"] = new_version
+    st.session_state.pages = _split_text_into_pages(new_version)
+    st.session_state.current_page = 0
+    st.session_state.animation_mode = "opening"
+    st.rerun()
+
+
+def first_page_preview(text: str, min_chars: int = 200):
+    """Return the opening page once enough streamed text exists to show it, else None."""
+    if len(text.strip()) < min_chars:
+        return None
+    return _split_text_into_pages(text)[0]
+
+
+def make_page_preview(container):
+    """Build an ``on_text`` callback that paints the first page into ``container`` while a story streams in."""
+    shown = {"page": None}
+
+    def update(text: str):
+        page = first_page_preview(text)
+        if page is None or page == shown["page"]:
+            return
+        shown["page"] = page
+        page_html = escape_html(page).replace("\n\n", "<br/><br/>")
+        container.markdown(f'<div class="page-preview drop-cap">{page_html}</div>', unsafe_allow_html=True)
+
+    return update
+
+
 def escape_html(s: str) -> str:
     return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
 
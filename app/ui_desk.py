@@ -1,7 +1,20 @@
 import os
 import streamlit as st
-from story_engine import StoryOrchestrator
-from app.state import get_api_key
+from cancellation import CancelToken
+from jobs import CANCELLED, FAILED, QueueFull, story_work
+from judge_stats import AdaptiveBudget, get_judge_stats
+from single_flight import get_single_flight
+from story_engine import (
+    DraftReady,
+    DraftRefined,
+    IllustrationPrompt,
+    ImageReady,
+    JudgeVerdict,
+    OutlineReady,
+    StoryOrchestrator,
+    suggest_prompts,
+)
+from app.state import clear_job, current_job, get_api_key, start_job
 
 
 def render_desk(audio_url: str):
@@ -36,47 +49,38 @@ def render_desk(audio_url: str):
                 st.warning("Please enter an API Key in the sidebar.")
                 return
 
-            with st.spinner("Summoning the muses..."):
-                engine = StoryOrchestrator(
-                    writer_temperature=st.session_state.writer_temp,
-                    judge_temperature=st.session_state.judge_temp,
-                    api_key=api_key,
-                )
-                try:
-                    result = engine.run(
-                        prompt.strip(),
-                        genre=st.session_state.genre,
-                        length=st.session_state.length.lower(),
-                        retries=max(0, st.session_state.judge_passes - 1),
-                    )
-                except Exception as e:
-                    st.error(f"Error: {e}")
-                    return
-
-            base_image = getattr(result, "image_url", None) or "https://placehold.co/600x600/2a1b15/e8d5b0/png?text=Story+Image"
-            feedback_history = [
-                {
-                    "approved": fb.approved,
-                    "critique": fb.critique,
-                    "score": fb.score,
-                }
-                for fb in getattr(result, "feedback_history", [])
-            ]
-            final_feedback = getattr(result, "feedback", None)
-            st.session_state.story_data = {
-                "title": "The Generated Tale",
-                "content": result.final_story,
-                "image_url": base_image,
-                "judge_critique": getattr(result, "judge_critique", "Approved"),
-                "judge_feedback": feedback_history,
-                "judge_score": getattr(final_feedback, "score", None),
-                "judge_iterations": getattr(result, "iterations", 0),
-            }
-            st.session_state.pages = _split_text_into_pages(result.final_story)
-            st.session_state.page_images = {i: base_image for i in range(len(st.session_state.pages))}
-            st.session_state.current_page = 0
-            st.session_state.view = "book"
-            st.rerun()
+            token = CancelToken()
+            engine = StoryOrchestrator(
+                writer_temperature=st.session_state.writer_temp,
+                judge_temperature=st.session_state.judge_temp,
+                api_key=api_key,
+                parallel_drafts=st.session_state.parallel_drafts,
+                early_illustration=True,
+                fused_review=st.session_state.fused_review,
+                paragraph_refine=st.session_state.paragraph_refine,
+                incremental_judging=st.session_state.paragraph_refine,
+                prejudge=st.session_state.prejudge,
+                converge=True,
+                adaptive_budget=AdaptiveBudget(get_judge_stats()) if st.session_state.adaptive_passes else None,
+                single_flight=get_single_flight(),
+                cancel_token=token,
+            )
+            work = story_work(
+                engine,
+                prompt.strip(),
+                genre=st.session_state.genre,
+                length=st.session_state.length.lower(),
+                retries=max(0, st.session_state.judge_passes - 1),
+                deadline=st.session_state.time_budget,
+            )
+            try:
+                start_job("story", work, token)
+            except QueueFull:
+                st.warning("The storyteller is busy with other stories. Please try again in a moment.")
+                return
+
+        if current_job("story") is not None:
+            _story_progress()
 
         st.markdown("<br><p style='text-align:center; opacity:0.7;'>— Or choose a story card —</p>", unsafe_allow_html=True)
         cols = st.columns(3)
@@ -91,27 +95,83 @@ def render_desk(audio_url: str):
             st.rerun()
 
 
+@st.fragment(run_every=1.0)
+def _story_progress():
+    """Polls this session's story job; the rest of the page stays responsive while it runs."""
+    from app.ui_book import make_page_preview
+
+    job = current_job("story")
+    if job is None:
+        return
+    if not job.done:
+        preview, progress = make_page_preview(st.empty()), st.empty()
+        progress.caption("🪶 Summoning the muses...")
+        for event in job.events():
+            _show_progress(event, preview, progress)
+        if job.partial:
+            preview(job.partial)
+        if st.button("✋ Stop", key="stop_story"):
+            job.cancel("stopped by the reader")
+        return
+    clear_job("story")
+    if job.status == CANCELLED:
+        return
+    if job.status == FAILED:
+        st.error(f"Error: {job.error}")
+        return
+    _open_book(job.result)
+    st.rerun()
+
+
+def _open_book(result):
+    base_image = getattr(result, "image_url", None) or "https://placehold.co/600x600/2a1b15/e8d5b0/png?text=Story+Image"
+    feedback_history = [
+        {
+            "approved": fb.approved,
+            "critique": fb.critique,
+            "score": fb.score,
+        }
+        for fb in getattr(result, "feedback_history", [])
+    ]
+    final_feedback = getattr(result, "feedback", None)
+    st.session_state.story_data = {
+        "title": "The Generated Tale",
+        "content": result.final_story,
+        "image_url": base_image,
+        "judge_critique": getattr(result, "judge_critique", "Approved"),
+        "judge_feedback": feedback_history,
+        "judge_score": getattr(final_feedback, "score", None),
+        "judge_iterations": getattr(result, "iterations", 0),
+        "degraded": getattr(result, "degraded", []),
+    }
+    st.session_state.pages = _split_text_into_pages(result.final_story)
+    st.session_state.page_images = {i: base_image for i in range(len(st.session_state.pages))}
+    st.session_state.current_page = 0
+    st.session_state.view = "book"
+
+
+def _show_progress(event, preview, progress):
+    if isinstance(event, (DraftReady, DraftRefined)):
+        preview(event.draft)
+    elif isinstance(event, OutlineReady):
+        progress.caption("📜 Outline ready, writing the first draft...")
+    elif isinstance(event, JudgeVerdict):
+        verdict = "approved the story" if event.feedback.approved else "asked for changes"
+        progress.caption(f"⚖️ Judge round {event.round + 1} {verdict} (score {event.feedback.score}/10)")
+    elif isinstance(event, IllustrationPrompt):
+        progress.caption("🎨 Painting the illustration...")
+    elif isinstance(event, ImageReady):
+        progress.caption("🖼️ Illustration ready, binding the book...")
+
+
 def _refresh_suggestions():
     if not get_api_key():
         st.warning("Need API Key for fresh ideas!")
         return
     try:
-        from openai import OpenAI
-
-        client = OpenAI(api_key=get_api_key())
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Return a JSON list of 3 short, whimsical children's story prompts."},
-                {"role": "user", "content": "Give me 3 new ideas."},
-            ],
-            temperature=0.9,
-        )
-        content = response.choices[0].message.content
-        if "[" in content:
-            import json
-
-            st.session_state.suggestions = json.loads(content[content.find("[") : content.rfind("]") + 1])
+        suggestions = suggest_prompts(get_api_key())
+        if suggestions:
+            st.session_state.suggestions = suggestions
     except Exception as e:
         st.error(f"Could not fetch ideas: {e}")
 
@@ -0,0 +1,115 @@
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, TextIO
+
+from story_engine import BatchOutcome, StoryJob, StoryOrchestrator, StoryResult
+
+
+def result_record(job_id: str, result: StoryResult) -> Dict[str, Any]:
+    return {"id": job_id, "status": "ok", **result.to_dict()}
+
+
+def error_record(job_id: str, request: str, error: BaseException) -> Dict[str, Any]:
+    return {"id": job_id, "status": "error", "request": request, "error": f"{type(error).__name__}: {error}"}
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids of jobs already written successfully to ``path``; failed jobs are retried on resume.
+
+    A line cut short by a crash is ignored, so that job simply runs again.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and record.get("status") == "ok":
+                done.add(str(record.get("id")))
+    return done
+
+
+class JsonlWriter:
+    """Appends one JSON object per line, flushed to disk before the next job is reported."""
+
+    def __init__(self, fh: TextIO, durable: bool = True):
+        self.fh = fh
+        self.durable = durable
+
+    @classmethod
+    def append(cls, path: str) -> "JsonlWriter":
+        fh = open(path, "a+", encoding="utf-8")
+        # Start on a fresh line if the previous run died mid-write.
+        if fh.tell() > 0:
+            fh.seek(fh.tell() - 1)
+            if fh.read(1) != "\n":
+                fh.write("\n")
+        return cls(fh)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.fh.flush()
+        if self.durable:
+            os.fsync(self.fh.fileno())
+
+    def close(self) -> None:
+        self.fh.close()
+
+
+def run_jsonl_batch(
+    lines: Iterable[str],
+    writer: JsonlWriter,
+    orchestrator: StoryOrchestrator,
+    concurrency: int = 4,
+    skip: Optional[Set[str]] = None,
+    defaults: Optional[Dict[str, Any]] = None,
+) -> Dict[str, int]:
+    """Generate a story per JSONL line, writing each record as soon as its job finishes.
+
+    A line is either a JSON object with ``request`` and optional ``genre``,
+    ``length``, ``retries`` and ``id`` (defaulting to the 1-based line
+    number), or a bare JSON string used as the request. Jobs whose id is in
+    ``skip`` are not run. Lines are read lazily, so stdin can be streamed.
+    Returns counts of ``ok``, ``error`` and ``skipped`` jobs.
+    """
+    skip = skip or set()
+    defaults = {k: v for k, v in (defaults or {}).items() if v is not None}
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    ids: List[str] = []
+
+    def jobs() -> Iterator[StoryJob]:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            job_id = str(number)
+            try:
+                raw = json.loads(line)
+                if isinstance(raw, str):
+                    raw = {"request": raw}
+                if not isinstance(raw, dict):
+                    raise ValueError("expected a JSON object or string")
+                job_id = str(raw.pop("id", job_id))
+                if job_id in skip:
+                    counts["skipped"] += 1
+                    continue
+                job = StoryJob.coerce({**defaults, **raw})
+            except (ValueError, TypeError) as exc:
+                writer.write(error_record(job_id, line.strip(), exc))
+                counts["error"] += 1
+                continue
+            ids.append(job_id)
+            yield job
+
+    for outcome in orchestrator.run_batch(jobs(), concurrency=concurrency):
+        writer.write(_record(ids[outcome.index], outcome))
+        counts["ok" if outcome.ok else "error"] += 1
+    return counts
+
+
+def _record(job_id: str, outcome: BatchOutcome) -> Dict[str, Any]:
+    if outcome.ok:
+        return result_record(job_id, outcome.result)
+    return error_record(job_id, outcome.job.request, outcome.error)
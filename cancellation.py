@@ -0,0 +1,122 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Cancelled(Exception):
+    """Raised inside a generation whose CancelToken was cancelled."""
+
+
+class CancelToken:
+    """Cooperative cancellation shared by every stage and call of one generation.
+
+    Work checks ``raise_if_cancelled()`` between steps; blocking calls made
+    through ``run``/``arun`` return control as soon as the token is cancelled,
+    and ``on_cancel`` callbacks let transports abort what is in flight
+    (closing a stream, cancelling a task).
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Register ``callback`` (run immediately if already cancelled); returns an unregister function."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def child(self) -> "CancelToken":
+        """A token cancelled together with this one, which can also be cancelled on its own."""
+        token = CancelToken()
+        unregister = self.on_cancel(lambda: token.cancel(self.reason))
+        token.on_cancel(unregister)
+        return token
+
+    def _discard(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def run(self, fn: Callable[[], T]) -> T:
+        """Run a blocking call, giving up on it (the result is discarded) once cancelled.
+
+        This only returns control to the caller; pass the token on to the call
+        itself (e.g. RateLimitScheduler.call) so it is not sent or retried.
+        """
+        self.raise_if_cancelled()
+        future: Future = Future()
+        context = contextvars.copy_context()
+
+        def call():
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(context.run(fn))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+        # One thread per call (as for hedged copies): abandoned calls must not use up a shared pool.
+        threading.Thread(target=call, name="cancellable", daemon=True).start()
+        done = threading.Event()
+        future.add_done_callback(lambda _: done.set())
+        unregister = self.on_cancel(done.set)
+        try:
+            done.wait()
+        finally:
+            unregister()
+        if not future.done():
+            raise Cancelled(self.reason)
+        return future.result()
+
+    async def arun(self, awaitable: Awaitable[T]) -> T:
+        """Await ``awaitable``, cancelling it (and aborting its HTTP request) once the token is cancelled."""
+        self.raise_if_cancelled()
+        task = asyncio.ensure_future(awaitable)
+        loop = asyncio.get_running_loop()
+        unregister = self.on_cancel(lambda: loop.call_soon_threadsafe(task.cancel))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if self.cancelled:
+                raise Cancelled(self.reason) from None
+            raise
+        finally:
+            unregister()
+
+
+def check(token: Optional[CancelToken]) -> None:
+    if token is not None:
+        token.raise_if_cancelled()
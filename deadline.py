@@ -0,0 +1,90 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Rough wall-clock seconds each stage takes at the p90; used to decide what still fits.
+STAGE_COSTS: Dict[str, float] = {
+    "outline": 6.0,
+    "story": 20.0,
+    "refine": 20.0,
+    "judge": 8.0,
+    "illustration": 4.0,
+    "image": 25.0,
+}
+
+# No API call finishes in less; with this little time left a call is not sent at all.
+MIN_CALL_SECONDS = 1.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised instead of sending a call that cannot finish before the run's deadline."""
+
+
+class Deadline:
+    """Wall-clock budget for one run, shared by every stage.
+
+    Stages ask ``affords(...)`` before optional work and call ``degrade(name)``
+    when they skip or lose it, so the result can say what was cut.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, costs: Optional[Dict[str, float]] = None, clock=time.monotonic):
+        self.seconds = seconds
+        self.costs = dict(STAGE_COSTS if costs is None else costs)
+        self._clock = clock
+        self._expires = math.inf if seconds is None else clock() + seconds
+        self._lock = threading.Lock()
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires - self._clock())
+
+    def affords(self, *stages: str) -> bool:
+        return self.remaining() >= sum(self.costs.get(stage, 0.0) for stage in stages)
+
+    def timeout(self, cap: float) -> float:
+        """Per-call timeout: ``cap``, shortened so the call cannot outlive the run."""
+        remaining = self.remaining()
+        if remaining < MIN_CALL_SECONDS:
+            raise DeadlineExceeded(f"only {remaining:.1f}s left of the run's {self.seconds}s deadline")
+        return min(cap, remaining)
+
+    def degrade(self, stage: str) -> None:
+        with self._lock:
+            if stage not in self.degraded:
+                self.degraded.append(stage)
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("run_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def use_deadline(deadline: Deadline) -> Iterator[Deadline]:
+    """Bound every API call made in this context (and stage threads started from it) by ``deadline``."""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def unbounded() -> Iterator[None]:
+    """Lift the bound for calls the run cannot return without (the outline and draft): late beats failed."""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def call_timeout(cap: float) -> float:
+    """``cap`` shortened to the current run's remaining time, if any."""
+    deadline = _current.get()
+    return cap if deadline is None else deadline.timeout(cap)
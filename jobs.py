@@ -0,0 +1,178 @@
+import contextvars
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from cancellation import Cancelled, CancelToken
+from story_engine import StoryDone, StoryOrchestrator, StoryResult, StoryText
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class QueueFull(RuntimeError):
+    """Raised by JobQueue.submit when ``max_pending`` jobs are already queued or running."""
+
+
+class Job:
+    """One unit of queued work. Status, progress and outcome can be read from any thread."""
+
+    def __init__(self, job_id: str, token: CancelToken, owner: Optional[Hashable], clock):
+        self.id = job_id
+        self.token = token
+        self.owner = owner
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        # Latest partial output (e.g. the streamed draft); replaced, not accumulated.
+        self.partial: Optional[str] = None
+        self.submitted = clock()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._clock = clock
+        self._events: List[Any] = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def publish(self, event: Any) -> None:
+        with self._lock:
+            self._events.append(event)
+
+    def events(self, since: int = 0) -> List[Any]:
+        """Events published so far, starting at index ``since`` (for incremental polling)."""
+        with self._lock:
+            return self._events[since:]
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        self.token.cancel(reason)
+
+    def _start(self) -> None:
+        self.status = RUNNING
+        self.started = self._clock()
+
+    def _finish(self, status: str, result: Any = None, error: Optional[BaseException] = None) -> None:
+        self.status, self.result, self.error = status, result, error
+        self.finished = self._clock()
+        self._done.set()
+
+
+class JobQueue:
+    """Bounded worker pool for long-running generations.
+
+    Work is decoupled from whoever submitted it: callers keep the job id,
+    poll ``get(id)`` (or ``Job.wait``) for status, progress and the result,
+    and may go away and come back. At most ``workers`` jobs run at once;
+    beyond ``max_pending`` unfinished jobs, ``submit`` raises QueueFull.
+    Finished jobs are forgotten ``retention`` seconds after they end.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 32, retention: float = 900.0, clock=time.monotonic):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.retention = retention
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="story-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self, work: Callable[[Job], Any], owner: Optional[Hashable] = None, token: Optional[CancelToken] = None
+    ) -> Job:
+        """Queue ``work(job)``; its return value becomes ``job.result``.
+
+        Pass the ``token`` the work already uses (e.g. an orchestrator's
+        cancel token) so ``Job.cancel`` reaches it.
+        """
+        with self._lock:
+            self._prune()
+            if sum(1 for j in self._jobs.values() if not j.done) >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} jobs already pending")
+            job = Job(uuid.uuid4().hex, token or CancelToken(), owner, self._clock)
+            self._jobs[job.id] = job
+        # Work runs in the submitter's context, so e.g. its llm.fairness workload applies.
+        self._pool.submit(contextvars.copy_context().run, self._run, job, work)
+        return job
+
+    def _run(self, job: Job, work: Callable[[Job], Any]) -> None:
+        if job.token.cancelled:
+            job._finish(CANCELLED, error=Cancelled(job.token.reason))
+            return
+        job._start()
+        try:
+            result = work(job)
+        except Cancelled as exc:
+            job._finish(CANCELLED, error=exc)
+        except Exception as exc:
+            job._finish(FAILED, error=exc)
+        else:
+            job._finish(DONE, result=result)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, owner: Optional[Hashable] = None) -> List[Job]:
+        with self._lock:
+            return [j for j in self._jobs.values() if owner is None or j.owner == owner]
+
+    def cancel_owner(self, owner: Hashable, reason: str = "cancelled") -> int:
+        """Cancel every unfinished job of ``owner``; returns how many were cancelled."""
+        pending = [j for j in self.jobs(owner) if not j.done]
+        for job in pending:
+            job.cancel(reason)
+        return len(pending)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        return {status: statuses.count(status) for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+
+    def shutdown(self, wait: bool = True) -> None:
+        for job in self.jobs():
+            if not job.done:
+                job.cancel("shutting down")
+        self._pool.shutdown(wait=wait)
+
+    def _prune(self) -> None:
+        cutoff = self._clock() - self.retention
+        for job_id in [i for i, j in self._jobs.items() if j.done and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+
+def story_work(engine: StoryOrchestrator, request: str, **run_kwargs) -> Callable[[Job], StoryResult]:
+    """Job work that runs ``engine.run_iter`` and publishes its stage events.
+
+    Streamed text goes to ``job.partial`` rather than the event list.
+    """
+
+    def work(job: Job) -> StoryResult:
+        for event in engine.run_iter(request, stream=True, **run_kwargs):
+            if isinstance(event, StoryDone):
+                return event.result
+            if isinstance(event, StoryText):
+                job.partial = event.text
+            else:
+                job.publish(event)
+        raise RuntimeError("story run ended without a result")
+
+    return work
+
+
+_job_queue = JobQueue(workers=int(os.getenv("STORY_WORKERS", "4")))
+
+
+def get_job_queue() -> JobQueue:
+    return _job_queue
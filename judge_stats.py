@@ -0,0 +1,205 @@
+import math
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+def temperature_band(temperature: float, width: float = 0.2) -> str:
+    low = math.floor(round(temperature / width, 6)) * width
+    return f"{low:.1f}-{low + width:.1f}"
+
+
+@dataclass
+class BucketStats:
+    runs: int = 0
+    first_pass: int = 0
+    approved: int = 0
+    refined: int = 0  # runs that needed at least one refine round
+    rescued: int = 0  # refined runs that ended approved
+    rescue_rounds: int = 0  # refine rounds spent by rescued runs
+    score_sum: float = 0.0
+    score_sq_sum: float = 0.0
+
+    @property
+    def first_pass_rate(self) -> float:
+        return self.first_pass / self.runs if self.runs else 0.0
+
+    @property
+    def rescue_rate(self) -> float:
+        return self.rescued / self.refined if self.refined else 0.0
+
+    @property
+    def mean_rescue_rounds(self) -> float:
+        return self.rescue_rounds / self.rescued if self.rescued else 0.0
+
+    @property
+    def mean_score(self) -> float:
+        return self.score_sum / self.runs if self.runs else 0.0
+
+    @property
+    def score_stddev(self) -> float:
+        if self.runs < 2:
+            return 0.0
+        mean = self.mean_score
+        return math.sqrt(max(0.0, self.score_sq_sum / self.runs - mean * mean))
+
+
+class JudgeStats:
+    """Per-(genre, length, writer temperature band) outcome counters, persisted in SQLite."""
+
+    _COLUMNS = ("runs", "first_pass", "approved", "refined", "rescued", "rescue_rounds", "score_sum", "score_sq_sum")
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS judge_stats ("
+            "genre TEXT NOT NULL, length TEXT NOT NULL, band TEXT NOT NULL, "
+            + ", ".join(f"{c} REAL NOT NULL DEFAULT 0" for c in self._COLUMNS)
+            + ", PRIMARY KEY (genre, length, band))"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(genre: Optional[str], length: Optional[str], temperature: float) -> Tuple[str, str, str]:
+        return genre or "", length or "", temperature_band(temperature)
+
+    def record(self, genre: Optional[str], length: Optional[str], temperature: float, result) -> None:
+        history = result.feedback_history or [result.feedback]
+        refined = result.iterations > 0
+        rescued = refined and result.feedback.approved
+        score = float(result.feedback.score)
+        deltas = (
+            1,
+            int(history[0].approved),
+            int(result.feedback.approved),
+            int(refined),
+            int(rescued),
+            result.iterations if rescued else 0,
+            score,
+            score * score,
+        )
+        key = self._key(genre, length, temperature)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO judge_stats (genre, length, band) VALUES (?, ?, ?)", key
+            )
+            assignments = ", ".join(f"{c} = {c} + ?" for c in self._COLUMNS)
+            self._conn.execute(
+                f"UPDATE judge_stats SET {assignments} WHERE genre = ? AND length = ? AND band = ?",
+                deltas + key,
+            )
+            self._conn.commit()
+
+    def get(self, genre: Optional[str], length: Optional[str], temperature: float) -> BucketStats:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM judge_stats WHERE genre = ? AND length = ? AND band = ?",
+                self._key(genre, length, temperature),
+            ).fetchone()
+        if row is None:
+            return BucketStats()
+        values = dict(zip(self._COLUMNS, row))
+        return BucketStats(**{k: (v if k.startswith("score") else int(v)) for k, v in values.items()})
+
+
+@dataclass
+class JudgePlan:
+    retries: int
+    judge_temperature: float
+    reason: str
+    # Lowest score the judge may approve this run; None leaves approval to the judge alone.
+    min_score: Optional[int] = None
+
+
+class AdaptiveBudget:
+    """Picks the refine budget and judge strictness from historical outcomes.
+
+    Operators set the bounds; inside them, rounds are only budgeted where
+    past refinements actually turned rejections into approvals, and the
+    judge is made more deterministic when its scores have been noisy. Where
+    the judge approves nearly every first draft (at least ``lenient_rate``
+    of them), it is held to an approval bar: drafts scoring below the
+    bucket's mean (capped at ``max_min_score``) are rejected. A
+    bucket whose budget was cut to zero still refines one round every
+    ``explore_every`` runs, so a verdict drawn from a few early runs can
+    be revised as evidence comes in.
+    """
+
+    def __init__(
+        self,
+        stats: JudgeStats,
+        min_retries: int = 0,
+        max_retries: int = 4,
+        min_judge_temperature: float = 0.0,
+        max_judge_temperature: float = 0.4,
+        min_samples: int = 5,
+        explore_every: int = 10,
+        lenient_rate: float = 0.8,
+        max_min_score: int = 8,
+    ):
+        self.stats = stats
+        self.min_retries = min_retries
+        self.max_retries = max_retries
+        self.min_judge_temperature = min_judge_temperature
+        self.max_judge_temperature = max_judge_temperature
+        self.min_samples = min_samples
+        self.explore_every = explore_every
+        self.lenient_rate = lenient_rate
+        self.max_min_score = max_min_score
+
+    def plan(
+        self,
+        genre: Optional[str],
+        length: Optional[str],
+        writer_temperature: float,
+        requested_retries: int,
+        judge_temperature: float,
+    ) -> JudgePlan:
+        ceiling = max(self.min_retries, min(self.max_retries, requested_retries))
+        temp = min(self.max_judge_temperature, max(self.min_judge_temperature, judge_temperature))
+        bucket = self.stats.get(genre, length, writer_temperature)
+        if bucket.runs < self.min_samples:
+            return JudgePlan(ceiling, temp, f"only {bucket.runs} past runs; using requested budget")
+
+        if bucket.refined and bucket.rescue_rate < 0.2:
+            retries = self.min_retries
+            reason = f"refinement rescued only {bucket.rescue_rate:.0%} of rejected drafts"
+        elif bucket.rescued:
+            retries = math.ceil(bucket.mean_rescue_rounds + 0.5)
+            reason = f"rescued drafts needed {bucket.mean_rescue_rounds:.1f} rounds on average"
+        else:
+            retries = ceiling
+            reason = f"first-pass approval {bucket.first_pass_rate:.0%}; no rescue data yet"
+        retries = max(self.min_retries, min(ceiling, retries))
+        if retries == 0 and ceiling > 0 and self.explore_every and bucket.runs % self.explore_every == 0:
+            retries = 1
+            reason += "; exploring one round"
+
+        if bucket.score_stddev > 2.0:
+            temp = self.min_judge_temperature
+            reason += f"; judge scores noisy (sd {bucket.score_stddev:.1f}), pinning temperature"
+        min_score = None
+        if bucket.first_pass_rate >= self.lenient_rate and bucket.mean_score >= 1:
+            min_score = min(self.max_min_score, math.floor(bucket.mean_score))
+            reason += f"; judge passed {bucket.first_pass_rate:.0%} of first drafts, approving only scores >= {min_score}"
+        return JudgePlan(retries, temp, reason, min_score)
+
+    def record(self, genre: Optional[str], length: Optional[str], writer_temperature: float, result) -> None:
+        self.stats.record(genre, length, writer_temperature, result)
+
+
+_default_stats: Optional[JudgeStats] = None
+_default_lock = threading.Lock()
+
+
+def get_judge_stats() -> JudgeStats:
+    """Process-wide stats store; persisted to JUDGE_STATS_PATH when set."""
+    global _default_stats
+    with _default_lock:
+        if _default_stats is None:
+            _default_stats = JudgeStats(os.getenv("JUDGE_STATS_PATH", ":memory:"))
+        return _default_stats
@@ -0,0 +1 @@
+# Shared OpenAI transport helpers used by story_engine and the Streamlit UI.
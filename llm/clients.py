@@ -0,0 +1,177 @@
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+try:
+    import httpx
+except ImportError:  # newer SDK releases ship their transport as httpx2
+    import httpx2 as httpx
+
+
+def _env_number(name: str, default, cast=float):
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return cast(raw)
+    except ValueError:
+        return default
+
+
+@dataclass
+class PoolConfig:
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    idle_ttl: float = 600.0
+    timeout: float = 60.0
+    # Retries are owned by llm.ratelimit so backoff is coordinated across callers.
+    max_retries: int = 0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        return cls(
+            max_connections=_env_number("OPENAI_POOL_MAX_CONNECTIONS", cls.max_connections, int),
+            max_keepalive_connections=_env_number("OPENAI_POOL_MAX_KEEPALIVE", cls.max_keepalive_connections, int),
+            keepalive_expiry=_env_number("OPENAI_POOL_KEEPALIVE_EXPIRY", cls.keepalive_expiry),
+            idle_ttl=_env_number("OPENAI_POOL_IDLE_TTL", cls.idle_ttl),
+            timeout=_env_number("OPENAI_TIMEOUT", cls.timeout),
+            max_retries=_env_number("OPENAI_MAX_RETRIES", cls.max_retries, int),
+        )
+
+    def limits(self) -> "httpx.Limits":
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+@dataclass
+class _Entry:
+    client: object
+    last_used: float
+    loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+class ClientRegistry:
+    """Process-wide pool of OpenAI clients, one per API key.
+
+    Each client owns a keep-alive HTTP connection pool, so reusing it across
+    calls skips the TLS handshake that a fresh ``OpenAI(...)`` would pay.
+    Clients unused for ``config.idle_ttl`` seconds are closed and dropped.
+    Async clients are additionally keyed by event loop, since their
+    connections cannot be shared between loops.
+    """
+
+    def __init__(self, config: Optional[PoolConfig] = None, clock=time.monotonic):
+        self.config = config or PoolConfig.from_env()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._clients: Dict[Hashable, _Entry] = {}
+
+    def get(self, api_key: str) -> OpenAI:
+        return self._get(api_key, lambda: self._build(api_key))
+
+    def get_async(self, api_key: str) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        return self._get((api_key, id(loop)), lambda: self._build_async(api_key), loop=loop)
+
+    def _get(self, key: Hashable, factory, loop=None):
+        now = self._clock()
+        with self._lock:
+            self._evict_idle_locked(now)
+            entry = self._clients.get(key)
+            if entry is None:
+                entry = _Entry(client=factory(), last_used=now, loop=loop)
+                self._clients[key] = entry
+            entry.last_used = now
+            return entry.client
+
+    def _build(self, api_key: str) -> OpenAI:
+        cfg = self.config
+        http_client = DefaultHttpxClient(limits=cfg.limits(), timeout=cfg.timeout)
+        return OpenAI(api_key=api_key, http_client=http_client, max_retries=cfg.max_retries)
+
+    def _build_async(self, api_key: str) -> AsyncOpenAI:
+        cfg = self.config
+        http_client = DefaultAsyncHttpxClient(limits=cfg.limits(), timeout=cfg.timeout)
+        return AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=cfg.max_retries)
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            return self._evict_idle_locked(self._clock())
+
+    def _evict_idle_locked(self, now: float) -> int:
+        stale = [
+            key
+            for key, entry in self._clients.items()
+            if now - entry.last_used > self.config.idle_ttl or (entry.loop is not None and entry.loop.is_closed())
+        ]
+        for key in stale:
+            _close_quietly(self._clients.pop(key))
+        return len(stale)
+
+    def configure(self, config: PoolConfig):
+        """Swap pool settings; existing clients are closed so new limits apply."""
+        with self._lock:
+            self.config = config
+            self._close_all_locked()
+
+    def close(self):
+        with self._lock:
+            self._close_all_locked()
+
+    def _close_all_locked(self):
+        for entry in self._clients.values():
+            _close_quietly(entry)
+        self._clients.clear()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+def _close_quietly(entry: _Entry):
+    try:
+        result = entry.client.close()
+        if asyncio.iscoroutine(result):
+            loop = entry.loop
+            if loop is not None and not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(result, loop)
+            else:
+                result.close()
+    except Exception:
+        pass
+
+
+_registry = ClientRegistry()
+
+
+def resolve_api_key(api_key: Optional[str] = None) -> str:
+    key = (api_key or os.getenv("OPENAI_API_KEY") or "").strip()
+    if not key:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    return key
+
+
+def get_client(api_key: Optional[str] = None) -> OpenAI:
+    return _registry.get(resolve_api_key(api_key))
+
+
+def get_async_client(api_key: Optional[str] = None) -> AsyncOpenAI:
+    return _registry.get_async(resolve_api_key(api_key))
+
+
+def get_registry() -> ClientRegistry:
+    return _registry
+
+
+def configure_pool(**overrides) -> PoolConfig:
+    config = PoolConfig(**{**_registry.config.__dict__, **overrides})
+    _registry.configure(config)
+    return config
@@ -0,0 +1,251 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from cancellation import Cancelled, CancelToken
+
+INTERACTIVE = "interactive"
+PREFETCH = "prefetch"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, PREFETCH, BATCH)
+
+
+@dataclass(frozen=True)
+class Workload:
+    """Who an API call is made for: its priority class and (optionally) the user session."""
+
+    priority: str = INTERACTIVE
+    session: Optional[str] = None
+
+
+_current: contextvars.ContextVar[Workload] = contextvars.ContextVar("llm_workload", default=Workload())
+
+
+def current_workload() -> Workload:
+    return _current.get()
+
+
+@contextmanager
+def use_workload(priority: Optional[str] = None, session: Optional[str] = None) -> Iterator[Workload]:
+    """Attribute API calls made in this context (and stage threads started from it) to a workload.
+
+    Omitted fields are inherited, and a nested scope can lower the priority
+    but never raise it, so speculative work inside a batch job stays batch.
+    """
+    outer = _current.get()
+    if priority is not None and priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}; expected one of {PRIORITIES}")
+    rank = max(PRIORITIES.index(outer.priority), PRIORITIES.index(priority or outer.priority))
+    workload = Workload(priority=PRIORITIES[rank], session=session if session is not None else outer.session)
+    token = _current.set(workload)
+    try:
+        yield workload
+    finally:
+        _current.reset(token)
+
+
+def workload_context(priority: Optional[str] = None, session: Optional[str] = None) -> contextvars.Context:
+    """A copy of the current context under ``use_workload(priority, session)``, for handing work to a pool."""
+    with use_workload(priority, session):
+        return contextvars.copy_context()
+
+
+@dataclass
+class FairnessPolicy:
+    # In-flight API calls allowed per API key.
+    max_concurrent: int = 16
+    # Weighted fair queueing weights: when classes compete, each gets slots in proportion to its weight.
+    weights: Dict[str, float] = field(default_factory=lambda: {INTERACTIVE: 8.0, PREFETCH: 2.0, BATCH: 1.0})
+    # Largest share of max_concurrent a class may hold, leaving headroom for interactive calls.
+    shares: Dict[str, float] = field(default_factory=lambda: {INTERACTIVE: 1.0, PREFETCH: 0.75, BATCH: 0.75})
+    # In-flight calls allowed per session (0 = unlimited), so one heavy user cannot take every slot.
+    session_limit: int = 4
+
+    def class_limit(self, priority: str) -> int:
+        return max(1, int(self.max_concurrent * self.shares.get(priority, 1.0)))
+
+
+@dataclass
+class _Waiter:
+    workload: Workload
+    start: float
+    finish: float
+    seq: int
+    grant: Callable[[], None]
+    granted: bool = False
+
+
+class _KeyState:
+    def __init__(self):
+        self.in_flight = 0
+        self.by_class: Dict[str, int] = {}
+        self.by_session: Dict[str, int] = {}
+        self.waiting: List[_Waiter] = []
+        self.finish_tags: Dict[Tuple[str, Optional[str]], float] = {}
+        self.virtual = 0.0
+
+
+class FairScheduler:
+    """Admission control in front of API calls, per API key.
+
+    Calls beyond the key's concurrency quota wait in a weighted fair queue:
+    each (priority class, session) flow gets a share of freed slots in
+    proportion to its class weight (start-time fair queueing, with cost in
+    estimated tokens), so a large batch cannot starve interactive requests
+    and one session cannot starve the others. Per-class and per-session
+    quotas are enforced when a slot is granted; a waiter blocked by its quota
+    does not hold up the others.
+    """
+
+    def __init__(self, policy: Optional[FairnessPolicy] = None, clock=time.monotonic):
+        self.policy = policy or FairnessPolicy()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._keys: Dict[str, _KeyState] = {}
+        self._seq = 0
+
+    @contextmanager
+    def slot(
+        self,
+        api_key: str,
+        cost: float = 1.0,
+        workload: Optional[Workload] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> Iterator[float]:
+        """Hold one in-flight slot for the block; yields the seconds spent queueing.
+
+        Cancelling ``cancel`` while queued leaves the queue and raises Cancelled.
+        """
+        granted = threading.Event()
+        started = self._clock()
+        waiter = self._enqueue(api_key, workload or current_workload(), cost, granted.set)
+        unregister = cancel.on_cancel(granted.set) if cancel is not None else None
+        try:
+            granted.wait()
+        finally:
+            if unregister:
+                unregister()
+        if cancel is not None and cancel.cancelled:
+            self._abandon(api_key, waiter)
+            raise Cancelled(cancel.reason)
+        try:
+            yield self._clock() - started
+        finally:
+            self._release(api_key, waiter)
+
+    @asynccontextmanager
+    async def aslot(self, api_key: str, cost: float = 1.0, workload: Optional[Workload] = None) -> AsyncIterator[float]:
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        started = self._clock()
+        waiter = self._enqueue(
+            api_key, workload or current_workload(), cost, lambda: loop.call_soon_threadsafe(_resolve, granted)
+        )
+        try:
+            await granted
+        except asyncio.CancelledError:
+            self._abandon(api_key, waiter)
+            raise
+        try:
+            yield self._clock() - started
+        finally:
+            self._release(api_key, waiter)
+
+    def stats(self, api_key: str) -> Dict[str, object]:
+        with self._lock:
+            state = self._keys.get(api_key) or _KeyState()
+            return {
+                "in_flight": state.in_flight,
+                "waiting": len(state.waiting),
+                "by_class": dict(state.by_class),
+                "waiting_by_class": {
+                    p: sum(1 for w in state.waiting if w.workload.priority == p) for p in PRIORITIES
+                },
+            }
+
+    def _enqueue(self, api_key: str, workload: Workload, cost: float, grant: Callable[[], None]) -> _Waiter:
+        weight = self.policy.weights.get(workload.priority, 1.0)
+        with self._lock:
+            state = self._keys.setdefault(api_key, _KeyState())
+            flow = (workload.priority, workload.session)
+            start = max(state.virtual, state.finish_tags.get(flow, 0.0))
+            finish = start + max(cost, 1.0) / weight
+            state.finish_tags[flow] = finish
+            self._seq += 1
+            waiter = _Waiter(workload, start, finish, self._seq, grant)
+            state.waiting.append(waiter)
+            granted = self._dispatch(state)
+        for w in granted:
+            w.grant()
+        return waiter
+
+    def _release(self, api_key: str, waiter: _Waiter) -> None:
+        with self._lock:
+            state = self._keys[api_key]
+            state.in_flight -= 1
+            _adjust(state.by_class, waiter.workload.priority, -1)
+            if waiter.workload.session is not None:
+                _adjust(state.by_session, waiter.workload.session, -1)
+            granted = self._dispatch(state)
+        for w in granted:
+            w.grant()
+
+    def _abandon(self, api_key: str, waiter: _Waiter) -> None:
+        with self._lock:
+            state = self._keys[api_key]
+            if not waiter.granted:
+                state.waiting.remove(waiter)
+                return
+        self._release(api_key, waiter)
+
+    def _dispatch(self, state: _KeyState) -> List[_Waiter]:
+        """Grant free slots to eligible waiters in finish-tag order; call with the lock held."""
+        granted = []
+        while state.in_flight < self.policy.max_concurrent:
+            eligible = [w for w in state.waiting if self._admissible(state, w.workload)]
+            if not eligible:
+                break
+            waiter = min(eligible, key=lambda w: (w.finish, w.seq))
+            state.waiting.remove(waiter)
+            waiter.granted = True
+            state.virtual = max(state.virtual, waiter.start)
+            state.in_flight += 1
+            _adjust(state.by_class, waiter.workload.priority, 1)
+            if waiter.workload.session is not None:
+                _adjust(state.by_session, waiter.workload.session, 1)
+            granted.append(waiter)
+        if not state.waiting and state.in_flight == 0:
+            # Idle: old finish tags no longer matter, so drop them instead of growing forever.
+            state.finish_tags.clear()
+        return granted
+
+    def _admissible(self, state: _KeyState, workload: Workload) -> bool:
+        if state.by_class.get(workload.priority, 0) >= self.policy.class_limit(workload.priority):
+            return False
+        limit = self.policy.session_limit
+        return not (limit and workload.session is not None and state.by_session.get(workload.session, 0) >= limit)
+
+
+def _adjust(counts: Dict[str, int], key: str, delta: int) -> None:
+    counts[key] = counts.get(key, 0) + delta
+    if counts[key] <= 0:
+        del counts[key]
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def policy_from_env() -> FairnessPolicy:
+    policy = FairnessPolicy()
+    policy.max_concurrent = int(os.getenv("LLM_MAX_CONCURRENT", policy.max_concurrent))
+    policy.session_limit = int(os.getenv("LLM_SESSION_CONCURRENCY", policy.session_limit))
+    if os.getenv("LLM_BATCH_SHARE"):
+        policy.shares[BATCH] = float(os.environ["LLM_BATCH_SHARE"])
+    return policy
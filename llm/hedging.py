@@ -0,0 +1,172 @@
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from cancellation import CancelToken
+
+T = TypeVar("T")
+
+
+@dataclass
+class HedgePolicy:
+    percentile: float = 0.95
+    window: int = 100
+    min_samples: int = 20
+    # Never hedge sooner than this, however fast the stage usually is.
+    min_delay: float = 0.5
+    # Hedges allowed per call on average, plus a small burst allowance.
+    budget: float = 0.05
+    burst: float = 3.0
+
+
+class Hedger:
+    """Issues a duplicate request once a call outlives the stage's recent pN latency.
+
+    The first response wins and the other is cancelled: an async task is
+    cancelled outright; a sync copy has its token cancelled, so it stops
+    queueing or retrying (a request already on the wire is abandoned). Sync
+    copies each get their own thread, so hedging never caps how many calls
+    are in flight. Every call earns ``budget`` hedge credit and each hedge
+    spends one, so duplicates stay a bounded share of load.
+    """
+
+    def __init__(self, policy: Optional[HedgePolicy] = None, enabled: bool = False, clock=time.monotonic):
+        self.policy = policy or HedgePolicy()
+        self.enabled = enabled
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.policy.window))
+        self._credit = self.policy.burst
+        self.hedged = 0
+
+    def configure(self, enabled: Optional[bool] = None, **overrides) -> None:
+        with self._lock:
+            if enabled is not None:
+                self.enabled = enabled
+            for name, value in overrides.items():
+                setattr(self.policy, name, value)
+
+    def delay_for(self, stage: Optional[str]) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there are too few samples."""
+        with self._lock:
+            samples = sorted(self._latencies[stage or ""])
+        if len(samples) < self.policy.min_samples:
+            return None
+        index = min(len(samples) - 1, math.ceil(self.policy.percentile * len(samples)) - 1)
+        return max(self.policy.min_delay, samples[index])
+
+    def observe(self, stage: Optional[str], elapsed: float) -> None:
+        with self._lock:
+            self._latencies[stage or ""].append(elapsed)
+
+    def _earn(self) -> None:
+        with self._lock:
+            self._credit = min(self.policy.burst, self._credit + self.policy.budget)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0:
+                return False
+            self._credit -= 1.0
+            self.hedged += 1
+            return True
+
+    def call(
+        self, stage: Optional[str], fn: Callable[[Optional[CancelToken]], T], cancel: Optional[CancelToken] = None
+    ) -> T:
+        """``fn(token)`` sends one copy and should give up once ``token`` is cancelled.
+
+        Each copy gets a child of ``cancel``, cancelled when the other copy wins.
+        """
+        self._earn()
+        delay = self.delay_for(stage)
+        if delay is None:
+            return self._timed(stage, lambda: fn(cancel))
+        started = self._clock()
+        tokens: List[CancelToken] = []
+        pending = {self._spawn(fn, cancel, tokens)}
+        try:
+            done, _ = wait(pending, timeout=delay)
+            if not done and self._spend():
+                pending.add(self._spawn(fn, cancel, tokens))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        self.observe(stage, self._clock() - started)
+                        return future.result()
+                    error = error or future.exception()
+            raise error
+        finally:
+            for token in tokens:
+                token.cancel("hedge lost")
+
+    @staticmethod
+    def _spawn(fn: Callable[[Optional[CancelToken]], T], cancel: Optional[CancelToken], tokens: List[CancelToken]):
+        token = cancel.child() if cancel is not None else CancelToken()
+        tokens.append(token)
+        future: Future = Future()
+        context = contextvars.copy_context()
+
+        def run():
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(context.run(fn, token))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+        threading.Thread(target=run, name="hedge", daemon=True).start()
+        return future
+
+    async def acall(self, stage: Optional[str], fn: Callable[[], Awaitable[T]]) -> T:
+        self._earn()
+        delay = self.delay_for(stage)
+        if delay is None:
+            started = self._clock()
+            result = await fn()
+            self.observe(stage, self._clock() - started)
+            return result
+        started = self._clock()
+        pending = {asyncio.ensure_future(fn())}
+        error: Optional[BaseException] = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and self._spend():
+                pending.add(asyncio.ensure_future(fn()))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.observe(stage, self._clock() - started)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _timed(self, stage: Optional[str], fn: Callable[[], T]) -> T:
+        started = self._clock()
+        result = fn()
+        self.observe(stage, self._clock() - started)
+        return result
+
+
+_hedger = Hedger(enabled=os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes"))
+
+
+def get_hedger() -> Hedger:
+    return _hedger
+
+
+def configure_hedging(enabled: Optional[bool] = None, **overrides) -> Hedger:
+    _hedger.configure(enabled, **overrides)
+    return _hedger
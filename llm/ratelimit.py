@@ -0,0 +1,250 @@
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import openai
+
+from cancellation import Cancelled, CancelToken, check
+from deadline import current_deadline
+from llm.fairness import FairScheduler, policy_from_env
+
+T = TypeVar("T")
+
+
+@dataclass
+class EndpointLimits:
+    requests_per_minute: float
+    tokens_per_minute: Optional[float] = None
+
+
+# Conservative defaults; raise them to match your account tier with configure_limits().
+DEFAULT_LIMITS: Dict[str, EndpointLimits] = {
+    "chat": EndpointLimits(requests_per_minute=500, tokens_per_minute=60_000),
+    "images": EndpointLimits(requests_per_minute=5),
+    "speech": EndpointLimits(requests_per_minute=50),
+}
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 6
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def backoff(self, attempt: int) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(ceiling / 2, ceiling)
+
+
+class TokenBucket:
+    """Reservation-style bucket: callers take capacity up front and are told how long to wait.
+
+    Letting the balance go negative queues callers in arrival order instead
+    of having them spin and race for refills.
+    """
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+@dataclass
+class CallStats:
+    """Filled in by RateLimitScheduler.call: time spent waiting for budget or backoff, and retries."""
+
+    queue_wait: float = 0.0
+    retries: int = 0
+
+
+class _Budget:
+    def __init__(self, limits: EndpointLimits, clock):
+        self.requests = TokenBucket(limits.requests_per_minute, clock)
+        self.tokens = TokenBucket(limits.tokens_per_minute, clock) if limits.tokens_per_minute else None
+        self.blocked_until = 0.0
+
+
+class RateLimitScheduler:
+    """Keeps each (API key, endpoint) pair under its RPM/TPM budget and retries throttled calls.
+
+    Over-budget calls wait their turn instead of failing. A 429 pauses every
+    caller sharing that key and endpoint for the server's Retry-After. With
+    ``fairness``, calls first wait for an in-flight slot in its weighted fair
+    queue (priority classes, per-session shares, concurrency quotas). A
+    cancelled ``cancel`` token ends every wait at once, and the request is
+    not sent (or retried) after that.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, EndpointLimits]] = None, retry: Optional[RetryPolicy] = None,
+                 clock=time.monotonic, sleep=time.sleep, fairness: Optional[FairScheduler] = None):
+        self.fairness = fairness
+        self.limits = dict(limits or DEFAULT_LIMITS)
+        self.retry = retry or RetryPolicy()
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._budgets: Dict[Tuple[str, str], _Budget] = {}
+
+    def configure_limits(self, endpoint: str, requests_per_minute: float, tokens_per_minute: Optional[float] = None):
+        with self._lock:
+            self.limits[endpoint] = EndpointLimits(requests_per_minute, tokens_per_minute)
+            for key in [k for k in self._budgets if k[1] == endpoint]:
+                del self._budgets[key]
+
+    def _budget(self, api_key: str, endpoint: str) -> _Budget:
+        with self._lock:
+            budget = self._budgets.get((api_key, endpoint))
+            if budget is None:
+                limits = self.limits.get(endpoint) or self.limits["chat"]
+                budget = self._budgets[(api_key, endpoint)] = _Budget(limits, self._clock)
+            return budget
+
+    def reserve(self, api_key: str, endpoint: str, tokens: int = 0) -> float:
+        """Claim one request (and ``tokens``) from the budget; returns seconds to wait first."""
+        budget = self._budget(api_key, endpoint)
+        delay = budget.requests.reserve(1)
+        if budget.tokens is not None and tokens:
+            delay = max(delay, budget.tokens.reserve(tokens))
+        return max(delay, budget.blocked_until - self._clock())
+
+    def _throttled(self, api_key: str, endpoint: str, exc: Exception, attempt: int) -> Optional[float]:
+        if not _is_retryable(exc) or attempt + 1 >= self.retry.max_attempts:
+            return None
+        delay = _retry_after(exc)
+        if delay is None:
+            delay = self.retry.backoff(attempt)
+        deadline = current_deadline()
+        if deadline is not None and delay >= deadline.remaining():
+            return None  # the retry could not finish inside the run's deadline
+        if isinstance(exc, openai.RateLimitError):
+            budget = self._budget(api_key, endpoint)
+            budget.blocked_until = max(budget.blocked_until, self._clock() + delay)
+        return delay
+
+    def call(
+        self,
+        endpoint: str,
+        api_key: str,
+        fn: Callable[[], T],
+        tokens: int = 0,
+        stats: Optional[CallStats] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> T:
+        stats = stats if stats is not None else CallStats()
+        if self.fairness is None:
+            return self._call(endpoint, api_key, fn, tokens, stats, cancel)
+        with self.fairness.slot(api_key, cost=tokens, cancel=cancel) as waited:
+            stats.queue_wait += waited
+            return self._call(endpoint, api_key, fn, tokens, stats, cancel)
+
+    def _call(
+        self, endpoint: str, api_key: str, fn: Callable[[], T], tokens: int, stats: CallStats, cancel: Optional[CancelToken]
+    ) -> T:
+        attempt = 0
+        while True:
+            wait_for = self.reserve(api_key, endpoint, tokens)
+            if wait_for > 0:
+                stats.queue_wait += wait_for
+                self._pause(wait_for, cancel)
+            check(cancel)
+            try:
+                return fn()
+            except Exception as exc:
+                check(cancel)
+                delay = self._throttled(api_key, endpoint, exc, attempt)
+                if delay is None:
+                    raise
+                stats.queue_wait += delay
+                self._pause(delay, cancel)
+                attempt += 1
+                stats.retries = attempt
+
+    def _pause(self, seconds: float, cancel: Optional[CancelToken]) -> None:
+        if cancel is None:
+            self._sleep(seconds)
+        elif cancel.wait(seconds):
+            raise Cancelled(cancel.reason)
+
+    async def acall(
+        self,
+        endpoint: str,
+        api_key: str,
+        fn: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+        stats: Optional[CallStats] = None,
+    ) -> T:
+        stats = stats if stats is not None else CallStats()
+        if self.fairness is None:
+            return await self._acall(endpoint, api_key, fn, tokens, stats)
+        async with self.fairness.aslot(api_key, cost=tokens) as waited:
+            stats.queue_wait += waited
+            return await self._acall(endpoint, api_key, fn, tokens, stats)
+
+    async def _acall(
+        self, endpoint: str, api_key: str, fn: Callable[[], Awaitable[T]], tokens: int, stats: CallStats
+    ) -> T:
+        attempt = 0
+        while True:
+            wait_for = self.reserve(api_key, endpoint, tokens)
+            if wait_for > 0:
+                stats.queue_wait += wait_for
+                await asyncio.sleep(wait_for)
+            try:
+                return await fn()
+            except Exception as exc:
+                delay = self._throttled(api_key, endpoint, exc, attempt)
+                if delay is None:
+                    raise
+                stats.queue_wait += delay
+                await asyncio.sleep(delay)
+                attempt += 1
+                stats.retries = attempt
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        raw = headers.get(name)
+        if raw is None:
+            continue
+        try:
+            return max(0.0, float(raw) * scale)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def estimate_tokens(messages, max_tokens: int = 0) -> int:
+    # ~4 characters per token is close enough for budgeting purposes.
+    chars = sum(len(str(m.get("content") or "")) for m in messages)
+    return chars // 4 + max_tokens
+
+
+_scheduler = RateLimitScheduler(fairness=FairScheduler(policy_from_env()))
+
+
+def get_scheduler() -> RateLimitScheduler:
+    return _scheduler
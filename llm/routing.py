@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import openai
+
+T = TypeVar("T")
+
+FAST_MODEL = "gpt-4o-mini"
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+
+@dataclass
+class Route:
+    model: str
+    timeout: float = 60.0
+    # Calls slower than this (seconds) send the stage to ``fallback`` for a cooldown.
+    slo: Optional[float] = None
+    fallback: Optional[str] = None
+
+
+# Light stages run on the fast tier; the prose stages fall back to it when slow.
+DEFAULT_ROUTES: Dict[str, Route] = {
+    "outline": Route(FAST_MODEL, timeout=20.0, slo=8.0),
+    "illustration": Route(FAST_MODEL, timeout=15.0, slo=5.0),
+    "suggestions": Route(FAST_MODEL, timeout=15.0, slo=5.0),
+    "story": Route(DEFAULT_MODEL, timeout=60.0, slo=25.0, fallback=FAST_MODEL),
+    "refine": Route(DEFAULT_MODEL, timeout=60.0, slo=25.0, fallback=FAST_MODEL),
+    "paragraph": Route(DEFAULT_MODEL, timeout=20.0, slo=8.0, fallback=FAST_MODEL),
+    "judge": Route(DEFAULT_MODEL, timeout=30.0, slo=10.0, fallback=FAST_MODEL),
+    "review": Route(DEFAULT_MODEL, timeout=60.0, slo=25.0, fallback=FAST_MODEL),
+}
+
+
+class ModelRouter:
+    """Picks the model and timeout for each pipeline stage.
+
+    A call that times out is retried once on the stage's fallback model, and
+    a call that finishes but misses its SLO sends the stage to the fallback
+    for ``cooldown`` seconds, after which the primary model is tried again.
+    """
+
+    def __init__(
+        self,
+        routes: Optional[Dict[str, Route]] = None,
+        default: Optional[Route] = None,
+        cooldown: float = 60.0,
+        clock=time.monotonic,
+    ):
+        self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+        self.default = default or Route(DEFAULT_MODEL)
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._degraded_until: Dict[str, float] = {}
+
+    def route(self, stage: Optional[str]) -> Route:
+        return self.routes.get(stage or "", self.default)
+
+    def set_route(self, stage: str, **changes) -> None:
+        with self._lock:
+            self.routes[stage] = replace(self.route(stage), **changes)
+            self._degraded_until.pop(stage, None)
+
+    def degraded(self, stage: Optional[str]) -> bool:
+        with self._lock:
+            return self._degraded_until.get(stage or "", 0.0) > self._clock()
+
+    def pick(self, stage: Optional[str]) -> Tuple[str, float]:
+        route = self.route(stage)
+        if route.fallback and self.degraded(stage):
+            return route.fallback, route.timeout
+        return route.model, route.timeout
+
+    def observe(self, stage: Optional[str], model: str, elapsed: float) -> None:
+        route = self.route(stage)
+        if route.fallback and model == route.model and route.slo is not None and elapsed > route.slo:
+            self._degrade(stage)
+
+    def _degrade(self, stage: Optional[str]) -> None:
+        with self._lock:
+            self._degraded_until[stage or ""] = self._clock() + self.cooldown
+
+    def call(self, stage: Optional[str], fn: Callable[[str, float], T]) -> T:
+        """Run ``fn(model, timeout)`` on the stage's current model."""
+        model, timeout = self.pick(stage)
+        started = self._clock()
+        try:
+            result = fn(model, timeout)
+        except openai.APITimeoutError:
+            fallback = self._fallback_after_timeout(stage, model)
+            if fallback is None:
+                raise
+            return fn(fallback, timeout)
+        self.observe(stage, model, self._clock() - started)
+        return result
+
+    async def acall(self, stage: Optional[str], fn: Callable[[str, float], Awaitable[T]]) -> T:
+        model, timeout = self.pick(stage)
+        started = self._clock()
+        try:
+            result = await fn(model, timeout)
+        except openai.APITimeoutError:
+            fallback = self._fallback_after_timeout(stage, model)
+            if fallback is None:
+                raise
+            return await fn(fallback, timeout)
+        self.observe(stage, model, self._clock() - started)
+        return result
+
+    def _fallback_after_timeout(self, stage: Optional[str], model: str) -> Optional[str]:
+        route = self.route(stage)
+        if not route.fallback or model == route.fallback:
+            return None
+        self._degrade(stage)
+        return route.fallback
+
+
+def routes_from_env(routes: Dict[str, Route]) -> Dict[str, Route]:
+    """Apply OPENAI_MODEL_<STAGE> / OPENAI_FALLBACK_MODEL_<STAGE> overrides."""
+    merged = dict(routes)
+    for stage, route in routes.items():
+        model = os.getenv(f"OPENAI_MODEL_{stage.upper()}")
+        fallback = os.getenv(f"OPENAI_FALLBACK_MODEL_{stage.upper()}")
+        if model:
+            route = replace(route, model=model)
+        if fallback:
+            route = replace(route, fallback=fallback)
+        merged[stage] = route
+    return merged
+
+
+_router = ModelRouter(routes_from_env(DEFAULT_ROUTES))
+
+
+def get_router() -> ModelRouter:
+    return _router
+
+
+def set_router(router: ModelRouter) -> None:
+    global _router
+    _router = router
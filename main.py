@@ -1,8 +1,67 @@
+import argparse
 import os
+import signal
+import sys
+
+from batch import JsonlWriter, completed_ids, run_jsonl_batch
+from cancellation import CancelToken
 from story_engine import StoryOrchestrator
 
 
-def main():
+def main(argv=None):
+    args = _parse_args(argv)
+    if args.batch:
+        sys.exit(run_batch(args))
+    interactive()
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bedtime story generator.")
+    parser.add_argument("--batch", metavar="JOBS", help="JSONL file of jobs to generate ('-' reads stdin)")
+    parser.add_argument("--output", default="-", help="JSONL file for results; rerunning with the same file resumes")
+    parser.add_argument("--concurrency", type=int, default=4, help="stories generated in parallel")
+    parser.add_argument("--genre", default="🐉 Adventure", help="genre for jobs that do not set one")
+    parser.add_argument("--length", default="medium", help="length for jobs that do not set one")
+    parser.add_argument("--retries", type=int, default=None, help="judge passes for jobs that do not set one")
+    return parser.parse_args(argv)
+
+
+def run_batch(args) -> int:
+    token = CancelToken()
+
+    def interrupt(signum, frame):
+        # Cancel in-flight stories first so the worker pool can shut down promptly.
+        token.cancel("interrupted")
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGINT, interrupt)
+    engine = StoryOrchestrator(api_key=os.getenv("OPENAI_API_KEY"), cancel_token=token)
+    resumable = args.output != "-"
+    skip = completed_ids(args.output) if resumable else set()
+    writer = JsonlWriter.append(args.output) if resumable else JsonlWriter(sys.stdout, durable=False)
+    lines = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    try:
+        counts = run_jsonl_batch(
+            lines,
+            writer,
+            engine,
+            concurrency=args.concurrency,
+            skip=skip,
+            defaults={"genre": args.genre, "length": args.length, "retries": args.retries},
+        )
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun with the same --output to resume.", file=sys.stderr)
+        return 130
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+        if resumable:
+            writer.close()
+    print(f"{counts['ok']} written, {counts['error']} failed, {counts['skipped']} already done.", file=sys.stderr)
+    return 1 if counts["error"] else 0
+
+
+def interactive():
     api_key = os.getenv("OPENAI_API_KEY") or input("Enter your OpenAI API key (or leave blank if set in env): ").strip()
     user_input = input("\nWhat kind of story do you want to hear? ")
 
@@ -0,0 +1,158 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+# Words that never belong in a bedtime story for ages 5-10.
+BLOCKLIST: FrozenSet[str] = frozenset(
+    {
+        "blood", "bloody", "corpse", "dead", "death", "die", "died", "kill", "killed", "killing",
+        "murder", "gun", "guns", "knife", "stab", "weapon", "bomb", "torture", "gore",
+        "hate", "stupid", "idiot", "damn", "hell", "drunk", "beer", "wine", "cigarette",
+        "sex", "sexy", "demon", "nightmare", "terrified", "scream", "screamed", "screaming",
+    }
+)
+
+# (min words, max words, min paragraphs, max paragraphs) per story length setting.
+LENGTH_BOUNDS: Dict[str, Tuple[int, int, int, int]] = {
+    "short": (80, 350, 2, 3),
+    "medium": (200, 700, 4, 6),
+    "long": (400, 1200, 7, 10),
+}
+
+_WORD_RE = re.compile(r"[A-Za-z']+")
+_SENTENCE_RE = re.compile(r"[.!?]+")
+_VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+# A final -e, -es or -ed whose "e" is its own vowel group ("make", "makes", "named")...
+_SILENT_E_RE = re.compile(r"[^aeiouy]e[sd]?$")
+# ...is silent unless the ending is sounded ("wanted", "boxes", "places", "bubble", "giggled").
+_SOUNDED_ENDING_RE = re.compile(r"(?:[td]ed|(?:s|x|z|ch|sh|c|g)es|[^aeiouy]le[sd]?)$")
+
+
+@dataclass
+class TextMetrics:
+    words: int
+    sentences: int
+    paragraphs: int
+    syllables: int
+    blocked: List[str] = field(default_factory=list)
+
+    @property
+    def words_per_sentence(self) -> float:
+        return self.words / max(1, self.sentences)
+
+    @property
+    def syllables_per_word(self) -> float:
+        return self.syllables / max(1, self.words)
+
+    @property
+    def grade_level(self) -> float:
+        """Flesch-Kincaid grade level."""
+        return 0.39 * self.words_per_sentence + 11.8 * self.syllables_per_word - 15.59
+
+
+@dataclass
+class PreJudgement:
+    verdict: str  # "reject", "pass" or "uncertain"
+    confidence: float
+    critique: str
+    score: int
+    metrics: TextMetrics
+
+    @property
+    def decisive(self) -> bool:
+        return self.verdict != "uncertain"
+
+
+def count_syllables(word: str) -> int:
+    word = word.lower().strip("'")
+    if not word:
+        return 0
+    groups = len(_VOWEL_GROUP_RE.findall(word))
+    if groups > 1 and _SILENT_E_RE.search(word) and not _SOUNDED_ENDING_RE.search(word):
+        groups -= 1
+    return max(1, groups)
+
+
+def measure(text: str, blocklist: FrozenSet[str] = BLOCKLIST) -> TextMetrics:
+    """Collect every metric in a single pass over the tokens."""
+    words = _WORD_RE.findall(text)
+    lowered = [w.lower() for w in words]
+    return TextMetrics(
+        words=len(words),
+        sentences=max(1, len([s for s in _SENTENCE_RE.split(text) if s.strip()])),
+        paragraphs=len([p for p in text.split("\n\n") if p.strip()]),
+        syllables=sum(count_syllables(w) for w in lowered),
+        blocked=sorted({w for w in lowered if w in blocklist}),
+    )
+
+
+class PreJudge:
+    """Cheap local screen run before the LLM judge.
+
+    Clear failures (blocked words, far off the requested length, reading
+    level far above ages 5-10) are rejected with a concrete critique, and
+    clean drafts comfortably inside every bound are passed outright. Only
+    the band in between is left for the LLM judge; a merely high reading
+    level lands there, since the formula is too rough to reject on.
+    """
+
+    def __init__(
+        self,
+        blocklist: FrozenSet[str] = BLOCKLIST,
+        max_grade: float = 12.0,
+        comfortable_grade: float = 4.5,
+        pass_confidence: float = 0.85,
+    ):
+        self.blocklist = blocklist
+        self.max_grade = max_grade
+        self.comfortable_grade = comfortable_grade
+        self.pass_confidence = pass_confidence
+
+    def screen(self, story: str, length: Optional[str] = None) -> PreJudgement:
+        metrics = measure(story, self.blocklist)
+        problems = self._hard_problems(metrics, length)
+        if problems:
+            return PreJudgement("reject", 1.0, " ".join(problems), 3, metrics)
+        confidence = self._pass_confidence(metrics, length)
+        if confidence >= self.pass_confidence:
+            critique = (
+                f"PASS (local pre-check): {metrics.words} words, reading grade {metrics.grade_level:.1f}, "
+                "no flagged vocabulary."
+            )
+            return PreJudgement("pass", confidence, critique, int(round(6 + 4 * confidence)), metrics)
+        return PreJudgement("uncertain", confidence, "", 0, metrics)
+
+    def _hard_problems(self, metrics: TextMetrics, length: Optional[str]) -> List[str]:
+        problems = []
+        if metrics.blocked:
+            problems.append(f"Replace words that are not suitable for young children: {', '.join(metrics.blocked)}.")
+        bounds = LENGTH_BOUNDS.get(length or "")
+        if bounds:
+            min_words, max_words, _, _ = bounds
+            if metrics.words > max_words * 1.5:
+                problems.append(f"The story is {metrics.words} words; a {length} story should be under {max_words}.")
+            elif metrics.words < min_words * 0.5:
+                problems.append(f"The story is only {metrics.words} words; a {length} story needs at least {min_words}.")
+        if metrics.words >= 30 and metrics.grade_level > self.max_grade:
+            problems.append(
+                f"Reading level is about grade {metrics.grade_level:.1f}; use shorter sentences "
+                f"(now {metrics.words_per_sentence:.0f} words each) and simpler words for ages 5-10."
+            )
+        return problems
+
+    def _pass_confidence(self, metrics: TextMetrics, length: Optional[str]) -> float:
+        confidence = 1.0
+        bounds = LENGTH_BOUNDS.get(length or "")
+        if bounds:
+            min_words, max_words, min_paras, max_paras = bounds
+            if not min_words <= metrics.words <= max_words:
+                confidence -= 0.3
+            if not min_paras <= metrics.paragraphs <= max_paras:
+                confidence -= 0.15
+        else:
+            confidence -= 0.1
+        if metrics.grade_level > self.comfortable_grade:
+            confidence -= min(0.5, 0.2 * (metrics.grade_level - self.comfortable_grade))
+        if metrics.words_per_sentence > 15:
+            confidence -= 0.1
+        return max(0.0, confidence)
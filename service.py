@@ -0,0 +1,238 @@
+import argparse
+import json
+import re
+from contextlib import aclosing
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from llm.fairness import PRIORITIES, use_workload
+from single_flight import get_single_flight
+from story_engine import AsyncStoryGenerator, AsyncStoryOrchestrator, StoryDone, StoryEvent, anarrate, asuggest_prompts
+from tracing import get_metrics
+
+RUN_FIELDS = ("genre", "length", "retries", "deadline", "variant")
+ORCHESTRATOR_FIELDS = (
+    "writer_temperature",
+    "judge_temperature",
+    "parallel_drafts",
+    "early_illustration",
+    "fused_review",
+    "paragraph_refine",
+    "incremental_judging",
+    "prejudge",
+    "converge",
+)
+# Accepted ranges, matching the Streamlit sidebar; integer fields must be whole numbers.
+NUMBER_RANGES: Dict[str, Tuple[float, float]] = {
+    "retries": (0, 4),
+    "deadline": (30, 180),
+    "parallel_drafts": (1, 4),
+    "writer_temperature": (0.0, 1.0),
+    "judge_temperature": (0.0, 1.0),
+}
+INTEGER_FIELDS = ("retries", "parallel_drafts")
+TEXT_FIELDS = ("genre", "variant")
+LENGTHS = ("short", "medium", "long")
+
+
+async def _json_body(request: Request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(400, "Body must be a JSON object")
+    if not isinstance(body, dict):
+        raise HTTPException(400, "Body must be a JSON object")
+    return body
+
+
+def _required(body: Dict[str, Any], name: str) -> str:
+    value = body.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPException(400, f"'{name}' is required")
+    return value
+
+
+def _checked(name: str, value: Any) -> Any:
+    """``value`` if it is valid for body field ``name``; otherwise a 400."""
+    if name in NUMBER_RANGES:
+        integer = name in INTEGER_FIELDS
+        if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)):
+            raise HTTPException(400, f"'{name}' must be {'an integer' if integer else 'a number'}")
+        low, high = NUMBER_RANGES[name]
+        if not low <= value <= high:
+            raise HTTPException(400, f"'{name}' must be between {low} and {high}")
+    elif name == "length":
+        if value not in LENGTHS:
+            raise HTTPException(400, f"'length' must be one of: {', '.join(LENGTHS)}")
+    elif name in TEXT_FIELDS:
+        if not isinstance(value, str):
+            raise HTTPException(400, f"'{name}' must be a string")
+    elif not isinstance(value, bool):
+        raise HTTPException(400, f"'{name}' must be true or false")
+    return value
+
+
+def _options(body: Dict[str, Any], names: Iterable[str]) -> Dict[str, Any]:
+    """Validated values of the optional fields ``names`` present in ``body`` (null means unset)."""
+    return {name: _checked(name, body[name]) for name in names if body.get(name) is not None}
+
+
+def _api_key(request: Request) -> Optional[str]:
+    """Callers may bring their own key; otherwise the service's OPENAI_API_KEY is used."""
+    return request.headers.get("x-openai-key") or None
+
+
+def _workload(request: Request):
+    """Fair-share attribution from ``X-Story-Priority`` (default interactive) and ``X-Session-Id``."""
+    priority = request.headers.get("x-story-priority") or None
+    if priority is not None and priority not in PRIORITIES:
+        raise HTTPException(400, f"X-Story-Priority must be one of: {', '.join(PRIORITIES)}")
+    return use_workload(priority, session=request.headers.get("x-session-id") or None)
+
+
+def _story_job(request: Request, body: Dict[str, Any]):
+    prompt = _required(body, "request").strip()
+    unknown = set(body) - {"request", *RUN_FIELDS, *ORCHESTRATOR_FIELDS}
+    if unknown:
+        raise HTTPException(400, f"Unknown field(s): {', '.join(sorted(unknown))}")
+    options = _options(body, RUN_FIELDS)
+    engine = AsyncStoryOrchestrator(
+        api_key=_api_key(request),
+        single_flight=get_single_flight(),
+        **_options(body, ORCHESTRATOR_FIELDS),
+    )
+    return engine, prompt, options
+
+
+def event_name(event: StoryEvent) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", type(event).__name__).lower()
+
+
+def event_payload(event: StoryEvent) -> Dict[str, Any]:
+    if isinstance(event, StoryDone):
+        return event.result.to_dict()
+    return asdict(event)
+
+
+def _sse(name: str, data: Dict[str, Any]) -> str:
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def create_story(request: Request) -> Response:
+    engine, prompt, options = _story_job(request, await _json_body(request))
+    workload = _workload(request)
+    try:
+        with workload:
+            result = await engine.run(prompt, **options)
+    except Exception as exc:
+        return JSONResponse({"error": f"{type(exc).__name__}: {exc}"}, status_code=502)
+    return JSONResponse(result.to_dict())
+
+
+async def stream_story(request: Request) -> Response:
+    """Server-Sent Events: one event per pipeline stage, ending with ``story_done`` (or ``error``).
+
+    A client that disconnects cancels its generation.
+    """
+    engine, prompt, options = _story_job(request, await _json_body(request))
+    workload = _workload(request)
+
+    async def events() -> AsyncIterator[str]:
+        # Entered here: the body is iterated outside this handler's context.
+        with workload:
+            async with aclosing(engine.run_iter(prompt, **options)) as stages:
+                try:
+                    async for event in stages:
+                        yield _sse(event_name(event), event_payload(event))
+                except Exception as exc:
+                    yield _sse("error", {"error": f"{type(exc).__name__}: {exc}"})
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def remix(request: Request) -> Response:
+    body = await _json_body(request)
+    story, critique = _required(body, "story"), _required(body, "critique")
+    temperature = _options(body, ("writer_temperature",)).get("writer_temperature", 0.85)
+    generator = AsyncStoryGenerator(writer_temperature=temperature, api_key=_api_key(request))
+    workload = _workload(request)
+    try:
+        with workload:
+            revised = await generator.refine_story(story, critique)
+    except Exception as exc:
+        return JSONResponse({"error": f"{type(exc).__name__}: {exc}"}, status_code=502)
+    return JSONResponse({"story": revised})
+
+
+async def narration(request: Request) -> Response:
+    text = _required(await _json_body(request), "text")
+    workload = _workload(request)
+    try:
+        with workload:
+            audio = await anarrate(text, api_key=_api_key(request))
+    except Exception as exc:
+        return JSONResponse({"error": f"{type(exc).__name__}: {exc}"}, status_code=502)
+    return Response(audio, media_type="audio/mpeg")
+
+
+async def suggestions(request: Request) -> Response:
+    workload = _workload(request)
+    try:
+        with workload:
+            prompts = await asuggest_prompts(api_key=_api_key(request))
+    except Exception as exc:
+        return JSONResponse({"error": f"{type(exc).__name__}: {exc}"}, status_code=502)
+    return JSONResponse({"suggestions": prompts})
+
+
+async def health(request: Request) -> Response:
+    return JSONResponse({"status": "ok", "in_flight": get_single_flight().in_flight()})
+
+
+async def metrics(request: Request) -> Response:
+    return PlainTextResponse(get_metrics().prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+async def _http_error(request: Request, exc: HTTPException) -> Response:
+    return JSONResponse({"error": exc.detail}, status_code=exc.status_code)
+
+
+def create_app() -> Starlette:
+    return Starlette(
+        routes=[
+            Route("/stories", create_story, methods=["POST"]),
+            Route("/stories/stream", stream_story, methods=["POST"]),
+            Route("/remix", remix, methods=["POST"]),
+            Route("/narration", narration, methods=["POST"]),
+            Route("/suggestions", suggestions, methods=["GET"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/metrics", metrics, methods=["GET"]),
+        ],
+        exception_handlers={HTTPException: _http_error},
+    )
+
+
+app = create_app()
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Bedtime story HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    args = parser.parse_args(argv)
+    uvicorn.run("service:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import asyncio
+import copy
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+
+from cancellation import Cancelled, CancelToken, check
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters: List[threading.Event] = []
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight call.
+
+    The first caller (the leader) runs the work; everyone who arrives while it
+    is running waits and receives a copy of the leader's result, or its
+    exception. If the leader is cancelled, the others get
+    cancellation.Cancelled rather than being cancelled themselves; a waiter
+    whose own ``cancel`` token fires stops waiting with Cancelled. Nothing
+    is cached: once the call finishes the key is free again.
+    """
+
+    def __init__(self, clone: Callable[[Any], Any] = copy.deepcopy):
+        self._clone = clone
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._futures: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T], cancel: Optional[CancelToken] = None) -> Tuple[T, bool]:
+        """Returns (result, shared); ``shared`` is True for callers that joined another's call."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.shared += 1
+        if not leader:
+            self._wait(flight, cancel)
+            if flight.error is not None:
+                raise flight.error
+            return self._clone(flight.result), True
+        try:
+            flight.result = fn()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                flight.done.set()
+                waiters = list(flight.waiters)
+            for waiter in waiters:
+                waiter.set()
+        return flight.result, False
+
+    def _wait(self, flight: _Flight, cancel: Optional[CancelToken]) -> None:
+        if cancel is None:
+            flight.done.wait()
+            return
+        woken = threading.Event()
+        with self._lock:
+            flight.waiters.append(woken)
+            if flight.done.is_set():
+                woken.set()
+        unregister = cancel.on_cancel(woken.set)
+        try:
+            woken.wait()
+        finally:
+            unregister()
+            with self._lock:
+                flight.waiters.remove(woken)
+        if not flight.done.is_set():
+            check(cancel)
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Coroutine version of ``do``; calls only coalesce within one event loop."""
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key)
+        with self._lock:
+            future = self._futures.get(slot)
+            leader = future is None
+            if leader:
+                future = self._futures[slot] = loop.create_future()
+            else:
+                self.shared += 1
+        if not leader:
+            return self._clone(await asyncio.shield(future)), True
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # Only the leader was cancelled; followers get an error they can recover from.
+            future.set_exception(Cancelled("the shared call was cancelled"))
+            future.exception()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved in case nobody was waiting
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._futures[slot]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights) + len(self._futures)
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    return _single_flight
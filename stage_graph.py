@@ -0,0 +1,121 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass
+class Stage:
+    """One node of a pipeline. ``fn`` receives the results of every finished stage, keyed by name."""
+
+    name: str
+    fn: Callable[[Dict[str, Any]], Any]
+    after: Tuple[str, ...] = ()
+
+
+def _validate(stages: Iterable[Stage]) -> List[Stage]:
+    stages = list(stages)
+    names = [s.name for s in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names: {names}")
+    for stage in stages:
+        missing = [dep for dep in stage.after if dep not in names]
+        if missing:
+            raise ValueError(f"Stage {stage.name!r} depends on unknown stage(s) {missing}")
+    done, remaining = set(), list(stages)
+    while remaining:
+        ready = [s for s in remaining if set(s.after) <= done]
+        if not ready:
+            raise ValueError(f"Dependency cycle among stages {[s.name for s in remaining]}")
+        done.update(s.name for s in ready)
+        remaining = [s for s in remaining if s.name not in done]
+    return stages
+
+
+def run_stages(
+    stages: Iterable[Stage],
+    max_workers: int = 4,
+    checkpoint: Optional[Callable[[], None]] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """Run stages on a thread pool, starting each as soon as its dependencies finish.
+
+    The first failure is re-raised once running stages settle; stages that
+    had not started yet are skipped. ``checkpoint`` is called before stages
+    are started and may raise to stop the run the same way. Each stage runs
+    in a copy of the caller's context, and its wall time is stored in
+    ``timings`` when given.
+    """
+    pending = _validate(stages)
+    results: Dict[str, Any] = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="story-stage") as pool:
+        running = {}
+        error = None
+        while pending or running:
+            if error is None and checkpoint is not None:
+                try:
+                    checkpoint()
+                except Exception as exc:
+                    error = exc
+            if error is None:
+                for stage in [s for s in pending if all(dep in results for dep in s.after)]:
+                    pending.remove(stage)
+                    running[pool.submit(contextvars.copy_context().run, _timed, stage, dict(results), timings)] = stage.name
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                if future.exception() is not None:
+                    error = error or future.exception()
+                else:
+                    results[name] = future.result()
+        if error is not None:
+            raise error
+    return results
+
+
+async def arun_stages(
+    stages: Iterable[Stage],
+    checkpoint: Optional[Callable[[], None]] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """Asyncio counterpart of run_stages; ``fn`` must return an awaitable."""
+    pending = _validate(stages)
+    results: Dict[str, Any] = {}
+    running: Dict[asyncio.Task, str] = {}
+    try:
+        while pending or running:
+            if checkpoint is not None:
+                checkpoint()
+            for stage in [s for s in pending if all(dep in results for dep in s.after)]:
+                pending.remove(stage)
+                running[asyncio.ensure_future(_atimed(stage, dict(results), timings))] = stage.name
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                results[name] = task.result()
+    finally:
+        for task in running:
+            task.cancel()
+    return results
+
+
+def _timed(stage: Stage, results: Dict[str, Any], timings: Optional[Dict[str, float]]):
+    started = time.monotonic()
+    try:
+        return stage.fn(results)
+    finally:
+        if timings is not None:
+            timings[stage.name] = time.monotonic() - started
+
+
+async def _atimed(stage: Stage, results: Dict[str, Any], timings: Optional[Dict[str, float]]):
+    started = time.monotonic()
+    try:
+        return await stage.fn(results)
+    finally:
+        if timings is not None:
+            timings[stage.name] = time.monotonic() - started
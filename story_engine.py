@@ -1,32 +1,289 @@
+import asyncio
+import contextvars
+import difflib
+import hashlib
 import json
-import os
-from dataclasses import dataclass, field
-from typing import List, Optional
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, AsyncIterator, Callable, Dict, Generator, Iterable, Iterator, List, Optional, Tuple, Union
 
-from openai import OpenAI
+from openai import NOT_GIVEN, APITimeoutError, AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
 
-load_dotenv()
+from llm.cache import MemoryCache, cache_key, get_cache
+from llm.clients import get_async_client, get_client, resolve_api_key
+from llm.fairness import BATCH, PREFETCH, use_workload, workload_context
+from llm.hedging import get_hedger
+from cancellation import Cancelled, CancelToken, check
+from deadline import Deadline, DeadlineExceeded, call_timeout, unbounded, use_deadline
+from judge_stats import AdaptiveBudget
+from llm.ratelimit import CallStats, estimate_tokens, get_scheduler
+from llm.routing import get_router
+from prejudge import PreJudge
+from single_flight import SingleFlight
+from stage_graph import Stage, arun_stages, run_stages
+from tracing import CallSpan, Trace, carry_context, export_trace, record_call, use_trace
 
-MODEL = "gpt-3.5-turbo"
+load_dotenv()
 
 
 def _client(api_key: Optional[str] = None) -> OpenAI:
-    key = api_key or os.getenv("OPENAI_API_KEY")
-    if not key:
-        raise RuntimeError("OPENAI_API_KEY is not set")
-    return OpenAI(api_key=key)
-
-
-def call_llm(messages, temperature=0.7, max_tokens=800, api_key: Optional[str] = None) -> str:
-    client = _client(api_key)
-    resp = client.chat.completions.create(
-        model=MODEL,
-        messages=messages,
-        temperature=temperature,
-        max_tokens=max_tokens,
+    return get_client(api_key)
+
+
+def call_llm(
+    messages,
+    temperature=0.7,
+    max_tokens=800,
+    api_key: Optional[str] = None,
+    cache: Optional[bool] = None,
+    stage: Optional[str] = None,
+    hedge: Optional[bool] = None,
+    cancel: Optional[CancelToken] = None,
+) -> str:
+    """Single chat completion. ``cache`` forces the response cache on/off; by default
+    only low-temperature calls are served from it. ``stage`` selects the model
+    route (llm.routing). ``hedge`` forces duplicate-on-slow hedging (llm.hedging)
+    on/off; by default it follows the process-wide setting. A cancelled ``cancel``
+    token raises cancellation.Cancelled instead of waiting for the response.
+    Each call is recorded as a span on the current trace (tracing.use_trace)."""
+    router = get_router()
+    span = CallSpan(stage=stage or "chat", model=router.route(stage).model, wall=0.0)
+    store, slot = _cache_slot(messages, temperature, max_tokens, cache, stage)
+    if store is not None:
+        hit = store.get(slot)
+        if hit is not None:
+            span.cached = True
+            record_call(span)
+            return hit
+    key = resolve_api_key(api_key)
+    client = _client(key)
+    stats = CallStats()
+
+    def create(model, timeout):
+        span.model = model
+        return client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=call_timeout(timeout),
+        )
+
+    def send(token: Optional[CancelToken] = cancel):
+        return get_scheduler().call(
+            "chat",
+            key,
+            lambda: router.call(stage, create),
+            tokens=estimate_tokens(messages, max_tokens),
+            stats=stats,
+            cancel=token,
+        )
+
+    hedger = get_hedger()
+    request = (lambda: hedger.call(stage, send, cancel)) if _hedging(hedger, hedge) else send
+    started = time.monotonic()
+    try:
+        resp = cancel.run(request) if cancel is not None else request()
+    except Exception as exc:
+        _finish_span(span, started, stats, error=exc)
+        raise
+    _finish_span(span, started, stats, usage=getattr(resp, "usage", None))
+    content = resp.choices[0].message.content
+    if store is not None and content is not None:
+        store.set(slot, content)
+    return content
+
+
+def _finish_span(span: CallSpan, started: float, stats: CallStats, usage=None, error: Optional[Exception] = None):
+    span.wall = time.monotonic() - started
+    span.queue_wait = stats.queue_wait
+    span.retries = stats.retries
+    if error is not None:
+        span.error = type(error).__name__
+    if usage is not None:
+        prompt, completion = getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0)
+        span.prompt_tokens = prompt if isinstance(prompt, int) else 0
+        span.completion_tokens = completion if isinstance(completion, int) else 0
+    record_call(span)
+
+
+def _hedging(hedger, requested: Optional[bool]) -> bool:
+    return hedger.enabled if requested is None else requested
+
+
+def _cache_slot(messages, temperature, max_tokens, requested: Optional[bool], stage: Optional[str] = None):
+    store = get_cache()
+    if store is None or not store.should_cache(temperature, requested):
+        return None, None
+    return store, cache_key(get_router().route(stage).model, messages, temperature, max_tokens)
+
+
+def stream_llm(
+    messages,
+    temperature=0.7,
+    max_tokens=800,
+    api_key: Optional[str] = None,
+    stage: Optional[str] = None,
+    cancel: Optional[CancelToken] = None,
+) -> Iterator[str]:
+    check(cancel)
+    key = resolve_api_key(api_key)
+    client = _client(key)
+    router = get_router()
+    # Partial output is already on screen, so a slow stream only counts
+    # against the SLO afterwards; it is never restarted on the fallback.
+    model, timeout = router.pick(stage)
+    span = CallSpan(stage=stage or "chat", model=model, wall=0.0)
+    stats = CallStats()
+    started = time.monotonic()
+    stream = get_scheduler().call(
+        "chat",
+        key,
+        lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=call_timeout(timeout),
+            stream=True,
+            stream_options={"include_usage": True},
+        ),
+        tokens=estimate_tokens(messages, max_tokens),
+        stats=stats,
+        cancel=cancel,
     )
-    return resp.choices[0].message.content
+    # Closing the stream aborts the HTTP response, so the rest is never generated.
+    unregister = cancel.on_cancel(stream.close) if cancel is not None and hasattr(stream, "close") else None
+    usage = None
+    try:
+        for chunk in stream:
+            check(cancel)
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as exc:
+        _finish_span(span, started, stats, usage=usage, error=exc)
+        check(cancel)
+        raise
+    finally:
+        if unregister:
+            unregister()
+    _finish_span(span, started, stats, usage=usage)
+    check(cancel)
+    router.observe(stage, model, time.monotonic() - started)
+
+
+async def acall_llm(
+    messages,
+    temperature=0.7,
+    max_tokens=800,
+    api_key: Optional[str] = None,
+    cache: Optional[bool] = None,
+    stage: Optional[str] = None,
+    hedge: Optional[bool] = None,
+    cancel: Optional[CancelToken] = None,
+) -> str:
+    router = get_router()
+    span = CallSpan(stage=stage or "chat", model=router.route(stage).model, wall=0.0)
+    store, slot = _cache_slot(messages, temperature, max_tokens, cache, stage)
+    if store is not None:
+        hit = store.get(slot)
+        if hit is not None:
+            span.cached = True
+            record_call(span)
+            return hit
+    key = resolve_api_key(api_key)
+    client = _async_client(key)
+    stats = CallStats()
+
+    def create(model, timeout):
+        span.model = model
+        return client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=call_timeout(timeout),
+        )
+
+    def send():
+        return get_scheduler().acall(
+            "chat",
+            key,
+            lambda: router.acall(stage, create),
+            tokens=estimate_tokens(messages, max_tokens),
+            stats=stats,
+        )
+
+    hedger = get_hedger()
+    request = hedger.acall(stage, send) if _hedging(hedger, hedge) else send()
+    started = time.monotonic()
+    try:
+        resp = await (cancel.arun(request) if cancel is not None else request)
+    except Exception as exc:
+        _finish_span(span, started, stats, error=exc)
+        raise
+    _finish_span(span, started, stats, usage=getattr(resp, "usage", None))
+    content = resp.choices[0].message.content
+    if store is not None and content is not None:
+        store.set(slot, content)
+    return content
+
+
+def _async_client(api_key: Optional[str] = None) -> AsyncOpenAI:
+    return get_async_client(api_key)
+
+
+def _suggestions_call() -> dict:
+    return dict(
+        stage="suggestions",
+        messages=[
+            {"role": "system", "content": "Return a JSON list of 3 short, whimsical children's story prompts."},
+            {"role": "user", "content": "Give me 3 new ideas."},
+        ],
+        temperature=0.9,
+    )
+
+
+def _parse_suggestions(content: Optional[str]) -> List[str]:
+    if not content or "[" not in content:
+        return []
+    return json.loads(content[content.find("[") : content.rfind("]") + 1])
+
+
+def suggest_prompts(api_key: Optional[str] = None) -> List[str]:
+    """Fresh story prompts for the desk's suggestion cards (empty if the reply has no JSON list)."""
+    return _parse_suggestions(call_llm(**_suggestions_call(), api_key=api_key))
+
+
+async def asuggest_prompts(api_key: Optional[str] = None) -> List[str]:
+    return _parse_suggestions(await acall_llm(**_suggestions_call(), api_key=api_key))
+
+
+NARRATOR_VOICE = "fable"
+
+
+def narrate(text: str, api_key: Optional[str] = None) -> bytes:
+    """MP3 narration of ``text``."""
+    key = resolve_api_key(api_key)
+    client = _client(key)
+    response = get_scheduler().call(
+        "speech", key, lambda: client.audio.speech.create(model="tts-1", voice=NARRATOR_VOICE, input=text)
+    )
+    return response.content
+
+
+async def anarrate(text: str, api_key: Optional[str] = None) -> bytes:
+    key = resolve_api_key(api_key)
+    client = _async_client(key)
+    response = await get_scheduler().acall(
+        "speech", key, lambda: client.audio.speech.create(model="tts-1", voice=NARRATOR_VOICE, input=text)
+    )
+    return response.content
 
 
 @dataclass
@@ -34,6 +291,8 @@ class StoryFeedback:
     approved: bool
     critique: str
     score: int
+    # 0-based indices of the paragraphs the judge wants changed (paragraph mode only).
+    flagged_paragraphs: List[int] = field(default_factory=list)
 
 
 @dataclass
@@ -49,22 +308,169 @@ class StoryResult:
     genre: Optional[str] = None
     length: Optional[str] = None
     feedback_history: List[StoryFeedback] = field(default_factory=list)
+    # Optional stages skipped or lost to the run's deadline ("outline", "review", "illustration").
+    degraded: List[str] = field(default_factory=list)
+    # Per-stage wall time and every API call of the run (tracing.Trace).
+    trace: Optional[Trace] = None
 
     @property
     def judge_critique(self) -> str:
         return self.feedback.critique if self.feedback else ""
 
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["trace"] = self.trace.to_dict() if self.trace is not None else None
+        return data
+
     @property
     def judge_critiques(self) -> List[str]:
         return [fb.critique for fb in self.feedback_history if fb.critique]
 
 
+@dataclass
+class StoryJob:
+    request: str
+    genre: Optional[str] = None
+    length: Optional[str] = None
+    retries: int = 2
+
+    @classmethod
+    def coerce(cls, job: Union["StoryJob", tuple, dict, str]) -> "StoryJob":
+        if isinstance(job, cls):
+            return job
+        if isinstance(job, str):
+            return cls(request=job)
+        if isinstance(job, dict):
+            return cls(**job)
+        return cls(*job)
+
+
+@dataclass
+class BatchOutcome:
+    index: int
+    job: StoryJob
+    result: Optional[StoryResult] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class StoryEvent:
+    """Progress reported by ``run_iter`` as the pipeline advances."""
+
+
+@dataclass
+class OutlineReady(StoryEvent):
+    outline: str
+
+
+@dataclass
+class DraftReady(StoryEvent):
+    draft: str
+
+
+@dataclass
+class StoryText(StoryEvent):
+    # Accumulated text of the draft or refinement being streamed (``run_iter(stream=True)``).
+    text: str
+
+
+@dataclass
+class JudgeVerdict(StoryEvent):
+    # Round 0 judges the first draft; round n judges the n-th refinement.
+    round: int
+    feedback: StoryFeedback
+
+
+@dataclass
+class DraftRefined(StoryEvent):
+    round: int
+    draft: str
+
+
+@dataclass
+class IllustrationPrompt(StoryEvent):
+    prompt: str
+
+
+@dataclass
+class ImageReady(StoryEvent):
+    # With early illustration a second image may follow if the story changed; the last one wins.
+    url: str
+
+
+@dataclass
+class StoryDone(StoryEvent):
+    result: StoryResult
+
+
+_event_sink: contextvars.ContextVar[Optional[Callable[[StoryEvent], None]]] = contextvars.ContextVar(
+    "story_event_sink", default=None
+)
+
+
+def _emit(event: StoryEvent) -> None:
+    sink = _event_sink.get()
+    if sink is not None:
+        sink(event)
+
+
 class StoryGenerator:
-    def __init__(self, writer_temperature: float = 0.85, api_key: Optional[str] = None):
+    def __init__(
+        self, writer_temperature: float = 0.85, api_key: Optional[str] = None, cancel_token: Optional[CancelToken] = None
+    ):
         self.writer_temperature = writer_temperature
         self.api_key = api_key
+        self.cancel_token = cancel_token
 
     def create_outline(self, request: str, genre: Optional[str] = None, length: Optional[str] = None) -> str:
+        return call_llm(**self._outline_call(request, genre, length), api_key=self.api_key, cancel=self.cancel_token)
+
+    def write_story(
+        self,
+        request: str,
+        outline: Optional[str],
+        genre: Optional[str] = None,
+        length: Optional[str] = None,
+        cache: Optional[bool] = None,
+    ) -> str:
+        return call_llm(**self._story_call(request, outline, genre, length), api_key=self.api_key, cache=cache, cancel=self.cancel_token)
+
+    def refine_story(self, draft: str, critique: str) -> str:
+        return call_llm(**self._refine_call(draft, critique), api_key=self.api_key, cancel=self.cancel_token)
+
+    def illustration_prompt(self, story: str) -> str:
+        return call_llm(**self._illustration_call(story), api_key=self.api_key, cancel=self.cancel_token)
+
+    def refine_paragraphs(self, draft: str, critique: str, flagged: Iterable[int], parallel: bool = True) -> str:
+        """Rewrite only the flagged paragraphs and splice them back into the draft."""
+        paragraphs = split_paragraphs(draft)
+        targets = sorted({i for i in flagged if 0 <= i < len(paragraphs)})
+        if not targets:
+            return draft
+
+        def rewrite(index: int) -> str:
+            return call_llm(**self._paragraph_call(paragraphs, index, critique), api_key=self.api_key, cancel=self.cancel_token)
+
+        if parallel and len(targets) > 1:
+            with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="story-paragraph") as pool:
+                rewritten = list(pool.map(carry_context(rewrite), targets))
+        else:
+            rewritten = [rewrite(i) for i in targets]
+        return _splice_paragraphs(paragraphs, targets, rewritten)
+
+    def write_story_stream(
+        self, request: str, outline: Optional[str], genre: Optional[str] = None, length: Optional[str] = None
+    ) -> Iterator[str]:
+        return stream_llm(**self._story_call(request, outline, genre, length), api_key=self.api_key, cancel=self.cancel_token)
+
+    def refine_story_stream(self, draft: str, critique: str) -> Iterator[str]:
+        return stream_llm(**self._refine_call(draft, critique), api_key=self.api_key, cancel=self.cancel_token)
+
+    def _outline_call(self, request: str, genre: Optional[str], length: Optional[str]) -> Dict[str, Any]:
         system = (
             "You are a story architect creating short outlines for children's "
             "bedtime stories (ages 5-10). Keep outlines to 3-5 bullet points."
@@ -82,14 +488,14 @@ class StoryGenerator:
             f"Focus on kindness, curiosity, and friendly adventure.\n"
             f"Request: {request}\n{genre_hint}\n{length_hint}"
         )
-        return call_llm(
+        return dict(
             messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
             temperature=0.6,
             max_tokens=200,
-            api_key=self.api_key,
+            stage="outline",
         )
 
-    def write_story(self, request: str, outline: Optional[str], genre: Optional[str] = None, length: Optional[str] = None) -> str:
+    def _story_call(self, request: str, outline: Optional[str], genre: Optional[str], length: Optional[str]) -> Dict[str, Any]:
         system = (
             "You are a whimsical children's book author. Write for ages 5-10 with simple "
             "vocabulary and short sentences. Avoid scary elements. Highlight friendship, "
@@ -108,14 +514,14 @@ class StoryGenerator:
             f"Story outline (use but keep it short and clear):\n{outline or 'None provided'}\n"
             f"Write a complete bedtime story.\n{genre_hint}\n{length_hint}"
         )
-        return call_llm(
+        return dict(
             messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
             temperature=self.writer_temperature,
             max_tokens=900,
-            api_key=self.api_key,
+            stage="story",
         )
 
-    def refine_story(self, draft: str, critique: str) -> str:
+    def _refine_call(self, draft: str, critique: str) -> Dict[str, Any]:
         system = (
             "You are revising a children's bedtime story for ages 5-10. "
             "Apply the given critique while keeping the tone warm and safe."
@@ -124,113 +530,1281 @@ class StoryGenerator:
             f"Draft:\n{draft}\n\nCritique:\n{critique}\n"
             "Rewrite the story so it fully addresses the critique."
         )
-        return call_llm(
+        return dict(
             messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
             temperature=self.writer_temperature,
             max_tokens=900,
-            api_key=self.api_key,
+            stage="refine",
         )
 
-    def illustration_prompt(self, story: str) -> str:
+    def _paragraph_call(self, paragraphs: List[str], index: int, critique: str) -> Dict[str, Any]:
+        system = (
+            "You are revising one paragraph of a children's bedtime story for ages 5-10. "
+            "Apply the critique to that paragraph only, keep it about the same length, and make it "
+            "flow from the paragraph before into the paragraph after. Return only the rewritten paragraph."
+        )
+        before = paragraphs[index - 1] if index > 0 else "(story starts here)"
+        after = paragraphs[index + 1] if index + 1 < len(paragraphs) else "(story ends here)"
+        user = (
+            f"Paragraph before:\n{before}\n\n"
+            f"Paragraph to rewrite:\n{paragraphs[index]}\n\n"
+            f"Paragraph after:\n{after}\n\n"
+            f"Critique:\n{critique}"
+        )
+        return dict(
+            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+            temperature=self.writer_temperature,
+            max_tokens=250,
+            stage="paragraph",
+        )
+
+    def _illustration_call(self, story: str) -> Dict[str, Any]:
         system = "You create concise illustration prompts for children's stories."
         user = (
             "Provide one vivid illustration prompt for this story, 25 words max, "
             "no characters' faces described in detail.\n"
             f"Story:\n{story}"
         )
-        return call_llm(
+        return dict(
             messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
             temperature=0.6,
             max_tokens=80,
-            api_key=self.api_key,
+            stage="illustration",
         )
 
 
+# Paragraph verdicts and planned judge temperature of the current orchestrator run (see StoryJudge.begin_run).
+_run_verdicts: contextvars.ContextVar[Optional[MemoryCache]] = contextvars.ContextVar("judge_run_verdicts", default=None)
+_run_temperature: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("judge_run_temperature", default=None)
+_run_min_score: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("judge_run_min_score", default=None)
+
+
 class StoryJudge:
-    def __init__(self, judge_temperature: float = 0.15, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        judge_temperature: float = 0.15,
+        api_key: Optional[str] = None,
+        by_paragraph: bool = False,
+        incremental: bool = False,
+        cancel_token: Optional[CancelToken] = None,
+    ):
         self.judge_temperature = judge_temperature
         self.api_key = api_key
+        self.cancel_token = cancel_token
+        # Number paragraphs in the prompt and ask which ones need work, enabling targeted refinement.
+        self.by_paragraph = by_paragraph or incremental
+        # Remember per-paragraph verdicts so later rounds only re-read paragraphs that changed.
+        self.incremental = incremental
+        self._verdicts = MemoryCache(max_entries=512)
+
+    def begin_run(self, temperature: Optional[float] = None, min_score: Optional[int] = None) -> None:
+        """Give the current run (context) its own verdict cache and, optionally, judge temperature and approval bar.
+
+        A judge shared by concurrent runs then never treats paragraphs judged
+        in another story as already reviewed, nor uses another run's settings.
+        With ``min_score`` the judge is told the bar and approvals scored below it are overruled.
+        """
+        _run_verdicts.set(MemoryCache(max_entries=512))
+        _run_temperature.set(temperature)
+        _run_min_score.set(min_score)
+
+    def _temperature(self) -> float:
+        planned = _run_temperature.get()
+        return self.judge_temperature if planned is None else planned
+
+    def _system(self, prompt: str) -> str:
+        min_score = _run_min_score.get()
+        if min_score is None:
+            return prompt
+        return f"{prompt} Only approve a story that deserves a score of {min_score} or higher."
+
+    def _held_to_bar(self, feedback: StoryFeedback) -> StoryFeedback:
+        min_score = _run_min_score.get()
+        if min_score is None or not feedback.approved or feedback.score >= min_score:
+            return feedback
+        note = f"Scored {feedback.score}, below the {min_score} needed for approval; strengthen the story overall."
+        return replace(feedback, approved=False, critique=f"{feedback.critique} {note}".strip())
+
+    def _verdict_cache(self) -> MemoryCache:
+        scoped = _run_verdicts.get()
+        return self._verdicts if scoped is None else scoped
 
     def evaluate(self, story: str) -> StoryFeedback:
+        call, finish = self._evaluation(story)
+        return self._held_to_bar(finish(call_llm(**call, api_key=self.api_key, cancel=self.cancel_token)))
+
+    def _evaluation(self, story: str) -> Tuple[Dict[str, Any], Callable[[str], StoryFeedback]]:
+        """Pick a full or delta review for ``story``; returns the call kwargs and a parser for its reply."""
+        if not self.incremental:
+            return self._evaluate_call(story), _parse_feedback
+        paragraphs = split_paragraphs(story)
+        hashes = [_paragraph_hash(p) for p in paragraphs]
+        known = {}
+        verdicts = self._verdict_cache()
+        for index, digest in enumerate(hashes):
+            verdict = verdicts.get(digest)
+            if verdict is not None:
+                known[index] = json.loads(verdict)
+        changed = [i for i in range(len(paragraphs)) if i not in known]
+        if not known or not changed or len(changed) * 2 > len(paragraphs):
+
+            def finish_full(raw: str) -> StoryFeedback:
+                feedback = _parse_feedback(raw)
+                self._remember(hashes, range(len(paragraphs)), feedback)
+                return feedback
+
+            return self._evaluate_call(story), finish_full
+
+        def finish_delta(raw: str) -> StoryFeedback:
+            feedback = _merge_delta(_parse_feedback(raw), known)
+            self._remember(hashes, changed, feedback)
+            return feedback
+
+        return self._delta_call(paragraphs, changed), finish_delta
+
+    def _remember(self, hashes: List[str], indices: Iterable[int], feedback: StoryFeedback):
+        if feedback.score <= 0:  # unparseable reply; nothing trustworthy to cache
+            return
+        verdicts = self._verdict_cache()
+        for index in indices:
+            flagged = index in feedback.flagged_paragraphs
+            verdict = {"ok": not flagged, "note": feedback.critique if flagged else ""}
+            verdicts.set(hashes[index], json.dumps(verdict))
+
+    def _delta_call(self, paragraphs: List[str], changed: List[int]) -> Dict[str, Any]:
+        system = (
+            "You are a strict editor for a children's publisher, re-reviewing a revised story. "
+            "Paragraphs marked (unchanged) already passed review and are summarized for context only; "
+            "read the full-text paragraphs closely and judge the story as a whole for: vocabulary fit "
+            "for age 5-10, plot consistency, safety, and fun. Return JSON with keys approved (bool), "
+            "critique (string), score (1-10), flagged_paragraphs (list of the [n] paragraph numbers "
+            "that must change). Return JSON only."
+        )
+        lines = []
+        for index, paragraph in enumerate(paragraphs):
+            if index in changed:
+                lines.append(f"[{index + 1}] {paragraph}")
+            else:
+                lines.append(f"[{index + 1}] (unchanged) {_summarize_paragraph(paragraph)}")
+        user = "Story to review:\n" + "\n\n".join(lines)
+        return dict(
+            messages=[{"role": "system", "content": self._system(system)}, {"role": "user", "content": user}],
+            temperature=self._temperature(),
+            max_tokens=300,
+            stage="judge",
+        )
+
+    def evaluate_and_revise(self, story: str) -> Tuple[StoryFeedback, Optional[str]]:
+        """Judge and, if rejected, rewrite in one round-trip. Returns (feedback, revised story or None)."""
+        raw = call_llm(**self._review_call(story), api_key=self.api_key, cancel=self.cancel_token)
+        feedback, revised = _parse_review(raw)
+        return self._held_to_bar(feedback), revised
+
+    def _review_call(self, story: str) -> Dict[str, Any]:
         system = (
             "You are a strict editor for a children's publisher. "
             "Check the story for: vocabulary fit for age 5-10, plot consistency, safety, and fun. "
-            "Return JSON with keys approved (bool), critique (string), score (1-10). "
+            "Return JSON with keys approved (bool), critique (string), score (1-10), and revised_story "
+            "(string). If approved is false, revised_story must be the full story rewritten to fully "
+            "address your critique while keeping the tone warm and safe; otherwise use an empty string. "
             "Return JSON only."
         )
         user = f"Story to review:\n{story}"
-        raw = call_llm(
-            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-            temperature=self.judge_temperature,
+        return dict(
+            messages=[{"role": "system", "content": self._system(system)}, {"role": "user", "content": user}],
+            temperature=self._temperature(),
+            max_tokens=1200,
+            stage="review",
+        )
+
+    def _evaluate_call(self, story: str) -> Dict[str, Any]:
+        system = (
+            "You are a strict editor for a children's publisher. "
+            "Check the story for: vocabulary fit for age 5-10, plot consistency, safety, and fun. "
+            "Return JSON with keys approved (bool), critique (string), score (1-10)"
+        )
+        if self.by_paragraph:
+            system += (
+                ", flagged_paragraphs (list of the [n] paragraph numbers that must change; "
+                "empty if the problem is the story as a whole). Return JSON only."
+            )
+            user = f"Story to review:\n{number_paragraphs(story)}"
+        else:
+            system += ". Return JSON only."
+            user = f"Story to review:\n{story}"
+        return dict(
+            messages=[{"role": "system", "content": self._system(system)}, {"role": "user", "content": user}],
+            temperature=self._temperature(),
             max_tokens=300,
-            api_key=self.api_key,
+            stage="judge",
         )
+
+
+def _parse_feedback(raw: str) -> StoryFeedback:
+    flagged: List[int] = []
+    try:
+        data = json.loads(raw)
+        approved = bool(data.get("approved", False))
+        critique = str(data.get("critique", ""))
+        score = int(data.get("score", 0))
+        flagged = _parse_flagged(data.get("flagged_paragraphs"))
+    except Exception:
+        approved = False
+        critique = f"Invalid JSON from judge. Content: {raw}"
+        score = 0
+    return StoryFeedback(approved=approved, critique=critique, score=score, flagged_paragraphs=flagged)
+
+
+def _parse_flagged(raw) -> List[int]:
+    flagged = set()
+    for item in raw if isinstance(raw, list) else []:
+        try:
+            number = int(item)
+        except (TypeError, ValueError):
+            continue
+        if number > 0:
+            flagged.add(number - 1)
+    return sorted(flagged)
+
+
+def _paragraph_hash(paragraph: str) -> str:
+    return hashlib.sha256(" ".join(paragraph.split()).encode("utf-8")).hexdigest()
+
+
+def _summarize_paragraph(paragraph: str, words: int = 15) -> str:
+    tokens = paragraph.split()
+    return " ".join(tokens[:words]) + (" ..." if len(tokens) > words else "")
+
+
+def _merge_delta(feedback: StoryFeedback, known: Dict[int, Dict[str, Any]]) -> StoryFeedback:
+    """Fold cached verdicts for unchanged paragraphs into a delta review."""
+    unresolved = sorted(i for i, verdict in known.items() if not verdict["ok"])
+    if not unresolved:
+        return feedback
+    notes = "; ".join(sorted({known[i]["note"] for i in unresolved if known[i]["note"]}))
+    critique = feedback.critique
+    if notes:
+        critique = f"{critique} Still unresolved from an earlier review: {notes}".strip()
+    return StoryFeedback(
+        approved=False,
+        critique=critique,
+        score=feedback.score,
+        flagged_paragraphs=sorted(set(feedback.flagged_paragraphs) | set(unresolved)),
+    )
+
+
+def split_paragraphs(text: str) -> List[str]:
+    return [p.strip() for p in text.split("\n\n") if p.strip()]
+
+
+def number_paragraphs(text: str) -> str:
+    return "\n\n".join(f"[{i}] {p}" for i, p in enumerate(split_paragraphs(text), 1))
+
+
+def _splice_paragraphs(paragraphs: List[str], targets: List[int], rewritten: List[str]) -> str:
+    merged = list(paragraphs)
+    for index, text in zip(targets, rewritten):
+        merged[index] = (text or "").strip() or paragraphs[index]
+    return "\n\n".join(merged)
+
+
+def _parse_review(raw: str) -> Tuple[StoryFeedback, Optional[str]]:
+    feedback = _parse_feedback(raw)
+    revised = None
+    if not feedback.approved:
         try:
-            data = json.loads(raw)
-            approved = bool(data.get("approved", False))
-            critique = str(data.get("critique", ""))
-            score = int(data.get("score", 0))
+            revised = str(json.loads(raw).get("revised_story") or "").strip() or None
         except Exception:
-            approved = False
-            critique = f"Invalid JSON from judge. Content: {raw}"
-            score = 0
-        return StoryFeedback(approved=approved, critique=critique, score=score)
+            revised = None
+    return feedback, revised
 
 
 class ImageGenerator:
-    def __init__(self, size: str = "1024x1024", api_key: Optional[str] = None):
+    def __init__(self, size: str = "1024x1024", api_key: Optional[str] = None, cancel_token: Optional[CancelToken] = None):
         self.size = size
         self.api_key = api_key
+        self.cancel_token = cancel_token
 
-    def generate_image(self, prompt: str) -> Optional[str]:
-        client = _client(self.api_key)
-        resp = client.images.generate(
-            model="dall-e-3",
-            prompt=prompt,
-            size=self.size,
-            n=1,
-        )
-        if resp.data and resp.data[0].url:
-            return resp.data[0].url
-        return None
+    def generate_image(self, prompt: str, timeout: Optional[float] = None) -> Optional[str]:
+        key = resolve_api_key(self.api_key)
+        client = _client(key)
+        span, stats = CallSpan(stage="image", model="dall-e-3", wall=0.0), CallStats()
+
+        def send():
+            return get_scheduler().call(
+                "images",
+                key,
+                lambda: client.images.generate(
+                    model="dall-e-3",
+                    prompt=prompt,
+                    size=self.size,
+                    n=1,
+                    timeout=NOT_GIVEN if timeout is None else timeout,
+                ),
+                stats=stats,
+                cancel=self.cancel_token,
+            )
+
+        started = time.monotonic()
+        try:
+            resp = self.cancel_token.run(send) if self.cancel_token is not None else send()
+        except Exception as exc:
+            _finish_span(span, started, stats, error=exc)
+            raise
+        _finish_span(span, started, stats)
+        return _image_url(resp)
+
+
+# Upper bound for one DALL-E call; a run's deadline can only shorten it.
+IMAGE_TIMEOUT = 60.0
+
+
+def _image_url(resp) -> Optional[str]:
+    if resp.data and resp.data[0].url:
+        return resp.data[0].url
+    return None
+
+
+# Stories a batch keeps in flight unless the caller asks otherwise (sync and async alike).
+BATCH_CONCURRENCY = 4
 
 
 class StoryOrchestrator:
+    """Outline -> write -> judge/refine -> illustrate, executed as a stage graph.
+
+    With ``parallel_drafts > 1`` several drafts are written and judged
+    concurrently and the best-scoring one enters the refine loop, trading
+    extra tokens for fewer sequential refine rounds.
+
+    With ``early_illustration`` the illustration prompt and image are built
+    from the outline while the story is still being written and judged; they
+    are redone from the final story only if refinement changed it materially.
+
+    With ``fused_review`` each non-final judge round also returns the
+    revision, so a rejected round costs one API call instead of two.
+
+    With ``paragraph_refine`` the judge flags the paragraphs at fault and
+    only those are rewritten (in parallel) when they are a minority of the story.
+
+    With ``incremental_judging`` later judge rounds only re-read paragraphs
+    that changed since they were last judged.
+
+    With ``prejudge`` every draft is first screened locally (prejudge.PreJudge)
+    and the LLM judge only runs when that screen is inconclusive.
+
+    With ``converge`` the refine loop stops as soon as the judge score stops
+    improving, returns the best-scoring draft rather than the last one, and
+    refines against every critique so far.
+
+    With ``adaptive_budget`` (judge_stats.AdaptiveBudget) the ``retries``
+    passed to ``run`` become an upper bound: the refine budget and judge
+    temperature are picked from past outcomes for the same genre, length and
+    writer temperature band, and every run's outcome is recorded back. A judge
+    that has been passing nearly every first draft is also held to an
+    approval score for the run.
+
+    With a ``deadline`` (seconds per run) optional work gives way as time runs
+    out: short stories skip the outline, the remaining refine/judge rounds are
+    dropped, and the illustration falls back to the placeholder. The outline
+    and draft calls always run to completion (a late story beats none); every
+    other call's timeout is cut to the time left, nothing is sent once it is
+    gone, and throttled calls are not retried past it. A judge or refine call
+    that runs out of time ends the review with the draft so far, and a failed
+    illustration never loses the story. Cuts are listed in StoryResult.degraded.
+
+    With ``single_flight`` (single_flight.SingleFlight) identical runs that
+    overlap in time share one generation; later callers get a copy of the
+    first caller's result. Pass ``variant`` to ``run`` (e.g. a session id) when
+    a caller must get its own story.
+
+    With a ``cancel_token`` (cancellation.CancelToken) cancelling the token
+    stops the run: no further stages or judge rounds start, in-flight streams
+    are closed, and ``run`` raises cancellation.Cancelled.
+    """
+
     def __init__(
         self,
         writer_temperature: float = 0.85,
         judge_temperature: float = 0.15,
         api_key: Optional[str] = None,
+        parallel_drafts: int = 1,
+        early_illustration: bool = False,
+        fused_review: bool = False,
+        paragraph_refine: bool = False,
+        incremental_judging: bool = False,
+        prejudge: bool = False,
+        converge: bool = False,
+        adaptive_budget: Optional[AdaptiveBudget] = None,
+        deadline: Optional[float] = None,
+        single_flight: Optional[SingleFlight] = None,
+        cancel_token: Optional[CancelToken] = None,
         **_: object,
     ):
-        self.generator = StoryGenerator(writer_temperature=writer_temperature, api_key=api_key)
-        self.judge = StoryJudge(judge_temperature=judge_temperature, api_key=api_key)
-        self.image_generator = ImageGenerator(api_key=api_key)
-
-    def run(self, request: str, retries: int = 2, genre: Optional[str] = None, length: Optional[str] = None) -> StoryResult:
-        outline = self.generator.create_outline(request, genre=genre, length=length)
-        draft = self.generator.write_story(request, outline, genre=genre, length=length)
-        feedback = self.judge.evaluate(draft)
-        feedback_history: List[StoryFeedback] = [feedback]
-        iterations = 0
-        while not feedback.approved and iterations < retries:
-            draft = self.generator.refine_story(draft, feedback.critique)
-            iterations += 1
-            feedback = self.judge.evaluate(draft)
-            feedback_history.append(feedback)
-        final_story = draft
-        image_prompt = self.generator.illustration_prompt(final_story)
-        image_url = self.image_generator.generate_image(image_prompt)
-        return StoryResult(
+        generator_type, judge_type, image_type = self._components()
+        self.generator = generator_type(writer_temperature=writer_temperature, api_key=api_key, cancel_token=cancel_token)
+        self.judge = judge_type(
+            judge_temperature=judge_temperature,
+            api_key=api_key,
+            by_paragraph=paragraph_refine,
+            incremental=incremental_judging,
+            cancel_token=cancel_token,
+        )
+        self.image_generator = image_type(api_key=api_key, cancel_token=cancel_token)
+        self.parallel_drafts = max(1, parallel_drafts)
+        self.early_illustration = early_illustration
+        self.fused_review = fused_review
+        self.paragraph_refine = paragraph_refine
+        self.incremental_judging = incremental_judging
+        self.prejudge = PreJudge() if prejudge else None
+        self.converge = converge
+        self.adaptive_budget = adaptive_budget
+        self.deadline = deadline
+        self.single_flight = single_flight
+        self.cancel_token = cancel_token
+
+    def run(
+        self,
+        request: str,
+        retries: int = 2,
+        genre: Optional[str] = None,
+        length: Optional[str] = None,
+        on_text: Optional[Callable[[str], None]] = None,
+        deadline: Optional[float] = None,
+        variant: Optional[str] = None,
+    ) -> StoryResult:
+        """Run the full pipeline.
+
+        When ``on_text`` is given, the draft and each refinement are streamed
+        and ``on_text`` receives the accumulated text after every chunk
+        (a caller that joined another's run only receives the final story).
+        ``deadline`` overrides the orchestrator's per-run time budget.
+        """
+        if self.single_flight is None:
+            return self._run(request, retries, genre, length, on_text, deadline)
+        key = self._flight_key(request, retries, genre, length, deadline, variant)
+        try:
+            result, shared = self.single_flight.do(
+                key, lambda: self._run(request, retries, genre, length, on_text, deadline), cancel=self.cancel_token
+            )
+        except Cancelled:
+            # Re-raise our own cancellation; if the run we joined was abandoned, generate our own.
+            self._checkpoint()
+            return self._run(request, retries, genre, length, on_text, deadline)
+        self._checkpoint()
+        if shared and on_text:
+            on_text(result.final_story)
+        return result
+
+    def run_iter(
+        self,
+        request: str,
+        retries: int = 2,
+        genre: Optional[str] = None,
+        length: Optional[str] = None,
+        deadline: Optional[float] = None,
+        variant: Optional[str] = None,
+        stream: bool = False,
+    ) -> Iterator[StoryEvent]:
+        """Run the pipeline on a background thread, yielding StoryEvents as stages finish.
+
+        The last event is StoryDone carrying the StoryResult; a failed run raises
+        from the iterator instead. With ``stream`` the draft and each refinement
+        also arrive as StoryText events while they are written. Abandoning the
+        iterator does not stop the run; cancel the orchestrator's token for that.
+        """
+        events: "queue.Queue[Union[StoryEvent, BaseException]]" = queue.Queue()
+
+        def work():
+            _event_sink.set(events.put)
+            on_text = (lambda text: _emit(StoryText(text))) if stream else None
+            try:
+                events.put(StoryDone(self.run(request, retries, genre, length, on_text, deadline, variant)))
+            except BaseException as exc:
+                events.put(exc)
+
+        threading.Thread(target=contextvars.copy_context().run, args=(work,), name="story-run-iter", daemon=True).start()
+        while True:
+            event = events.get()
+            if isinstance(event, BaseException):
+                raise event
+            yield event
+            if isinstance(event, StoryDone):
+                return
+
+    def _run(
+        self,
+        request: str,
+        retries: int,
+        genre: Optional[str],
+        length: Optional[str],
+        on_text: Optional[Callable[[str], None]],
+        deadline: Optional[float],
+    ) -> StoryResult:
+        retries, judge_temperature, min_score = self._plan_budget(genre, length, retries)
+        budget = Deadline(self.deadline if deadline is None else deadline)
+        stages = self._stages(request, retries, genre, length, on_text, budget, judge_temperature, min_score)
+        trace = Trace()
+        with use_trace(trace), use_deadline(budget):
+            results = run_stages(stages, checkpoint=self._checkpoint, timings=trace.stages)
+        return self._finish(request, genre, length, results, budget, trace)
+
+    def _components(self) -> tuple:
+        return StoryGenerator, StoryJudge, ImageGenerator
+
+    def _stages(
+        self,
+        request: str,
+        retries: int,
+        genre: Optional[str],
+        length: Optional[str],
+        on_text: Optional[Callable[[str], None]],
+        budget: Deadline,
+        judge_temperature: Optional[float],
+        min_score: Optional[int],
+    ) -> List[Stage]:
+        """The run's stage graph; each stage calls a method the async twin overrides with a coroutine."""
+        stages = [
+            Stage("outline", lambda r: self._outline(request, genre, length, budget)),
+            Stage(
+                "review",
+                lambda r: self._write_and_review(
+                    request, r["outline"], retries, genre, length, on_text, budget, judge_temperature, min_score
+                ),
+                after=("outline",),
+            ),
+        ]
+        if self.early_illustration:
+            stages += [
+                Stage("early_illustration", lambda r: self._early_draw(r["outline"], budget), after=("outline",)),
+                Stage(
+                    "illustration",
+                    lambda r: self._settle_illustration(r, budget),
+                    after=("review", "early_illustration"),
+                ),
+            ]
+        else:
+            stages.append(Stage("illustration", lambda r: self._illustrate(r, budget), after=("review",)))
+        return stages
+
+    def _finish(
+        self,
+        request: str,
+        genre: Optional[str],
+        length: Optional[str],
+        results: Dict[str, Any],
+        budget: Deadline,
+        trace: Trace,
+    ) -> StoryResult:
+        review: _Review = results["review"]
+        image_prompt, image_url = results["illustration"]
+        result = StoryResult(
             request=request,
-            outline=outline,
-            draft=draft,
-            final_story=final_story,
-            feedback=feedback,
+            outline=results["outline"],
+            draft=review.draft,
+            final_story=review.draft,
+            feedback=review.feedback,
             image_prompt=image_prompt,
             image_url=image_url,
-            iterations=iterations,
+            iterations=review.iterations,
             genre=genre,
             length=length,
-            feedback_history=feedback_history,
+            feedback_history=review.feedback_history,
+            degraded=list(budget.degraded),
+            trace=trace,
+        )
+        self._record_outcome(result)
+        export_trace(trace)
+        return result
+
+    def _write_and_review(
+        self,
+        request: str,
+        outline: str,
+        retries: int,
+        genre: Optional[str],
+        length: Optional[str],
+        on_text: Optional[Callable[[str], None]],
+        deadline: Optional[Deadline] = None,
+        judge_temperature: Optional[float] = None,
+        min_score: Optional[int] = None,
+    ) -> "_Review":
+        self.judge.begin_run(judge_temperature, min_score)
+        feedback = None
+        with unbounded():
+            if self.parallel_drafts > 1:
+                draft, feedback = self._best_of_drafts(request, outline, genre, length)
+                if on_text:
+                    on_text(draft)
+            elif on_text:
+                draft = _collect_stream(self.generator.write_story_stream(request, outline, genre=genre, length=length), on_text)
+            else:
+                draft = self.generator.write_story(request, outline, genre=genre, length=length)
+        _emit(DraftReady(draft))
+        steps = _review_steps(draft, retries, self._review_policy(length, deadline), feedback)
+        try:
+            step = next(steps)
+            while True:
+                self._checkpoint()
+                try:
+                    outcome = self._perform(step, on_text)
+                except _OUT_OF_TIME as exc:
+                    step = steps.throw(exc)
+                else:
+                    step = steps.send(outcome)
+        except StopIteration as done:
+            return done.value
+
+    def _perform(self, step: "_Step", on_text: Optional[Callable[[str], None]]):
+        if step.kind == "evaluate":
+            return self.judge.evaluate(step.draft)
+        if step.kind == "review":
+            feedback, revised = self.judge.evaluate_and_revise(step.draft)
+            if revised and on_text:
+                on_text(revised)
+            return feedback, revised
+        if step.kind == "patch":
+            patched = self.generator.refine_paragraphs(step.draft, step.critique, step.paragraphs)
+            if on_text:
+                on_text(patched)
+            return patched
+        if on_text:
+            return _collect_stream(self.generator.refine_story_stream(step.draft, step.critique), on_text)
+        return self.generator.refine_story(step.draft, step.critique)
+
+    def _review_policy(self, length: Optional[str], deadline: Optional[Deadline] = None) -> "_ReviewPolicy":
+        return _ReviewPolicy(
+            fused=self.fused_review,
+            by_paragraph=self.paragraph_refine,
+            prejudge=self.prejudge,
+            length=length,
+            converge=self.converge,
+            deadline=deadline,
+        )
+
+    def _plan_budget(
+        self, genre: Optional[str], length: Optional[str], retries: int
+    ) -> Tuple[int, Optional[float], Optional[int]]:
+        """Refine budget, judge temperature and approval bar for one run; the judge itself is shared, so it is left as is."""
+        if self.adaptive_budget is None:
+            return retries, None, None
+        plan = self.adaptive_budget.plan(
+            genre, length, self.generator.writer_temperature, retries, self.judge.judge_temperature
+        )
+        return plan.retries, plan.judge_temperature, plan.min_score
+
+    def _record_outcome(self, result: StoryResult) -> None:
+        # A story the judge never got to says nothing about the judge.
+        if self.adaptive_budget is not None and result.feedback_history:
+            self.adaptive_budget.record(result.genre, result.length, self.generator.writer_temperature, result)
+
+    def _outline(self, request: str, genre: Optional[str], length: Optional[str], deadline: Deadline) -> str:
+        if _skip_outline(length, deadline):
+            return ""
+        with unbounded():
+            outline = self.generator.create_outline(request, genre=genre, length=length)
+        _emit(OutlineReady(outline))
+        return outline
+
+    def _checkpoint(self) -> None:
+        check(self.cancel_token)
+
+    def _flight_key(
+        self,
+        request: str,
+        retries: int,
+        genre: Optional[str],
+        length: Optional[str],
+        deadline: Optional[float],
+        variant: Optional[str],
+    ) -> str:
+        """Everything that shapes the story, so only truly identical runs are coalesced."""
+        settings = {
+            "request": " ".join(request.split()),
+            "retries": retries,
+            "genre": genre,
+            "length": length,
+            "deadline": self.deadline if deadline is None else deadline,
+            "variant": variant,
+            "api_key": self.generator.api_key or "",
+            "writer_temperature": self.generator.writer_temperature,
+            "judge_temperature": self.judge.judge_temperature,
+            "options": [
+                self.parallel_drafts,
+                self.early_illustration,
+                self.fused_review,
+                self.paragraph_refine,
+                self.prejudge is not None,
+                self.converge,
+                self.incremental_judging,
+                self.adaptive_budget is not None,
+            ],
+        }
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _draw(self, text: str, deadline: Deadline) -> Tuple[str, Optional[str]]:
+        """Illustration prompt and image for ``text``; no image when out of time or on failure."""
+        image_prompt = ""
+        if not text or not deadline.affords("illustration", "image"):
+            return image_prompt, None
+        try:
+            image_prompt = self.generator.illustration_prompt(text)
+            _emit(IllustrationPrompt(image_prompt))
+            image_url = self.image_generator.generate_image(image_prompt, timeout=deadline.timeout(IMAGE_TIMEOUT))
+        except Cancelled:
+            raise
+        except Exception:
+            return image_prompt, None
+        if image_url:
+            _emit(ImageReady(image_url))
+        return image_prompt, image_url
+
+    def _early_draw(self, outline: str, deadline: Deadline) -> Tuple[str, Optional[str]]:
+        # Speculative (it may be redrawn after review), so it yields to interactive calls.
+        with use_workload(PREFETCH):
+            return self._draw(outline, deadline)
+
+    def _illustrate(self, results: Dict[str, Any], deadline: Deadline):
+        image_prompt, image_url = self._draw(results["review"].draft, deadline)
+        if image_url is None:
+            deadline.degrade("illustration")
+        return image_prompt, image_url
+
+    def _settle_illustration(self, results: Dict[str, Any], deadline: Deadline):
+        review: _Review = results["review"]
+        early = results["early_illustration"]
+        if early[1] is not None and not review.changed_materially():
+            return early
+        return _fall_back(self._draw(review.draft, deadline), early, deadline)
+
+    def _best_of_drafts(self, request: str, outline: str, genre: Optional[str], length: Optional[str]):
+        def draft_and_judge(_):
+            # Bypass the response cache so every candidate is a genuinely new draft.
+            draft = self.generator.write_story(request, outline, genre=genre, length=length, cache=False)
+            return draft, _prejudged(self.prejudge, draft, length) or self.judge.evaluate(draft)
+
+        with ThreadPoolExecutor(max_workers=self.parallel_drafts, thread_name_prefix="story-draft") as pool:
+            candidates = list(pool.map(carry_context(draft_and_judge), range(self.parallel_drafts)))
+        return _pick_best(candidates)
+
+    def run_batch(
+        self, jobs: Iterable[Union[StoryJob, tuple, dict, str]], concurrency: int = BATCH_CONCURRENCY
+    ) -> Iterator[BatchOutcome]:
+        """Run many stories on a bounded thread pool, yielding outcomes in completion order.
+
+        Jobs are pulled from ``jobs`` lazily, so arbitrarily large catalogs never
+        hold more than ``concurrency`` stories in flight. A failing job yields a
+        BatchOutcome with ``error`` set; the rest of the batch carries on.
+        """
+        concurrency = max(1, concurrency)
+        pending_jobs = enumerate(jobs)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="story-batch") as pool:
+            in_flight = {}
+
+            def submit_next() -> bool:
+                for index, raw in pending_jobs:
+                    try:
+                        job = StoryJob.coerce(raw)
+                    except Exception as exc:
+                        in_flight[pool.submit(_raise, exc)] = (index, StoryJob(request=str(raw)))
+                        return True
+                    future = pool.submit(
+                        workload_context(BATCH).run,
+                        self.run,
+                        job.request,
+                        retries=job.retries,
+                        genre=job.genre,
+                        length=job.length,
+                    )
+                    in_flight[future] = (index, job)
+                    return True
+                return False
+
+            while len(in_flight) < concurrency and submit_next():
+                pass
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, job = in_flight.pop(future)
+                    exc = future.exception()
+                    yield BatchOutcome(index=index, job=job, result=None if exc else future.result(), error=exc)
+                    submit_next()
+
+
+@dataclass
+class _Review:
+    first_draft: str
+    draft: str
+    feedback: StoryFeedback
+    feedback_history: List[StoryFeedback]
+    iterations: int = 0
+
+    def changed_materially(self, threshold: float = 0.6) -> bool:
+        """True when refinement rewrote enough of the story that an outline-based image may no longer fit."""
+        if self.iterations == 0:
+            return False
+        return difflib.SequenceMatcher(None, self.first_draft, self.draft).ratio() < threshold
+
+
+@dataclass
+class _Step:
+    # "evaluate" -> StoryFeedback, "review" -> (StoryFeedback, revision), "refine"/"patch" -> str
+    kind: str
+    draft: str
+    critique: str = ""
+    paragraphs: Tuple[int, ...] = ()
+
+
+def _patchable(feedback: StoryFeedback, draft: str) -> bool:
+    flagged = feedback.flagged_paragraphs
+    return bool(flagged) and len(flagged) * 2 <= len(split_paragraphs(draft))
+
+
+@dataclass
+class _ReviewPolicy:
+    fused: bool = False
+    by_paragraph: bool = False
+    prejudge: Optional[PreJudge] = None
+    length: Optional[str] = None
+    # Stop once the score fails to beat the best so far ``patience`` rounds in a row,
+    # keep the best draft, and feed every earlier critique into each refinement.
+    converge: bool = False
+    patience: int = 1
+    deadline: Optional[Deadline] = None
+
+
+def _judge_steps(draft: str, policy: _ReviewPolicy, revise: bool):
+    """Judge one draft: locally when the pre-judge is decisive, else via an "evaluate" or "review" step.
+
+    Always returns (feedback, revision-or-None).
+    """
+    feedback = _prejudged(policy.prejudge, draft, policy.length)
+    if feedback is not None:
+        return feedback, None
+    if policy.fused and revise:
+        return (yield _Step("review", draft))
+    return (yield _Step("evaluate", draft)), None
+
+
+def _prejudged(prejudge: Optional[PreJudge], draft: str, length: Optional[str]) -> Optional[StoryFeedback]:
+    """The local screen's verdict as feedback, or None when the LLM judge has to decide."""
+    if prejudge is None:
+        return None
+    screen = prejudge.screen(draft, length)
+    if not screen.decisive:
+        return None
+    return StoryFeedback(approved=screen.verdict == "pass", critique=screen.critique, score=screen.score)
+
+
+def _review_steps(
+    draft: str,
+    retries: int,
+    policy: _ReviewPolicy,
+    feedback: Optional[StoryFeedback] = None,
+) -> Generator[_Step, Any, _Review]:
+    """The judge/refine loop as a step generator, so sync and async orchestrators share one policy.
+
+    Each yielded _Step is performed by the caller and its result sent back in.
+    A call that runs out of time is thrown back in instead; under a deadline
+    the review then stops with what it has, so the draft is never lost.
+    """
+    review = _Review(first_draft=draft, draft=draft, feedback=feedback, feedback_history=[])
+    best_draft, best_feedback = draft, feedback
+    try:
+        revision = None
+        if feedback is None:
+            review.feedback, revision = yield from _judge_steps(draft, policy, revise=retries > 0)
+            best_feedback = review.feedback
+        review.feedback_history.append(review.feedback)
+        _emit(JudgeVerdict(0, review.feedback))
+        stalled = 0
+        while not review.feedback.approved and review.iterations < retries:
+            # A fused review already produced the revision, so only the judge round is left to pay for.
+            round_cost = ("judge",) if revision else ("refine", "judge")
+            if policy.deadline is not None and not policy.deadline.affords(*round_cost):
+                policy.deadline.degrade("review")
+                break
+            critique = _accumulated_critique(review.feedback_history) if policy.converge else review.feedback.critique
+            if revision is None and policy.by_paragraph and _patchable(review.feedback, review.draft):
+                flagged = tuple(review.feedback.flagged_paragraphs)
+                revision = yield _Step("patch", review.draft, critique, flagged)
+            elif revision is None:
+                revision = yield _Step("refine", review.draft, critique)
+            review.draft, revision = revision, None
+            review.iterations += 1
+            _emit(DraftRefined(review.iterations, review.draft))
+            review.feedback, revision = yield from _judge_steps(review.draft, policy, revise=review.iterations < retries)
+            review.feedback_history.append(review.feedback)
+            _emit(JudgeVerdict(review.iterations, review.feedback))
+            if not policy.converge:
+                continue
+            if _rank(review.feedback) > _rank(best_feedback):
+                best_draft, best_feedback, stalled = review.draft, review.feedback, 0
+            else:
+                stalled += 1
+                if stalled >= policy.patience:
+                    break
+    except _OUT_OF_TIME:
+        if policy.deadline is None:
+            raise
+        policy.deadline.degrade("review")
+        if review.feedback is None:
+            review.feedback = StoryFeedback(approved=False, critique=_UNREVIEWED, score=0)
+            return review
+    if policy.converge and _rank(best_feedback) > _rank(review.feedback):
+        review.draft, review.feedback = best_draft, best_feedback
+    return review
+
+
+def _fall_back(redrawn: Tuple[str, Optional[str]], early: Tuple[str, Optional[str]], deadline: Deadline):
+    """A redrawn illustration, else the outline-based one; degraded only when there is no image at all."""
+    if redrawn[1] is not None:
+        return redrawn
+    if early[1] is not None:
+        return early
+    deadline.degrade("illustration")
+    return redrawn
+
+
+# Calls cut short by the run's deadline, or not sent because of it.
+_OUT_OF_TIME = (DeadlineExceeded, APITimeoutError)
+_UNREVIEWED = "Not reviewed: the run's deadline ran out before the judge could finish."
+
+
+def _skip_outline(length: Optional[str], deadline: Deadline) -> bool:
+    """Short stories can do without an outline when it would squeeze the required stages."""
+    if length == "short" and not deadline.affords("outline", "story", "judge", "image"):
+        deadline.degrade("outline")
+        return True
+    return False
+
+
+def _rank(feedback: StoryFeedback) -> Tuple[bool, int]:
+    return feedback.approved, feedback.score
+
+
+def _accumulated_critique(history: List[StoryFeedback]) -> str:
+    """Latest critique plus earlier distinct ones, so a revision does not undo previous fixes."""
+    latest = history[-1].critique
+    earlier = []
+    for fb in history[:-1]:
+        text = fb.critique.strip()
+        if text and not fb.approved and text != latest and text not in earlier and not text.startswith("Invalid JSON"):
+            earlier.append(text)
+    if not earlier:
+        return latest
+    return latest + "\n\nAlso keep these fixes from earlier reviews:\n" + "\n".join(f"- {c}" for c in earlier)
+
+
+def _pick_best(candidates):
+    return max(candidates, key=lambda c: (c[1].approved, c[1].score))
+
+
+def _raise(exc: BaseException):
+    raise exc
+
+
+async def _araise(exc: BaseException):
+    raise exc
+
+
+def _collect_stream(chunks: Iterator[str], on_text: Callable[[str], None]) -> str:
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        on_text(text)
+    return text
+
+
+class AsyncStoryGenerator(StoryGenerator):
+    """Coroutine twin of StoryGenerator; prompts are shared, only transport differs."""
+
+    async def create_outline(self, request: str, genre: Optional[str] = None, length: Optional[str] = None) -> str:
+        return await acall_llm(**self._outline_call(request, genre, length), api_key=self.api_key, cancel=self.cancel_token)
+
+    async def write_story(
+        self,
+        request: str,
+        outline: Optional[str],
+        genre: Optional[str] = None,
+        length: Optional[str] = None,
+        cache: Optional[bool] = None,
+    ) -> str:
+        return await acall_llm(**self._story_call(request, outline, genre, length), api_key=self.api_key, cache=cache, cancel=self.cancel_token)
+
+    async def refine_story(self, draft: str, critique: str) -> str:
+        return await acall_llm(**self._refine_call(draft, critique), api_key=self.api_key, cancel=self.cancel_token)
+
+    async def illustration_prompt(self, story: str) -> str:
+        return await acall_llm(**self._illustration_call(story), api_key=self.api_key, cancel=self.cancel_token)
+
+    async def refine_paragraphs(self, draft: str, critique: str, flagged: Iterable[int], parallel: bool = True) -> str:
+        paragraphs = split_paragraphs(draft)
+        targets = sorted({i for i in flagged if 0 <= i < len(paragraphs)})
+        if not targets:
+            return draft
+        calls = [acall_llm(**self._paragraph_call(paragraphs, i, critique), api_key=self.api_key, cancel=self.cancel_token) for i in targets]
+        if parallel:
+            rewritten = await asyncio.gather(*calls)
+        else:
+            rewritten = [await call for call in calls]
+        return _splice_paragraphs(paragraphs, targets, rewritten)
+
+
+class AsyncStoryJudge(StoryJudge):
+    async def evaluate(self, story: str) -> StoryFeedback:
+        call, finish = self._evaluation(story)
+        return self._held_to_bar(finish(await acall_llm(**call, api_key=self.api_key, cancel=self.cancel_token)))
+
+    async def evaluate_and_revise(self, story: str) -> Tuple[StoryFeedback, Optional[str]]:
+        raw = await acall_llm(**self._review_call(story), api_key=self.api_key, cancel=self.cancel_token)
+        feedback, revised = _parse_review(raw)
+        return self._held_to_bar(feedback), revised
+
+
+class AsyncImageGenerator(ImageGenerator):
+    async def generate_image(self, prompt: str, timeout: Optional[float] = None) -> Optional[str]:
+        key = resolve_api_key(self.api_key)
+        client = _async_client(key)
+        span, stats = CallSpan(stage="image", model="dall-e-3", wall=0.0), CallStats()
+        request = get_scheduler().acall(
+            "images",
+            key,
+            lambda: client.images.generate(
+                model="dall-e-3",
+                prompt=prompt,
+                size=self.size,
+                n=1,
+                timeout=NOT_GIVEN if timeout is None else timeout,
+            ),
+            stats=stats,
         )
+        started = time.monotonic()
+        try:
+            resp = await (self.cancel_token.arun(request) if self.cancel_token is not None else request)
+        except Exception as exc:
+            _finish_span(span, started, stats, error=exc)
+            raise
+        _finish_span(span, started, stats)
+        return _image_url(resp)
+
+
+class AsyncStoryOrchestrator(StoryOrchestrator):
+    """Same pipeline as StoryOrchestrator, but awaitable.
+
+    Each run only holds the event loop while building prompts, so a single
+    loop can drive many generations concurrently (e.g. via asyncio.gather).
+    Stage layout, review policy and result assembly are inherited; only the
+    steps that call the API are coroutines here. ``on_text`` receives each
+    draft and refinement once it is complete rather than chunk by chunk.
+    """
+
+    def _components(self) -> tuple:
+        return AsyncStoryGenerator, AsyncStoryJudge, AsyncImageGenerator
+
+    async def run(
+        self,
+        request: str,
+        retries: int = 2,
+        genre: Optional[str] = None,
+        length: Optional[str] = None,
+        on_text: Optional[Callable[[str], None]] = None,
+        deadline: Optional[float] = None,
+        variant: Optional[str] = None,
+    ) -> StoryResult:
+        if self.single_flight is None:
+            return await self._run(request, retries, genre, length, on_text, deadline)
+        key = self._flight_key(request, retries, genre, length, deadline, variant)
+        try:
+            result, shared = await self.single_flight.ado(
+                key, lambda: self._run(request, retries, genre, length, on_text, deadline)
+            )
+        except Cancelled:
+            self._checkpoint()
+            return await self._run(request, retries, genre, length, on_text, deadline)
+        self._checkpoint()
+        if shared and on_text:
+            on_text(result.final_story)
+        return result
+
+    async def run_iter(
+        self,
+        request: str,
+        retries: int = 2,
+        genre: Optional[str] = None,
+        length: Optional[str] = None,
+        deadline: Optional[float] = None,
+        variant: Optional[str] = None,
+        stream: bool = False,
+    ) -> AsyncIterator[StoryEvent]:
+        """Async counterpart of StoryOrchestrator.run_iter; closing the iterator cancels the run."""
+        loop = asyncio.get_running_loop()
+        events: "asyncio.Queue[Optional[StoryEvent]]" = asyncio.Queue()
+
+        async def work():
+            _event_sink.set(lambda event: loop.call_soon_threadsafe(events.put_nowait, event))
+            on_text = (lambda text: _emit(StoryText(text))) if stream else None
+            return await self.run(request, retries, genre, length, on_text, deadline, variant)
+
+        task = asyncio.ensure_future(work())
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    yield StoryDone(task.result())
+                    return
+                yield event
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def _run(
+        self,
+        request: str,
+        retries: int,
+        genre: Optional[str],
+        length: Optional[str],
+        on_text: Optional[Callable[[str], None]],
+        deadline: Optional[float],
+    ) -> StoryResult:
+        retries, judge_temperature, min_score = self._plan_budget(genre, length, retries)
+        budget = Deadline(self.deadline if deadline is None else deadline)
+        stages = self._stages(request, retries, genre, length, on_text, budget, judge_temperature, min_score)
+        trace = Trace()
+        with use_trace(trace), use_deadline(budget):
+            results = await arun_stages(stages, checkpoint=self._checkpoint, timings=trace.stages)
+        return self._finish(request, genre, length, results, budget, trace)
+
+    async def _write_and_review(
+        self,
+        request: str,
+        outline: str,
+        retries: int,
+        genre: Optional[str],
+        length: Optional[str],
+        on_text: Optional[Callable[[str], None]],
+        deadline: Optional[Deadline] = None,
+        judge_temperature: Optional[float] = None,
+        min_score: Optional[int] = None,
+    ) -> _Review:
+        self.judge.begin_run(judge_temperature, min_score)
+        feedback = None
+        with unbounded():
+            if self.parallel_drafts > 1:
+                draft, feedback = await self._best_of_drafts(request, outline, genre, length)
+            else:
+                draft = await self.generator.write_story(request, outline, genre=genre, length=length)
+        if on_text:
+            on_text(draft)
+        _emit(DraftReady(draft))
+        steps = _review_steps(draft, retries, self._review_policy(length, deadline), feedback)
+        try:
+            step = next(steps)
+            while True:
+                self._checkpoint()
+                try:
+                    outcome = await self._perform(step, on_text)
+                except _OUT_OF_TIME as exc:
+                    step = steps.throw(exc)
+                else:
+                    step = steps.send(outcome)
+        except StopIteration as done:
+            return done.value
+
+    async def _perform(self, step: _Step, on_text: Optional[Callable[[str], None]]):
+        if step.kind == "evaluate":
+            return await self.judge.evaluate(step.draft)
+        if step.kind == "review":
+            feedback, revised = await self.judge.evaluate_and_revise(step.draft)
+            if revised and on_text:
+                on_text(revised)
+            return feedback, revised
+        if step.kind == "patch":
+            text = await self.generator.refine_paragraphs(step.draft, step.critique, step.paragraphs)
+        else:
+            text = await self.generator.refine_story(step.draft, step.critique)
+        if on_text:
+            on_text(text)
+        return text
+
+    async def _outline(self, request: str, genre: Optional[str], length: Optional[str], deadline: Deadline) -> str:
+        if _skip_outline(length, deadline):
+            return ""
+        with unbounded():
+            outline = await self.generator.create_outline(request, genre=genre, length=length)
+        _emit(OutlineReady(outline))
+        return outline
+
+    async def _draw(self, text: str, deadline: Deadline) -> Tuple[str, Optional[str]]:
+        image_prompt = ""
+        if not text or not deadline.affords("illustration", "image"):
+            return image_prompt, None
+        try:
+            image_prompt = await self.generator.illustration_prompt(text)
+            _emit(IllustrationPrompt(image_prompt))
+            image_url = await self.image_generator.generate_image(image_prompt, timeout=deadline.timeout(IMAGE_TIMEOUT))
+        except Cancelled:
+            raise
+        except Exception:
+            return image_prompt, None
+        if image_url:
+            _emit(ImageReady(image_url))
+        return image_prompt, image_url
+
+    async def _early_draw(self, outline: str, deadline: Deadline) -> Tuple[str, Optional[str]]:
+        with use_workload(PREFETCH):
+            return await self._draw(outline, deadline)
+
+    async def _illustrate(self, results: Dict[str, Any], deadline: Deadline):
+        image_prompt, image_url = await self._draw(results["review"].draft, deadline)
+        if image_url is None:
+            deadline.degrade("illustration")
+        return image_prompt, image_url
+
+    async def _settle_illustration(self, results: Dict[str, Any], deadline: Deadline):
+        review: _Review = results["review"]
+        early = results["early_illustration"]
+        if early[1] is not None and not review.changed_materially():
+            return early
+        return _fall_back(await self._draw(review.draft, deadline), early, deadline)
+
+    async def _best_of_drafts(self, request: str, outline: str, genre: Optional[str], length: Optional[str]):
+        async def draft_and_judge():
+            draft = await self.generator.write_story(request, outline, genre=genre, length=length, cache=False)
+            return draft, _prejudged(self.prejudge, draft, length) or await self.judge.evaluate(draft)
+
+        candidates = await asyncio.gather(*(draft_and_judge() for _ in range(self.parallel_drafts)))
+        return _pick_best(candidates)
+
+    async def run_batch(
+        self, jobs: Iterable[Union[StoryJob, tuple, dict, str]], concurrency: int = BATCH_CONCURRENCY
+    ) -> AsyncIterator[BatchOutcome]:
+        """Async counterpart of StoryOrchestrator.run_batch on a single event loop."""
+        concurrency = max(1, concurrency)
+        pending_jobs = enumerate(jobs)
+        in_flight: Dict[asyncio.Task, tuple] = {}
+
+        def submit_next() -> bool:
+            for index, raw in pending_jobs:
+                try:
+                    job = StoryJob.coerce(raw)
+                    coro = self.run(job.request, retries=job.retries, genre=job.genre, length=job.length)
+                except Exception as exc:
+                    job, coro = StoryJob(request=str(raw)), _araise(exc)
+                in_flight[workload_context(BATCH).run(asyncio.ensure_future, coro)] = (index, job)
+                return True
+            return False
+
+        while len(in_flight) < concurrency and submit_next():
+            pass
+        try:
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, job = in_flight.pop(task)
+                    exc = task.exception()
+                    yield BatchOutcome(index=index, job=job, result=None if exc else task.result(), error=exc)
+                    submit_next()
+        finally:
+            for task in in_flight:
+                task.cancel()
@@ -29,11 +29,9 @@ def generate_audio_for_text(text: str) -> str:
     if text_key in st.session_state.audio_cache:
         return st.session_state.audio_cache[text_key]
     try:
-        from openai import OpenAI
+        from story_engine import narrate
 
-        client = OpenAI(api_key=api_key)
-        response = client.audio.speech.create(model="tts-1", voice="fable", input=text)
-        audio_b64 = base64.b64encode(response.content).decode("utf-8")
+        audio_b64 = base64.b64encode(narrate(text, api_key)).decode("utf-8")
         st.session_state.audio_cache[text_key] = audio_b64
         return audio_b64
     except Exception as e:
@@ -83,6 +81,41 @@ with st.sidebar:
         key="judge_passes",
         help="Total number of judge reviews (includes the first pass).",
     )
+    st.toggle(
+        "Auto Judge Passes",
+        key="adaptive_passes",
+        help="Learn from past stories how many judge passes actually help; Judge Passes becomes the maximum.",
+    )
+    st.slider(
+        "Time Budget (s)",
+        min_value=30,
+        max_value=180,
+        step=10,
+        key="time_budget",
+        help="When time runs short, skip extra judge passes and the illustration rather than keep you waiting.",
+    )
+    st.slider(
+        "Parallel Drafts",
+        min_value=1,
+        max_value=4,
+        key="parallel_drafts",
+        help="Write several drafts at once and keep the judge's favourite. Faster, but uses more tokens.",
+    )
+    st.toggle(
+        "Quick Revisions",
+        key="fused_review",
+        help="Let the judge rewrite rejected drafts in the same call instead of a separate editor pass.",
+    )
+    st.toggle(
+        "Targeted Edits",
+        key="paragraph_refine",
+        help="Only rewrite the paragraphs the judge flags instead of the whole story.",
+    )
+    st.toggle(
+        "Local Pre-check",
+        key="prejudge",
+        help="Screen drafts for length, reading level and unsuitable words before asking the AI judge.",
+    )
     st.select_slider("Story Length", options=["short", "medium", "long"], key="length")
 
 
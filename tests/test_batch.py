@@ -0,0 +1,105 @@
+import io
+import json
+from unittest.mock import MagicMock
+
+from batch import JsonlWriter, completed_ids, run_jsonl_batch
+from main import _parse_args
+from story_engine import StoryFeedback, StoryOrchestrator, StoryResult
+
+
+def _result(request, **kwargs):
+    feedback = StoryFeedback(approved=True, critique="PASS", score=9)
+    return StoryResult(
+        request=request,
+        outline="Outline",
+        draft="Draft",
+        final_story=f"Story for {request}",
+        feedback=feedback,
+        image_prompt="Prompt",
+        image_url=None,
+        iterations=0,
+        genre=kwargs.get("genre"),
+        length=kwargs.get("length"),
+        feedback_history=[feedback],
+    )
+
+
+def _orchestrator(api_key, fail=()):
+    orch = StoryOrchestrator(api_key=api_key)
+
+    def run(request, **kwargs):
+        if request in fail:
+            raise RuntimeError("boom")
+        return _result(request, **kwargs)
+
+    orch.run = MagicMock(side_effect=run)
+    return orch
+
+
+def _lines(*jobs):
+    return [json.dumps(job) + "\n" for job in jobs]
+
+
+class TestJsonlBatch:
+    """Tests for the resumable JSONL batch mode."""
+
+    def test_writes_one_record_per_job(self, api_key):
+        out = io.StringIO()
+        orch = _orchestrator(api_key, fail={"bad"})
+
+        counts = run_jsonl_batch(
+            _lines({"id": "a", "request": "dragon", "length": "short"}, "a plain prompt", {"request": "bad"}),
+            JsonlWriter(out, durable=False),
+            orch,
+            concurrency=2,
+            defaults={"genre": "🐉 Adventure", "length": "medium", "retries": None},
+        )
+
+        records = {r["id"]: r for r in map(json.loads, out.getvalue().splitlines())}
+        assert counts == {"ok": 2, "error": 1, "skipped": 0}
+        assert records["a"]["status"] == "ok"
+        assert records["a"]["length"] == "short"
+        assert records["a"]["genre"] == "🐉 Adventure"
+        assert records["a"]["feedback_history"][0]["critique"] == "PASS"
+        assert records["2"]["request"] == "a plain prompt"
+        assert records["3"] == {"id": "3", "status": "error", "request": "bad", "error": "RuntimeError: boom"}
+
+    def test_invalid_lines_are_reported_not_fatal(self, api_key):
+        out = io.StringIO()
+
+        counts = run_jsonl_batch(
+            ["{not json\n", "\n", json.dumps({"prompt": "x"}) + "\n", json.dumps("ok") + "\n"],
+            JsonlWriter(out, durable=False),
+            _orchestrator(api_key),
+        )
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert counts == {"ok": 1, "error": 2, "skipped": 0}
+        assert [r["id"] for r in records if r["status"] == "error"] == ["1", "3"]
+
+    def test_resume_skips_finished_jobs(self, api_key, tmp_path):
+        path = str(tmp_path / "out.jsonl")
+        jobs = _lines({"id": "a", "request": "one"}, {"id": "b", "request": "two"}, {"id": "c", "request": "three"})
+        first = _orchestrator(api_key, fail={"two"})
+        writer = JsonlWriter.append(path)
+        run_jsonl_batch(jobs, writer, first, concurrency=1)
+        writer.close()
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write('{"id": "c", "status": "ok", "fin')  # crash mid-write
+
+        assert completed_ids(path) == {"a", "c"}
+
+        second = _orchestrator(api_key)
+        writer = JsonlWriter.append(path)
+        counts = run_jsonl_batch(jobs, writer, second, skip=completed_ids(path))
+        writer.close()
+
+        assert counts == {"ok": 1, "error": 0, "skipped": 2}
+        assert [c.args[0] for c in second.run.call_args_list] == ["two"]
+        assert completed_ids(path) == {"a", "b", "c"}
+
+
+def test_parse_args_defaults_to_interactive():
+    assert _parse_args([]).batch is None
+    args = _parse_args(["--batch", "-", "--output", "out.jsonl", "--concurrency", "8"])
+    assert (args.batch, args.output, args.concurrency) == ("-", "out.jsonl", 8)
@@ -0,0 +1,128 @@
+from unittest.mock import patch
+
+from llm.cache import MemoryCache, ResponseCache, SQLiteCache, cache_key
+from story_engine import call_llm
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+MESSAGES = [{"role": "user", "content": "Outline a dragon story"}]
+
+
+class TestCacheKey:
+    """Tests for content-addressed keys."""
+
+    def test_stable_for_identical_requests(self):
+        assert cache_key("m", MESSAGES, 0.6, 200) == cache_key("m", list(MESSAGES), 0.6, 200)
+
+    def test_changes_with_any_parameter(self):
+        base = cache_key("m", MESSAGES, 0.6, 200)
+        assert cache_key("other", MESSAGES, 0.6, 200) != base
+        assert cache_key("m", MESSAGES, 0.7, 200) != base
+        assert cache_key("m", MESSAGES, 0.6, 300) != base
+
+
+class TestMemoryCache:
+    """Tests for the in-process LRU tier."""
+
+    def test_lru_eviction(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.stats.evictions == 1
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = MemoryCache(ttl=10, clock=clock)
+        cache.set("a", "1")
+        clock.now += 11
+
+        assert cache.get("a") is None
+        assert cache.stats.misses == 1
+
+
+class TestSQLiteCache:
+    """Tests for the persistent disk tier."""
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        SQLiteCache(path).set("a", "story")
+
+        assert SQLiteCache(path).get("a") == "story"
+
+    def test_trims_to_max_entries(self, tmp_path):
+        clock = FakeClock()
+        cache = SQLiteCache(str(tmp_path / "cache.db"), max_entries=2, clock=clock)
+        for key in ("a", "b", "c"):
+            clock.now += 1
+            cache.set(key, key.upper())
+
+        assert len(cache) == 2
+        assert cache.get("a") is None
+
+    def test_ttl_expiry(self, tmp_path):
+        clock = FakeClock()
+        cache = SQLiteCache(str(tmp_path / "cache.db"), ttl=5, clock=clock)
+        cache.set("a", "1")
+        clock.now += 6
+
+        assert cache.get("a") is None
+
+
+class TestResponseCache:
+    """Tests for the tiered cache and its bypass policy."""
+
+    def test_disk_hit_promotes_to_memory(self, tmp_path):
+        disk = SQLiteCache(str(tmp_path / "cache.db"))
+        disk.set("a", "1")
+        cache = ResponseCache(disk=disk)
+
+        assert cache.get("a") == "1"
+        assert cache.memory.get("a") == "1"
+        assert cache.stats.hits == 1
+
+    def test_high_temperature_bypasses_by_default(self):
+        cache = ResponseCache(max_temperature=0.7)
+
+        assert cache.should_cache(0.6) is True
+        assert cache.should_cache(0.85) is False
+        assert cache.should_cache(0.85, requested=True) is True
+        assert cache.should_cache(0.1, requested=False) is False
+
+
+class TestCallLlmCaching:
+    """Tests for the cache layer under call_llm."""
+
+    @patch("story_engine._client")
+    @patch("story_engine.get_cache")
+    def test_repeated_call_served_from_cache(self, mock_get_cache, mock_client_fn, mock_openai_client, api_key):
+        mock_get_cache.return_value = ResponseCache()
+        mock_client_fn.return_value = mock_openai_client
+
+        first = call_llm(MESSAGES, temperature=0.6, max_tokens=200, api_key=api_key)
+        second = call_llm(MESSAGES, temperature=0.6, max_tokens=200, api_key=api_key)
+
+        assert first == second == "Once upon a time..."
+        assert mock_openai_client.chat.completions.create.call_count == 1
+
+    @patch("story_engine._client")
+    @patch("story_engine.get_cache")
+    def test_bypass_always_calls_api(self, mock_get_cache, mock_client_fn, mock_openai_client, api_key):
+        mock_get_cache.return_value = ResponseCache()
+        mock_client_fn.return_value = mock_openai_client
+
+        call_llm(MESSAGES, temperature=0.6, api_key=api_key, cache=False)
+        call_llm(MESSAGES, temperature=0.6, api_key=api_key, cache=False)
+
+        assert mock_openai_client.chat.completions.create.call_count == 2
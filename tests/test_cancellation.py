@@ -0,0 +1,186 @@
+import asyncio
+import threading
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from cancellation import CancelToken, Cancelled
+from llm.fairness import FairnessPolicy, FairScheduler
+from llm.ratelimit import EndpointLimits, RateLimitScheduler, RetryPolicy
+
+
+class TestCancelToken:
+    """Tests for cooperative cancellation."""
+
+    def test_raise_if_cancelled(self):
+        token = CancelToken()
+        token.raise_if_cancelled()
+
+        token.cancel("user left")
+
+        with pytest.raises(Cancelled, match="user left"):
+            token.raise_if_cancelled()
+
+    def test_callbacks_run_once_and_can_unregister(self):
+        token = CancelToken()
+        kept, dropped = MagicMock(), MagicMock()
+        token.on_cancel(kept)
+        token.on_cancel(dropped)()
+
+        token.cancel()
+        token.cancel()
+
+        kept.assert_called_once()
+        dropped.assert_not_called()
+
+    def test_run_returns_result(self):
+        assert CancelToken().run(lambda: 42) == 42
+
+    def test_run_stops_waiting_when_cancelled(self):
+        token = CancelToken()
+        release = threading.Event()
+        threading.Timer(0.05, token.cancel).start()
+
+        with pytest.raises(Cancelled):
+            token.run(lambda: release.wait(5))
+        release.set()
+
+    def test_abandoned_calls_do_not_block_new_ones(self):
+        release = threading.Event()
+        for _ in range(40):
+            token = CancelToken()
+            threading.Timer(0.001, token.cancel).start()
+            with pytest.raises(Cancelled):
+                token.run(lambda: release.wait(5))
+
+        result = []
+        caller = threading.Thread(target=lambda: result.append(CancelToken().run(lambda: 42)))
+        caller.start()
+        caller.join(1)
+        release.set()
+        assert result == [42]
+
+    def test_arun_cancels_the_task(self):
+        token = CancelToken()
+        aborted = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                aborted.append(True)
+                raise
+
+        async def main():
+            asyncio.get_running_loop().call_later(0.02, token.cancel)
+            await token.arun(slow())
+
+        with pytest.raises(Cancelled):
+            asyncio.run(main())
+        assert aborted == [True]
+
+
+class TestCancelledCalls:
+    """Tests that a cancelled token keeps queued and retrying calls off the wire."""
+
+    def test_queued_call_is_never_sent(self):
+        fairness = FairScheduler(FairnessPolicy(max_concurrent=1))
+        scheduler = RateLimitScheduler(fairness=fairness)
+        token = CancelToken()
+        fn = MagicMock(return_value="sent")
+        errors = []
+
+        def queued():
+            try:
+                scheduler.call("chat", "k", fn, cancel=token)
+            except Cancelled as exc:
+                errors.append(exc)
+
+        with fairness.slot("k"):
+            caller = threading.Thread(target=queued)
+            caller.start()
+            while fairness.stats("k")["waiting"] == 0:
+                threading.Event().wait(0.001)
+            token.cancel("stop")
+            caller.join(1)
+            assert fairness.stats("k")["waiting"] == 0
+
+        assert len(errors) == 1
+        fn.assert_not_called()
+        assert fairness.stats("k")["in_flight"] == 0
+
+    def test_no_retry_after_cancel_during_backoff(self):
+        import openai
+
+        limited = openai.RateLimitError(
+            "slow down", response=MagicMock(status_code=429, headers={"retry-after": "30"}), body=None
+        )
+        scheduler = RateLimitScheduler(retry=RetryPolicy(max_attempts=3))
+        token = CancelToken()
+        fn = MagicMock(side_effect=[limited, "ok"])
+        threading.Timer(0.05, token.cancel).start()
+
+        with pytest.raises(Cancelled):
+            scheduler.call("chat", "k", fn, cancel=token)
+        assert fn.call_count == 1
+
+    def test_rate_limit_wait_ends_on_cancel(self):
+        scheduler = RateLimitScheduler(limits={"chat": EndpointLimits(requests_per_minute=1)})
+        scheduler.call("chat", "k", lambda: "first")
+        token = CancelToken()
+        fn = MagicMock()
+        threading.Timer(0.05, token.cancel).start()
+
+        with pytest.raises(Cancelled):
+            scheduler.call("chat", "k", fn, cancel=token)
+        fn.assert_not_called()
+
+
+class TestCancelledGeneration:
+    """Tests for cancellation threaded through the story pipeline."""
+
+    @patch("story_engine._client")
+    def test_stream_is_closed_on_cancel(self, mock_client_fn, api_key):
+        from story_engine import stream_llm
+
+        token = CancelToken()
+
+        def chunk(text):
+            c = MagicMock()
+            c.choices[0].delta.content = text
+            return c
+
+        stream = MagicMock()
+        stream.__iter__.return_value = iter([chunk("Once"), chunk(" upon")])
+        mock_client_fn.return_value.chat.completions.create.return_value = stream
+        chunks = stream_llm([{"role": "user", "content": "hi"}], api_key=api_key, cancel=token)
+
+        assert next(chunks) == "Once"
+        token.cancel()
+        with pytest.raises(Cancelled):
+            next(chunks)
+        stream.close.assert_called_once()
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_cancel_skips_remaining_stages(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        from story_engine import StoryFeedback, StoryOrchestrator
+
+        token = CancelToken()
+        mock_gen = mock_gen_class.return_value
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "Draft"
+
+        def judge_then_leave(_):
+            token.cancel("tab closed")
+            return StoryFeedback(approved=False, critique="Softer", score=4)
+
+        mock_judge_class.return_value.evaluate.side_effect = judge_then_leave
+
+        with pytest.raises(Cancelled):
+            StoryOrchestrator(api_key=api_key, cancel_token=token).run("Request", retries=2)
+
+        mock_gen.refine_story.assert_not_called()
+        mock_image_class.return_value.generate_image.assert_not_called()
+        assert mock_gen_class.call_args.kwargs["cancel_token"] is token
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+
+from llm.clients import ClientRegistry, PoolConfig, get_client, resolve_api_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestClientRegistry:
+    """Tests for pooled client reuse and idle eviction."""
+
+    @patch.object(ClientRegistry, "_build")
+    def test_reuses_client_per_key(self, mock_build):
+        mock_build.side_effect = lambda key: MagicMock(name=key)
+        registry = ClientRegistry(PoolConfig())
+
+        first = registry.get("key-a")
+        second = registry.get("key-a")
+        other = registry.get("key-b")
+
+        assert first is second
+        assert other is not first
+        assert mock_build.call_count == 2
+
+    @patch.object(ClientRegistry, "_build")
+    def test_evicts_idle_clients(self, mock_build):
+        mock_build.side_effect = lambda key: MagicMock(name=key)
+        clock = FakeClock()
+        registry = ClientRegistry(PoolConfig(idle_ttl=10), clock=clock)
+
+        stale = registry.get("key-a")
+        clock.now = 11
+        fresh = registry.get("key-a")
+
+        assert fresh is not stale
+        stale.close.assert_called_once()
+        assert len(registry) == 1
+
+    @patch.object(ClientRegistry, "_build")
+    def test_configure_closes_existing(self, mock_build):
+        client = MagicMock()
+        mock_build.return_value = client
+        registry = ClientRegistry(PoolConfig())
+        registry.get("key-a")
+
+        registry.configure(PoolConfig(max_connections=5))
+
+        client.close.assert_called_once()
+        assert len(registry) == 0
+        assert registry.config.max_connections == 5
+
+    def test_build_applies_pool_limits(self):
+        registry = ClientRegistry(PoolConfig(max_retries=4))
+
+        client = registry.get("test-key")
+
+        assert client.api_key == "test-key"
+        assert client.max_retries == 4
+        registry.close()
+
+
+class TestKeyResolution:
+    """Tests for API key lookup."""
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_missing_key_raises(self):
+        with pytest.raises(RuntimeError):
+            resolve_api_key(None)
+
+    @patch.dict(os.environ, {"OPENAI_API_KEY": " env-key "})
+    def test_env_fallback(self):
+        assert resolve_api_key(None) == "env-key"
+
+    @patch("llm.clients._registry")
+    def test_get_client_uses_shared_registry(self, mock_registry, api_key):
+        get_client(api_key)
+
+        mock_registry.get.assert_called_once_with(api_key)
+
+
+class TestAsyncClients:
+    """Tests for per-event-loop async clients."""
+
+    @patch.object(ClientRegistry, "_build_async")
+    def test_async_clients_keyed_by_loop(self, mock_build):
+        mock_build.side_effect = lambda key: MagicMock(name=key)
+        registry = ClientRegistry(PoolConfig())
+
+        async def fetch_twice():
+            return registry.get_async("key-a"), registry.get_async("key-a")
+
+        first, second = asyncio.run(fetch_twice())
+        third, _ = asyncio.run(fetch_twice())
+
+        assert first is second
+        assert third is not first
+        assert mock_build.call_count == 2
+        assert len(registry) == 1
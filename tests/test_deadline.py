@@ -0,0 +1,111 @@
+import math
+from unittest.mock import MagicMock, patch
+
+import openai
+import pytest
+
+from deadline import Deadline, DeadlineExceeded, call_timeout, current_deadline, unbounded, use_deadline
+from llm.ratelimit import RateLimitScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDeadline:
+    """Tests for the per-run time budget."""
+
+    def test_unbounded_affords_everything(self):
+        deadline = Deadline()
+
+        assert deadline.remaining() == math.inf
+        assert deadline.affords("story", "judge", "image")
+        assert deadline.timeout(60.0) == 60.0
+
+    def test_affords_sums_stage_costs(self):
+        clock = FakeClock()
+        deadline = Deadline(30.0, costs={"judge": 10.0, "refine": 15.0}, clock=clock)
+
+        assert deadline.affords("refine", "judge")
+        clock.now = 10.0
+        assert not deadline.affords("refine", "judge")
+        assert deadline.affords("judge")
+        assert deadline.timeout(60.0) == 20.0
+
+    def test_no_timeout_once_time_is_up(self):
+        clock = FakeClock()
+        deadline = Deadline(10.0, clock=clock)
+
+        clock.now = 9.5
+        with pytest.raises(DeadlineExceeded):
+            deadline.timeout(60.0)
+
+    def test_degrade_records_each_stage_once(self):
+        deadline = Deadline(0.0)
+
+        deadline.degrade("review")
+        deadline.degrade("review")
+        deadline.degrade("illustration")
+
+        assert deadline.degraded == ["review", "illustration"]
+
+
+class TestRunDeadline:
+    """Tests for bounding every API call by the current run's deadline."""
+
+    def test_call_timeout_follows_the_current_deadline(self):
+        clock = FakeClock()
+
+        assert call_timeout(60.0) == 60.0
+        with use_deadline(Deadline(30.0, clock=clock)) as deadline:
+            assert current_deadline() is deadline
+            clock.now = 25.0
+            assert call_timeout(60.0) == 5.0
+        assert current_deadline() is None
+
+    def test_unbounded_lifts_the_deadline(self):
+        with use_deadline(Deadline(0.0)):
+            with unbounded():
+                assert call_timeout(60.0) == 60.0
+            with pytest.raises(DeadlineExceeded):
+                call_timeout(60.0)
+
+    @patch("story_engine._client")
+    def test_no_call_is_sent_past_the_deadline(self, mock_client_fn, api_key):
+        from story_engine import call_llm
+
+        with use_deadline(Deadline(0.0)):
+            with pytest.raises(DeadlineExceeded):
+                call_llm([{"role": "user", "content": "x"}], api_key=api_key, stage="judge")
+
+        mock_client_fn.return_value.chat.completions.create.assert_not_called()
+
+    @patch("story_engine._client")
+    def test_chat_calls_are_cut_to_the_deadline(self, mock_client_fn, api_key):
+        from story_engine import call_llm
+
+        create = mock_client_fn.return_value.chat.completions.create
+        create.return_value.choices[0].message.content = "Hi"
+        clock = FakeClock()
+
+        with use_deadline(Deadline(12.0, clock=clock)):
+            call_llm([{"role": "user", "content": "x"}], temperature=0.9, api_key=api_key, stage="story")
+
+        assert create.call_args.kwargs["timeout"] == 12.0
+
+    def test_no_retry_past_the_deadline(self):
+        limited = openai.RateLimitError(
+            "slow down", response=MagicMock(status_code=429, headers={"retry-after": "20"}), body=None
+        )
+        scheduler = RateLimitScheduler(sleep=lambda s: None)
+        fn = MagicMock(side_effect=[limited, "ok"])
+
+        with use_deadline(Deadline(10.0)):
+            with pytest.raises(openai.RateLimitError):
+                scheduler.call("chat", "k", fn)
+        assert fn.call_count == 1
+        assert scheduler.call("chat", "other-key", MagicMock(side_effect=[limited, "ok"])) == "ok"
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm.fairness import (
+    BATCH,
+    INTERACTIVE,
+    PREFETCH,
+    FairnessPolicy,
+    FairScheduler,
+    Workload,
+    current_workload,
+    use_workload,
+    workload_context,
+)
+from llm.ratelimit import CallStats, RateLimitScheduler
+from story_engine import AsyncStoryOrchestrator, StoryOrchestrator
+
+
+def _wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+class TestUseWorkload:
+    """Tests for workload attribution through context variables."""
+
+    def test_defaults_to_interactive(self):
+        assert current_workload() == Workload(INTERACTIVE, None)
+
+    def test_nested_scopes_inherit_and_only_lower_priority(self):
+        with use_workload(BATCH, session="s1"):
+            with use_workload(INTERACTIVE) as inner:
+                assert inner == Workload(BATCH, "s1")
+            with use_workload(PREFETCH, session="s2"):
+                assert current_workload() == Workload(BATCH, "s2")
+        assert current_workload().priority == INTERACTIVE
+
+    def test_rejects_unknown_priority(self):
+        with pytest.raises(ValueError):
+            with use_workload("urgent"):
+                pass
+
+    def test_workload_context_carries_to_threads(self):
+        seen = []
+        context = workload_context(PREFETCH, session="s")
+        thread = threading.Thread(target=context.run, args=(lambda: seen.append(current_workload()),))
+        thread.start()
+        thread.join()
+
+        assert seen == [Workload(PREFETCH, "s")]
+        assert current_workload().priority == INTERACTIVE
+
+
+class TestFairScheduler:
+    """Tests for per-key quotas and weighted fair admission."""
+
+    def _hold(self, scheduler, workload, release, order=None, key="k"):
+        def run():
+            with scheduler.slot(key, workload=workload):
+                if order is not None:
+                    order.append(workload.priority)
+                release.wait()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def test_class_share_leaves_room_for_interactive(self):
+        scheduler = FairScheduler(FairnessPolicy(max_concurrent=4, shares={BATCH: 0.5}))
+        release = threading.Event()
+        threads = [self._hold(scheduler, Workload(BATCH), release) for _ in range(3)]
+        _wait_until(lambda: scheduler.stats("k")["waiting"] == 1)
+
+        assert scheduler.stats("k")["by_class"] == {BATCH: 2}
+        with scheduler.slot("k", workload=Workload(INTERACTIVE)) as waited:
+            assert waited < 0.5
+            assert scheduler.stats("k")["in_flight"] == 3
+
+        release.set()
+        for thread in threads:
+            thread.join(1)
+        assert scheduler.stats("k") == {
+            "in_flight": 0,
+            "waiting": 0,
+            "by_class": {},
+            "waiting_by_class": {INTERACTIVE: 0, PREFETCH: 0, BATCH: 0},
+        }
+
+    def test_session_limit(self):
+        scheduler = FairScheduler(FairnessPolicy(max_concurrent=8, session_limit=2))
+        release = threading.Event()
+        threads = [self._hold(scheduler, Workload(INTERACTIVE, "heavy"), release) for _ in range(3)]
+        _wait_until(lambda: scheduler.stats("k")["waiting"] == 1)
+
+        with scheduler.slot("k", workload=Workload(INTERACTIVE, "light")):
+            assert scheduler.stats("k")["in_flight"] == 3
+
+        release.set()
+        for thread in threads:
+            thread.join(1)
+
+    def test_keys_are_independent(self):
+        scheduler = FairScheduler(FairnessPolicy(max_concurrent=1))
+        release = threading.Event()
+        thread = self._hold(scheduler, Workload(BATCH), release, key="a")
+        _wait_until(lambda: scheduler.stats("a")["in_flight"] == 1)
+
+        with scheduler.slot("b"):
+            pass
+
+        release.set()
+        thread.join(1)
+
+    def test_interactive_overtakes_queued_batch(self):
+        scheduler = FairScheduler(FairnessPolicy(max_concurrent=1, shares={}))
+        order = []
+        gates = [threading.Event() for _ in range(5)]
+        first = self._hold(scheduler, Workload(BATCH), gates[0])
+        _wait_until(lambda: scheduler.stats("k")["in_flight"] == 1)
+        threads = [self._hold(scheduler, Workload(BATCH), gates[i], order) for i in (1, 2, 3)]
+        _wait_until(lambda: scheduler.stats("k")["waiting"] == 3)
+        threads.append(self._hold(scheduler, Workload(INTERACTIVE), gates[4], order))
+        _wait_until(lambda: scheduler.stats("k")["waiting"] == 4)
+
+        for gate in gates:
+            gate.set()
+        for thread in [first, *threads]:
+            thread.join(1)
+
+        assert order[0] == INTERACTIVE
+        assert order.count(BATCH) == 3
+
+    def test_cancelled_async_waiter_leaves_queue(self):
+        scheduler = FairScheduler(FairnessPolicy(max_concurrent=1))
+
+        async def main():
+            async with scheduler.aslot("k"):
+                waiter = asyncio.ensure_future(scheduler.aslot("k").__aenter__())
+                await asyncio.sleep(0)
+                assert scheduler.stats("k")["waiting"] == 1
+                waiter.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await waiter
+                assert scheduler.stats("k")["waiting"] == 0
+            async with scheduler.aslot("k") as waited:
+                return waited
+
+        assert asyncio.run(main()) < 0.5
+        assert scheduler.stats("k")["in_flight"] == 0
+
+    def test_rate_limit_scheduler_reports_slot_wait(self):
+        now = [0.0]
+        fairness = FairScheduler(FairnessPolicy(max_concurrent=1), clock=lambda: now[0])
+        scheduler = RateLimitScheduler(clock=lambda: now[0], sleep=lambda s: None, fairness=fairness)
+        release = threading.Event()
+        holder = self._hold(fairness, Workload(BATCH), release)
+        _wait_until(lambda: fairness.stats("k")["in_flight"] == 1)
+
+        stats = CallStats()
+        result = []
+        caller = threading.Thread(target=lambda: result.append(scheduler.call("chat", "k", lambda: "ok", stats=stats)))
+        caller.start()
+        _wait_until(lambda: fairness.stats("k")["waiting"] == 1)
+        now[0] = 3.0
+        release.set()
+        caller.join(1)
+        holder.join(1)
+
+        assert result == ["ok"]
+        assert stats.queue_wait == pytest.approx(3.0)
+
+
+class TestWorkloadAttribution:
+    """Tests for the workloads the orchestrators assign."""
+
+    def test_run_batch_is_batch_work(self, api_key):
+        orch = StoryOrchestrator(api_key=api_key)
+        orch.run = lambda request, **_: current_workload().priority
+
+        outcomes = list(orch.run_batch(["a", "b"]))
+
+        assert [o.result for o in outcomes] == [BATCH, BATCH]
+        assert current_workload().priority == INTERACTIVE
+
+    def test_async_run_batch_is_batch_work(self, api_key):
+        async def run(request, **_):
+            return current_workload().priority
+
+        orch = AsyncStoryOrchestrator(api_key=api_key)
+        orch.run = run
+
+        async def collect():
+            return [o.result async for o in orch.run_batch(["a"])]
+
+        assert asyncio.run(collect()) == [BATCH]
+
+    def test_early_illustration_is_prefetch(self, api_key):
+        orch = StoryOrchestrator(api_key=api_key)
+        orch._draw = lambda outline, deadline: (current_workload().priority, None)
+
+        assert orch._early_draw("Outline", None) == (PREFETCH, None)
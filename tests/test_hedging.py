@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+
+from unittest.mock import MagicMock, patch
+
+from cancellation import CancelToken
+from llm.hedging import HedgePolicy, Hedger
+
+
+def warmed(policy=None, latency=0.01, samples=20):
+    hedger = Hedger(policy or HedgePolicy(min_samples=samples, min_delay=0.01, budget=0.0, burst=1.0), enabled=True)
+    for _ in range(samples):
+        hedger.observe("story", latency)
+    return hedger
+
+
+class TestHedger:
+    """Tests for percentile-triggered request hedging."""
+
+    def test_no_hedge_without_history(self):
+        hedger = Hedger(HedgePolicy(min_samples=5))
+        fn = MagicMock(return_value="ok")
+
+        assert hedger.call("story", fn) == "ok"
+        assert fn.call_count == 1
+        assert hedger.delay_for("story") is None
+
+    def test_delay_tracks_percentile(self):
+        hedger = Hedger(HedgePolicy(min_samples=10, percentile=0.9, min_delay=0.0))
+        for latency in range(1, 11):
+            hedger.observe("judge", float(latency))
+
+        assert hedger.delay_for("judge") == 9.0
+        assert hedger.delay_for("story") is None
+
+    def test_slow_call_is_hedged_and_fast_copy_wins(self):
+        hedger = warmed()
+        tokens = []
+
+        def fn(token):
+            tokens.append(token)
+            if len(tokens) == 1:
+                token.wait(2)
+                return "slow"
+            return "fast"
+
+        assert hedger.call("story", fn) == "fast"
+        assert hedger.hedged == 1
+        assert tokens[0].cancelled and tokens[0].reason == "hedge lost"
+
+    def test_loser_token_follows_the_callers_token(self):
+        hedger = warmed()
+        parent = CancelToken()
+
+        def fn(token):
+            assert token is not parent
+            parent.cancel("user stopped")
+            return token.reason
+
+        assert hedger.call("story", fn, parent) == "user stopped"
+
+    def test_calls_are_not_capped_by_a_shared_pool(self):
+        hedger = warmed()
+        hedger.configure(budget=0.0, burst=0.0)
+        hedger._credit = 0.0
+        started = time.monotonic()
+
+        threads = [threading.Thread(target=hedger.call, args=("story", lambda _: time.sleep(0.2))) for _ in range(48)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert time.monotonic() - started < 0.5
+
+    def test_budget_caps_hedges(self):
+        hedger = warmed()
+        hedger._credit = 0.0
+
+        def slow(_token):
+            threading.Event().wait(0.1)
+            return "done"
+
+        fn = MagicMock(side_effect=slow)
+
+        assert hedger.call("story", fn) == "done"
+        assert fn.call_count == 1
+        assert hedger.hedged == 0
+
+    def test_error_in_one_copy_falls_through_to_other(self):
+        hedger = warmed()
+        calls = []
+
+        def fn(_token):
+            calls.append(1)
+            if len(calls) == 1:
+                threading.Event().wait(0.1)
+                raise RuntimeError("boom")
+            threading.Event().wait(0.2)
+            return "ok"
+
+        assert hedger.call("story", fn) == "ok"
+
+    def test_async_hedge_cancels_loser(self):
+        hedger = warmed()
+        cancelled = []
+
+        async def fn():
+            if not cancelled:
+                cancelled.append(False)
+                try:
+                    await asyncio.sleep(2)
+                except asyncio.CancelledError:
+                    cancelled[0] = True
+                    raise
+                return "slow"
+            return "fast"
+
+        async def run():
+            result = await hedger.acall("story", fn)
+            await asyncio.sleep(0)
+            return result
+
+        assert asyncio.run(run()) == "fast"
+        assert cancelled == [True]
+
+    def test_async_caller_cancel_cancels_primary(self):
+        hedger = warmed(latency=1.0)
+        cancelled = []
+
+        async def fn():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def run():
+            call = asyncio.ensure_future(hedger.acall("story", fn))
+            await asyncio.sleep(0.01)
+            call.cancel()
+            await asyncio.gather(call, return_exceptions=True)
+            await asyncio.sleep(0)
+            return list(cancelled)
+
+        assert asyncio.run(run()) == [True]
+
+
+class TestCallLlmHedging:
+    """Tests for the call_llm hedge switch."""
+
+    @patch("story_engine.get_hedger")
+    @patch("story_engine._client")
+    def test_hedge_flag_routes_through_hedger(self, mock_client_fn, mock_get_hedger, api_key):
+        from story_engine import call_llm
+
+        response = MagicMock()
+        response.choices[0].message.content = "Hi"
+        hedger = MagicMock(enabled=False)
+        hedger.call.return_value = response
+        mock_get_hedger.return_value = hedger
+
+        assert call_llm([{"role": "user", "content": "x"}], temperature=0.9, api_key=api_key, hedge=True) == "Hi"
+        hedger.call.assert_called_once()
+        mock_client_fn.return_value.chat.completions.create.assert_not_called()
@@ -1,6 +1,6 @@
 import pytest
 from app.ui_desk import _split_text_into_pages
-from app.ui_book import escape_html
+from app.ui_book import escape_html, first_page_preview
 
 
 class TestSplitTextIntoPages:
@@ -95,3 +95,16 @@ class TestEscapeHtml:
         result = escape_html("A < B < C")
         assert result == "A &lt; B &lt; C"
 
+
+
+class TestFirstPagePreview:
+    """Test the streaming first-page preview helper."""
+
+    def test_waits_for_enough_text(self):
+        assert first_page_preview("Once upon a", min_chars=50) is None
+
+    def test_returns_first_page(self):
+        text = "Paragraph one is here.\n\n" + "B" * 500
+        page = first_page_preview(text, min_chars=10)
+
+        assert page == "Paragraph one is here."
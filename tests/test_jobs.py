@@ -0,0 +1,99 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from cancellation import Cancelled
+from jobs import CANCELLED, DONE, FAILED, RUNNING, JobQueue, QueueFull, story_work
+from story_engine import DraftReady, OutlineReady, StoryDone, StoryText
+
+
+class TestJobQueue:
+    """Tests for the background job queue."""
+
+    def test_runs_work_and_keeps_result(self):
+        queue = JobQueue(workers=2)
+
+        job = queue.submit(lambda job: job.publish("step") or 42, owner="session-1")
+
+        assert job.wait(5)
+        assert (job.status, job.result, job.events()) == (DONE, 42, ["step"])
+        assert queue.get(job.id) is job
+        assert queue.jobs("session-1") == [job]
+        assert queue.jobs("session-2") == []
+
+    def test_failure_is_recorded(self):
+        queue = JobQueue(workers=1)
+
+        job = queue.submit(lambda job: 1 / 0)
+
+        assert job.wait(5)
+        assert job.status == FAILED
+        assert isinstance(job.error, ZeroDivisionError)
+
+    def test_bounded_workers_and_pending_limit(self):
+        queue = JobQueue(workers=1, max_pending=2)
+        release = threading.Event()
+        running = threading.Event()
+
+        def block(job):
+            running.set()
+            release.wait(5)
+
+        first = queue.submit(block)
+        second = queue.submit(lambda job: "second")
+        running.wait(5)
+
+        assert first.status == RUNNING
+        assert not second.done
+        with pytest.raises(QueueFull):
+            queue.submit(lambda job: None)
+        release.set()
+        assert second.wait(5) and second.result == "second"
+
+    def test_cancel_running_and_queued_jobs(self):
+        queue = JobQueue(workers=1)
+
+        def cooperative(job):
+            job.token.wait(5)
+            job.token.raise_if_cancelled()
+
+        running = queue.submit(cooperative, owner="s")
+        queued = queue.submit(lambda job: "never", owner="s")
+
+        assert queue.cancel_owner("s", "session closed") == 2
+        assert running.wait(5) and queued.wait(5)
+        assert running.status == queued.status == CANCELLED
+        assert queued.result is None
+        assert isinstance(queued.error, Cancelled)
+
+    def test_finished_jobs_expire_after_retention(self):
+        now = [0.0]
+        queue = JobQueue(workers=1, retention=60, clock=lambda: now[0])
+        job = queue.submit(lambda job: "done")
+        job.wait(5)
+
+        now[0] = 61.0
+        queue.submit(lambda job: None).wait(5)
+
+        assert queue.get(job.id) is None
+
+
+class TestStoryWork:
+    """Tests for running an orchestrator as a job."""
+
+    def test_publishes_events_and_partial_text(self):
+        result = MagicMock()
+        engine = MagicMock()
+        engine.run_iter.return_value = iter(
+            [OutlineReady("Outline"), StoryText("Once"), StoryText("Once upon"), DraftReady("Once upon a time"), StoryDone(result)]
+        )
+        queue = JobQueue(workers=1)
+
+        job = queue.submit(story_work(engine, "Request", length="short"))
+
+        assert job.wait(5)
+        assert job.result is result
+        assert job.events() == [OutlineReady("Outline"), DraftReady("Once upon a time")]
+        assert job.partial == "Once upon"
+        engine.run_iter.assert_called_once_with("Request", stream=True, length="short")
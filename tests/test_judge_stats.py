@@ -0,0 +1,112 @@
+import pytest
+
+from judge_stats import AdaptiveBudget, JudgeStats, temperature_band
+from story_engine import StoryFeedback, StoryResult
+
+
+def make_result(first_approved, final_approved, iterations, score=8):
+    history = [StoryFeedback(approved=first_approved, critique="", score=score)]
+    history += [StoryFeedback(approved=final_approved, critique="", score=score)] * iterations
+    return StoryResult(
+        request="r",
+        outline="o",
+        draft="d",
+        final_story="d",
+        feedback=history[-1],
+        image_prompt="p",
+        image_url=None,
+        iterations=iterations,
+        feedback_history=history,
+    )
+
+
+class TestJudgeStats:
+    """Tests for the persisted per-bucket outcome counters."""
+
+    def test_temperature_band(self):
+        assert temperature_band(0.85) == "0.8-1.0"
+        assert temperature_band(0.2) == "0.2-0.4"
+
+    def test_record_and_get(self, tmp_path):
+        path = str(tmp_path / "stats.db")
+        stats = JudgeStats(path)
+        stats.record("Funny", "short", 0.85, make_result(True, True, 0, score=9))
+        stats.record("Funny", "short", 0.9, make_result(False, True, 2, score=7))
+
+        bucket = JudgeStats(path).get("Funny", "short", 0.8)
+
+        assert bucket.runs == 2
+        assert bucket.first_pass_rate == 0.5
+        assert bucket.rescued == 1
+        assert bucket.mean_rescue_rounds == 2
+        assert bucket.mean_score == pytest.approx(8.0)
+        assert JudgeStats(path).get("Funny", "long", 0.8).runs == 0
+
+
+class TestAdaptiveBudget:
+    """Tests for choosing the refine budget from history."""
+
+    def test_uses_requested_budget_without_history(self):
+        budget = AdaptiveBudget(JudgeStats(), max_retries=3)
+
+        plan = budget.plan("Funny", "short", 0.85, requested_retries=5, judge_temperature=0.15)
+
+        assert plan.retries == 3
+        assert plan.judge_temperature == 0.15
+
+    def test_drops_rounds_that_never_rescue(self):
+        stats = JudgeStats()
+        for _ in range(6):
+            stats.record("Funny", "short", 0.85, make_result(False, False, 2))
+
+        plan = AdaptiveBudget(stats, min_retries=0).plan("Funny", "short", 0.85, 4, 0.15)
+
+        assert plan.retries == 0
+
+    def test_keeps_exploring_after_cutting_rounds(self):
+        stats = JudgeStats()
+        budget = AdaptiveBudget(stats, min_retries=0, explore_every=4)
+        plans = []
+        for _ in range(12):
+            plans.append(budget.plan("Funny", "short", 0.85, 4, 0.15).retries)
+            budget.record("Funny", "short", 0.85, make_result(False, False, plans[-1]))
+
+        assert plans[5:] == [0, 0, 0, 1, 0, 0, 0]
+
+    def test_exploration_can_restore_the_budget(self):
+        stats = JudgeStats()
+        for _ in range(5):
+            stats.record("Funny", "short", 0.85, make_result(False, False, 1))
+        budget = AdaptiveBudget(stats, explore_every=5)
+        for _ in range(5):
+            stats.record("Funny", "short", 0.85, make_result(False, True, 1))
+
+        assert budget.plan("Funny", "short", 0.85, 4, 0.15).retries == 2
+
+    def test_budgets_rounds_rescued_drafts_needed(self):
+        stats = JudgeStats()
+        for _ in range(5):
+            stats.record("Funny", "short", 0.85, make_result(False, True, 1))
+
+        assert AdaptiveBudget(stats).plan("Funny", "short", 0.85, 4, 0.15).retries == 2
+        assert AdaptiveBudget(stats).plan("Funny", "short", 0.85, 1, 0.15).retries == 1
+
+    def test_pins_judge_temperature_when_scores_are_noisy(self):
+        stats = JudgeStats()
+        for score in (2, 10, 2, 10, 2, 10):
+            stats.record("Funny", "short", 0.85, make_result(score > 5, score > 5, 0, score=score))
+
+        plan = AdaptiveBudget(stats, min_judge_temperature=0.05).plan("Funny", "short", 0.85, 2, 0.3)
+
+        assert plan.judge_temperature == 0.05
+
+    def test_holds_a_lenient_judge_to_a_bar(self):
+        stats = JudgeStats()
+        for score in (7, 8, 8, 9, 8):
+            stats.record("Funny", "short", 0.85, make_result(True, True, 0, score=score))
+
+        plan = AdaptiveBudget(stats).plan("Funny", "short", 0.85, 2, 0.15)
+
+        assert plan.min_score == 8
+        assert "approving only scores >= 8" in plan.reason
+        assert AdaptiveBudget(stats, lenient_rate=1.01).plan("Funny", "short", 0.85, 2, 0.15).min_score is None
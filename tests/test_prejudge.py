@@ -0,0 +1,89 @@
+from prejudge import PreJudge, count_syllables, measure
+
+
+CALM_STORY = "\n\n".join(
+    [
+        "Pip the puppy had a red ball. He liked to roll it in the sun. The ball was his best friend.",
+        "One day the ball went into the pond. Pip sat on the grass. He felt a bit sad.",
+        "A duck swam by. She saw the ball and gave it a push. It came back to Pip.",
+        "Pip wagged his tail. He said thank you to the duck. Now they play with the ball each day.",
+    ]
+)
+
+
+class TestMeasure:
+    """Tests for local text metrics."""
+
+    def test_counts_words_sentences_paragraphs(self):
+        metrics = measure(CALM_STORY)
+
+        assert metrics.paragraphs == 4
+        assert metrics.sentences == 12
+        assert metrics.words == len(CALM_STORY.split())
+        assert metrics.blocked == []
+
+    def test_flags_blocklisted_words(self):
+        assert measure("The knife was near the blood.").blocked == ["blood", "knife"]
+
+    def test_syllables(self):
+        assert count_syllables("cat") == 1
+        assert count_syllables("bubble") == 2
+        assert count_syllables("tomorrow") == 3
+        assert count_syllables("make") == 1
+        assert count_syllables("makes") == 1
+
+    def test_silent_ed_and_es(self):
+        for word in ("named", "lived", "breathed", "danced", "smiled"):
+            assert count_syllables(word) == 1, word
+        for word in ("wanted", "needed", "giggled", "agreed", "boxes", "places", "bubbles"):
+            assert count_syllables(word) == 2, word
+
+
+class TestPreJudge:
+    """Tests for the local pre-judge verdict bands."""
+
+    def test_passes_simple_story(self):
+        story = CALM_STORY + "\n\n" + " ".join(["The duck and Pip were good friends."] * 18)
+
+        verdict = PreJudge().screen(story, length="medium")
+
+        assert verdict.verdict == "pass"
+        assert verdict.confidence >= 0.85
+        assert 9 <= verdict.score <= 10
+
+    def test_rejects_blocklisted_words(self):
+        verdict = PreJudge().screen(CALM_STORY + " Then the duck died.", length="medium")
+
+        assert verdict.verdict == "reject"
+        assert "died" in verdict.critique
+
+    def test_rejects_far_too_long(self):
+        verdict = PreJudge().screen(" ".join(["The cat sat."] * 250), length="short")
+
+        assert verdict.verdict == "reject"
+        assert "short story should be under 350" in verdict.critique
+
+    def test_rejects_high_reading_level(self):
+        dense = (
+            "Notwithstanding considerable institutional reluctance, the extraordinarily sophisticated "
+            "organization systematically implemented comprehensive environmental regulations, "
+            "fundamentally transforming interdisciplinary collaboration throughout the municipality. "
+        ) * 2
+
+        verdict = PreJudge().screen(dense)
+
+        assert verdict.verdict == "reject"
+        assert "Reading level" in verdict.critique
+
+    def test_plain_childrens_prose_is_not_rejected(self, sample_story):
+        verdict = PreJudge().screen(sample_story, length="short")
+
+        assert verdict.verdict != "reject"
+
+    def test_uncertain_band_left_for_llm(self):
+        story = CALM_STORY + "\n\n" + " ".join(["The duck and Pip were good friends."] * 8)
+
+        verdict = PreJudge().screen(story, length="medium")
+
+        assert verdict.verdict == "uncertain"
+        assert not verdict.decisive
@@ -0,0 +1,130 @@
+import asyncio
+
+import openai
+import pytest
+from unittest.mock import MagicMock
+
+from llm.ratelimit import CallStats, EndpointLimits, RateLimitScheduler, RetryPolicy, TokenBucket, estimate_tokens
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _error(cls, status, headers=None):
+    return cls("error", response=MagicMock(status_code=status, headers=headers or {}), body=None)
+
+
+class TestTokenBucket:
+    """Tests for reservation-based token buckets."""
+
+    def test_queues_beyond_capacity(self):
+        t = FakeTime()
+        bucket = TokenBucket(per_minute=60, clock=t.clock)  # one per second
+
+        delays = [bucket.reserve() for _ in range(62)]
+
+        assert delays[:60] == [0.0] * 60
+        assert delays[60] == pytest.approx(1.0)
+        assert delays[61] == pytest.approx(2.0)
+
+    def test_refills_over_time(self):
+        t = FakeTime()
+        bucket = TokenBucket(per_minute=60, clock=t.clock)
+        for _ in range(60):
+            bucket.reserve()
+        t.now += 5
+
+        assert bucket.reserve(5) == 0.0
+
+
+class TestRateLimitScheduler:
+    """Tests for throttling, Retry-After and backoff."""
+
+    def _scheduler(self, t, **limits):
+        limits = limits or {"chat": EndpointLimits(requests_per_minute=60, tokens_per_minute=600)}
+        return RateLimitScheduler(limits=limits, retry=RetryPolicy(max_attempts=3), clock=t.clock, sleep=t.sleep)
+
+    def test_honors_retry_after(self):
+        t = FakeTime()
+        scheduler = self._scheduler(t)
+        fn = MagicMock(side_effect=[_error(openai.RateLimitError, 429, {"retry-after": "7"}), "ok"])
+
+        assert scheduler.call("chat", "key", fn) == "ok"
+        assert 7 in t.sleeps
+        assert fn.call_count == 2
+
+    def test_stats_record_queue_wait_and_retries(self):
+        t = FakeTime()
+        scheduler = self._scheduler(t)
+        fn = MagicMock(side_effect=[_error(openai.RateLimitError, 429, {"retry-after": "3"}), "ok"])
+        stats = CallStats()
+
+        scheduler.call("chat", "key", fn, stats=stats)
+
+        assert stats.retries == 1
+        assert stats.queue_wait == pytest.approx(3.0)
+
+    def test_rate_limit_pauses_shared_budget(self):
+        t = FakeTime()
+        scheduler = self._scheduler(t)
+        scheduler._throttled("key", "chat", _error(openai.RateLimitError, 429, {"retry-after-ms": "4000"}), 0)
+
+        assert scheduler.reserve("key", "chat") == pytest.approx(4.0)
+        assert scheduler.reserve("other-key", "chat") == 0.0
+
+    def test_backoff_on_server_error_then_gives_up(self):
+        t = FakeTime()
+        scheduler = self._scheduler(t)
+        fn = MagicMock(side_effect=_error(openai.InternalServerError, 500))
+
+        with pytest.raises(openai.InternalServerError):
+            scheduler.call("chat", "key", fn)
+        assert fn.call_count == 3
+        assert len(t.sleeps) == 2
+
+    def test_client_errors_not_retried(self):
+        t = FakeTime()
+        scheduler = self._scheduler(t)
+        fn = MagicMock(side_effect=_error(openai.BadRequestError, 400))
+
+        with pytest.raises(openai.BadRequestError):
+            scheduler.call("chat", "key", fn)
+        assert fn.call_count == 1
+
+    def test_token_budget_delays_large_calls(self):
+        t = FakeTime()
+        scheduler = self._scheduler(t)
+
+        scheduler.call("chat", "key", lambda: "first", tokens=600)
+        scheduler.call("chat", "key", lambda: "second", tokens=300)
+
+        assert t.sleeps == [pytest.approx(30.0)]
+
+    def test_async_retry(self):
+        t = FakeTime()
+        scheduler = self._scheduler(t)
+        attempts = []
+
+        async def fn():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise _error(openai.RateLimitError, 429, {"retry-after": "0"})
+            return "ok"
+
+        assert asyncio.run(scheduler.acall("chat", "key", fn)) == "ok"
+        assert len(attempts) == 2
+
+
+def test_estimate_tokens():
+    messages = [{"role": "user", "content": "a" * 400}]
+    assert estimate_tokens(messages, max_tokens=100) == 200
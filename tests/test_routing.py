@@ -0,0 +1,101 @@
+import asyncio
+
+import openai
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from llm.routing import ModelRouter, Route, routes_from_env
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _timeout():
+    return openai.APITimeoutError(request=MagicMock())
+
+
+ROUTES = {
+    "outline": Route("fast", timeout=10.0, slo=2.0),
+    "story": Route("strong", timeout=30.0, slo=5.0, fallback="fast"),
+}
+
+
+class TestModelRouter:
+    """Tests for per-stage model routing and SLO fallback."""
+
+    def test_routes_by_stage(self):
+        router = ModelRouter(ROUTES, default=Route("default"))
+
+        assert router.pick("outline") == ("fast", 10.0)
+        assert router.pick("story") == ("strong", 30.0)
+        assert router.pick(None) == ("default", 60.0)
+
+    def test_slo_breach_falls_back_until_cooldown(self):
+        clock = FakeClock()
+        router = ModelRouter(ROUTES, cooldown=60.0, clock=clock)
+
+        def slow(model, timeout):
+            clock.now += 6.0
+            return model
+
+        assert router.call("story", slow) == "strong"
+        assert router.pick("story") == ("fast", 30.0)
+
+        clock.now += 61.0
+        assert router.pick("story") == ("strong", 30.0)
+
+    def test_timeout_retries_on_fallback(self):
+        router = ModelRouter(ROUTES)
+        fn = MagicMock(side_effect=[_timeout(), "ok"])
+
+        assert router.call("story", fn) == "ok"
+        assert [c.args[0] for c in fn.call_args_list] == ["strong", "fast"]
+        assert router.degraded("story")
+
+    def test_timeout_without_fallback_raises(self):
+        router = ModelRouter(ROUTES)
+
+        with pytest.raises(openai.APITimeoutError):
+            router.call("outline", MagicMock(side_effect=_timeout()))
+
+    def test_async_timeout_retries_on_fallback(self):
+        router = ModelRouter(ROUTES)
+        fn = AsyncMock(side_effect=[_timeout(), "ok"])
+
+        assert asyncio.run(router.acall("story", fn)) == "ok"
+        assert fn.call_args.args == ("fast", 30.0)
+
+    def test_env_overrides(self, monkeypatch):
+        monkeypatch.setenv("OPENAI_MODEL_STORY", "gpt-4o")
+        monkeypatch.setenv("OPENAI_FALLBACK_MODEL_OUTLINE", "tiny")
+
+        routes = routes_from_env(ROUTES)
+
+        assert routes["story"].model == "gpt-4o"
+        assert routes["outline"].fallback == "tiny"
+
+
+class TestCallLlmRouting:
+    """Tests that call_llm uses the stage's route."""
+
+    @patch("story_engine.get_router")
+    @patch("story_engine._client")
+    def test_call_llm_uses_stage_model(self, mock_client_fn, mock_get_router, api_key):
+        from story_engine import call_llm
+
+        mock_get_router.return_value = ModelRouter(ROUTES)
+        client = MagicMock()
+        client.chat.completions.create.return_value.choices = [MagicMock()]
+        client.chat.completions.create.return_value.choices[0].message.content = "Outline"
+        mock_client_fn.return_value = client
+
+        call_llm([{"role": "user", "content": "hi"}], temperature=0.9, api_key=api_key, stage="outline")
+
+        kwargs = client.chat.completions.create.call_args.kwargs
+        assert kwargs["model"] == "fast"
+        assert kwargs["timeout"] == 10.0
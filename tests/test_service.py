@@ -0,0 +1,154 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+pytest.importorskip("starlette")
+from starlette.testclient import TestClient
+
+from llm.fairness import BATCH, Workload, current_workload
+from service import create_app
+from story_engine import StoryFeedback
+
+
+def _sse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def client():
+    return TestClient(create_app())
+
+
+@pytest.fixture
+def pipeline():
+    """Patch the async agents so the real orchestrator runs without the API."""
+    with patch("story_engine.AsyncStoryGenerator") as gen_class, patch("story_engine.AsyncStoryJudge") as judge_class, patch(
+        "story_engine.AsyncImageGenerator"
+    ) as image_class:
+        # Real settings, since the single-flight key is built from them.
+        gen = MagicMock(writer_temperature=0.85, api_key=None)
+        gen.create_outline = AsyncMock(return_value="Outline")
+        gen.write_story = AsyncMock(return_value="Draft")
+        gen.illustration_prompt = AsyncMock(return_value="Prompt")
+        gen_class.return_value = gen
+        judge_class.return_value.judge_temperature = 0.15
+        judge_class.return_value.evaluate = AsyncMock(return_value=StoryFeedback(approved=True, critique="PASS", score=9))
+        image_class.return_value.generate_image = AsyncMock(return_value="https://example.com/img.png")
+        yield gen
+
+
+class TestStoryService:
+    """Tests for the HTTP/SSE story service."""
+
+    def test_health_and_metrics(self, client):
+        assert client.get("/health").json()["status"] == "ok"
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+
+    def test_create_story_returns_result(self, client, pipeline):
+        response = client.post("/stories", json={"request": "A brave fox", "length": "medium", "retries": 1})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["final_story"] == "Draft"
+        assert body["image_url"] == "https://example.com/img.png"
+        assert body["feedback_history"][0]["critique"] == "PASS"
+
+    def test_stream_story_emits_stage_events(self, client, pipeline):
+        response = client.post("/stories/stream", json={"request": "A brave fox", "length": "medium"})
+
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _sse_events(response.text)
+        assert [name for name, _ in events] == [
+            "outline_ready",
+            "draft_ready",
+            "judge_verdict",
+            "illustration_prompt",
+            "image_ready",
+            "story_done",
+        ]
+        assert events[2][1]["feedback"]["score"] == 9
+        assert events[-1][1]["final_story"] == "Draft"
+
+    def test_stream_reports_failures_as_error_event(self, client, pipeline):
+        pipeline.write_story.side_effect = RuntimeError("boom")
+
+        events = _sse_events(client.post("/stories/stream", json={"request": "A brave fox", "length": "medium"}).text)
+
+        assert events[-1] == ("error", {"error": "RuntimeError: boom"})
+
+    def test_rejects_bad_requests(self, client):
+        assert client.post("/stories", json={"length": "short"}).status_code == 400
+        assert client.post("/stories", json={"request": "x", "colour": "red"}).json() == {"error": "Unknown field(s): colour"}
+        assert client.post("/stories", content=b"not json").status_code == 400
+        assert client.post("/remix", json={"story": "S", "critique": "C", "writer_temperature": 9}).status_code == 400
+
+    @pytest.mark.parametrize(
+        "field, value",
+        [
+            ("parallel_drafts", 500),
+            ("parallel_drafts", 1.5),
+            ("retries", -1),
+            ("retries", True),
+            ("writer_temperature", 3),
+            ("judge_temperature", "hot"),
+            ("deadline", 5),
+            ("length", "epic"),
+            ("genre", 7),
+            ("fused_review", "yes"),
+        ],
+    )
+    def test_rejects_invalid_settings(self, client, pipeline, field, value):
+        response = client.post("/stories", json={"request": "A fox", field: value})
+
+        assert response.status_code == 400
+        assert f"'{field}'" in response.json()["error"]
+        pipeline.create_outline.assert_not_called()
+
+    def test_accepts_settings_in_range(self, client, pipeline):
+        body = {"request": "A fox", "parallel_drafts": 1, "judge_temperature": 0, "deadline": 60, "genre": None}
+
+        assert client.post("/stories", json=body).status_code == 200
+
+    def test_priority_and_session_headers(self, client, pipeline):
+        seen = []
+        pipeline.create_outline.side_effect = lambda *a, **kw: seen.append(current_workload()) or "Outline"
+        headers = {"X-Story-Priority": "batch", "X-Session-Id": "reader-1"}
+
+        assert client.post("/stories", json={"request": "A fox"}, headers=headers).status_code == 200
+        client.post("/stories/stream", json={"request": "A fox", "length": "long"}, headers=headers)
+
+        assert seen == [Workload(BATCH, "reader-1")] * 2
+        bad = client.post("/stories", json={"request": "A fox"}, headers={"X-Story-Priority": "urgent"})
+        assert bad.status_code == 400
+
+    @patch("service.AsyncStoryGenerator")
+    def test_remix(self, mock_gen_class, client):
+        mock_gen_class.return_value.refine_story = AsyncMock(return_value="Happier story")
+
+        response = client.post("/remix", json={"story": "Story", "critique": "Make it happier"})
+
+        assert response.json() == {"story": "Happier story"}
+        mock_gen_class.return_value.refine_story.assert_awaited_once_with("Story", "Make it happier")
+
+    @patch("service.anarrate", new_callable=AsyncMock)
+    def test_narration_returns_audio(self, mock_narrate, client):
+        mock_narrate.return_value = b"mp3-bytes"
+
+        response = client.post("/narration", json={"text": "Once upon a time"}, headers={"X-OpenAI-Key": "sk-user"})
+
+        assert response.content == b"mp3-bytes"
+        assert response.headers["content-type"] == "audio/mpeg"
+        mock_narrate.assert_awaited_once_with("Once upon a time", api_key="sk-user")
+
+    @patch("service.asuggest_prompts", new_callable=AsyncMock)
+    def test_suggestions(self, mock_suggest, client):
+        mock_suggest.return_value = ["A", "B", "C"]
+
+        assert client.get("/suggestions").json() == {"suggestions": ["A", "B", "C"]}
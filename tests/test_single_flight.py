@@ -0,0 +1,117 @@
+import asyncio
+import threading
+
+import pytest
+
+from cancellation import Cancelled, CancelToken
+from single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for coalescing identical in-flight calls."""
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(2)
+            return {"story": "Once upon a time"}
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", work)))
+        leader.start()
+        started.wait(2)
+        follower = threading.Thread(target=lambda: results.append(flight.do("k", work)))
+        follower.start()
+        while flight.shared == 0:
+            threading.Event().wait(0.01)
+        release.set()
+        leader.join(2)
+        follower.join(2)
+
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in results) == [False, True]
+        first, second = (value for value, _ in results)
+        assert first == second and first is not second
+        assert flight.in_flight() == 0
+
+    def test_key_is_free_after_completion(self):
+        flight = SingleFlight()
+
+        assert flight.do("k", lambda: 1) == (1, False)
+        assert flight.do("k", lambda: 2) == (2, False)
+
+    def test_errors_propagate_and_release_key(self):
+        flight = SingleFlight()
+
+        with pytest.raises(ValueError):
+            flight.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+        assert flight.in_flight() == 0
+
+    def test_cancelled_follower_stops_waiting(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def work():
+            started.set()
+            release.wait(2)
+            return "story"
+
+        leader_result = []
+        leader = threading.Thread(target=lambda: leader_result.append(flight.do("k", work)))
+        leader.start()
+        started.wait(2)
+        token = CancelToken()
+        threading.Timer(0.05, token.cancel).start()
+
+        with pytest.raises(Cancelled):
+            flight.do("k", work, cancel=token)
+        assert leader.is_alive()
+
+        release.set()
+        leader.join(2)
+        assert leader_result == [("story", False)]
+        assert flight.in_flight() == 0
+
+    def test_async_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return ["story"]
+
+        async def main():
+            return await asyncio.gather(*(flight.ado("k", work) for _ in range(3)))
+
+        results = asyncio.run(main())
+
+        assert len(calls) == 1
+        assert [shared for _, shared in results] == [False, True, True]
+        assert all(value == ["story"] for value, _ in results)
+
+    def test_cancelled_async_leader_does_not_cancel_followers(self):
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(5)
+
+        async def main():
+            leader = asyncio.ensure_future(flight.ado("k", work))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.ado("k", work))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            with pytest.raises(Cancelled):
+                await follower
+            assert not follower.cancelled()
+            return await flight.ado("k", lambda: asyncio.sleep(0, result="fresh"))
+
+        assert asyncio.run(main()) == ("fresh", False)
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+
+from stage_graph import Stage, arun_stages, run_stages
+
+
+class TestRunStages:
+    """Tests for the threaded stage executor."""
+
+    def test_passes_dependency_results(self):
+        results = run_stages(
+            [
+                Stage("a", lambda r: 1),
+                Stage("b", lambda r: r["a"] + 1, after=("a",)),
+                Stage("c", lambda r: r["a"] + r["b"], after=("a", "b")),
+            ]
+        )
+
+        assert results == {"a": 1, "b": 2, "c": 3}
+
+    def test_independent_branches_overlap(self):
+        barrier = threading.Barrier(2, timeout=2)
+
+        def meet(_):
+            barrier.wait()
+            return True
+
+        results = run_stages([Stage("root", lambda r: 0), Stage("x", meet, after=("root",)), Stage("y", meet, after=("root",))])
+
+        assert results["x"] and results["y"]
+
+    def test_failure_skips_dependents(self):
+        ran = []
+
+        def boom(_):
+            raise RuntimeError("stage failed")
+
+        with pytest.raises(RuntimeError):
+            run_stages([Stage("a", boom), Stage("b", lambda r: ran.append("b"), after=("a",))])
+        assert ran == []
+
+    def test_rejects_cycles_and_unknown_deps(self):
+        with pytest.raises(ValueError):
+            run_stages([Stage("a", lambda r: 1, after=("b",)), Stage("b", lambda r: 1, after=("a",))])
+        with pytest.raises(ValueError):
+            run_stages([Stage("a", lambda r: 1, after=("missing",))])
+
+    def test_checkpoint_stops_before_next_stage(self):
+        calls = []
+
+        def checkpoint():
+            if "a" in calls:
+                raise RuntimeError("cancelled")
+
+        with pytest.raises(RuntimeError, match="cancelled"):
+            run_stages(
+                [Stage("a", lambda r: calls.append("a")), Stage("b", lambda r: calls.append("b"), after=("a",))],
+                checkpoint=checkpoint,
+            )
+        assert calls == ["a"]
+
+
+class TestArunStages:
+    """Tests for the asyncio stage executor."""
+
+    def test_runs_branches_concurrently(self):
+        order = []
+
+        async def slow(_):
+            await asyncio.sleep(0.02)
+            order.append("slow")
+            return "slow"
+
+        async def fast(_):
+            order.append("fast")
+            return "fast"
+
+        async def join(r):
+            return r["slow"] + r["fast"]
+
+        results = asyncio.run(
+            arun_stages([Stage("slow", slow), Stage("fast", fast), Stage("join", join, after=("slow", "fast"))])
+        )
+
+        assert order == ["fast", "slow"]
+        assert results["join"] == "slowfast"
@@ -1,11 +1,29 @@
+import asyncio
+
+import openai
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from judge_stats import AdaptiveBudget, JudgePlan, JudgeStats
+from prejudge import PreJudge
 
 from story_engine import (
+    AsyncStoryGenerator,
+    AsyncStoryJudge,
+    AsyncStoryOrchestrator,
+    DraftReady,
+    DraftRefined,
+    IllustrationPrompt,
+    ImageReady,
+    JudgeVerdict,
+    OutlineReady,
+    StoryDone,
     StoryFeedback,
     StoryGenerator,
     StoryJudge,
     StoryOrchestrator,
+    StoryText,
+    stream_llm,
 )
 
 
@@ -56,6 +74,59 @@ class TestStoryGenerator:
         assert prompt == "Illustration prompt"
         assert mock_call.call_args.kwargs["max_tokens"] == 80
 
+    @patch("story_engine.call_llm")
+    def test_refine_paragraphs_splices_flagged_only(self, mock_call, api_key):
+        mock_call.side_effect = lambda **kw: "NEW " + kw["messages"][1]["content"].split("Paragraph to rewrite:\n")[1].split("\n")[0]
+        gen = StoryGenerator(api_key=api_key)
+        draft = "One.\n\nTwo.\n\nThree.\n\nFour."
+
+        refined = gen.refine_paragraphs(draft, "Calmer", flagged=[1, 3, 9])
+
+        assert refined == "One.\n\nNEW Two.\n\nThree.\n\nNEW Four."
+        assert mock_call.call_count == 2
+        assert all(c.kwargs["max_tokens"] == 250 for c in mock_call.call_args_list)
+
+    @patch("story_engine.call_llm")
+    def test_refine_paragraphs_without_valid_flags_is_noop(self, mock_call, api_key):
+        gen = StoryGenerator(api_key=api_key)
+
+        assert gen.refine_paragraphs("One.\n\nTwo.", "x", flagged=[7]) == "One.\n\nTwo."
+        mock_call.assert_not_called()
+
+    @patch("story_engine.stream_llm")
+    def test_write_story_stream(self, mock_stream, api_key):
+        mock_stream.return_value = iter(["Once ", "upon"])
+        gen = StoryGenerator(writer_temperature=0.9, api_key=api_key)
+
+        chunks = list(gen.write_story_stream("Request", outline="- beats", length="short"))
+
+        assert chunks == ["Once ", "upon"]
+        assert mock_stream.call_args.kwargs["max_tokens"] == 900
+        assert mock_stream.call_args.kwargs["temperature"] == 0.9
+
+
+class TestStreamLlm:
+    """Tests for the chunked chat completion helper."""
+
+    @patch("story_engine._client")
+    def test_yields_non_empty_deltas(self, mock_client_fn, api_key):
+        def chunk(text):
+            c = MagicMock()
+            c.choices = [MagicMock()]
+            c.choices[0].delta.content = text
+            return c
+
+        empty = MagicMock()
+        empty.choices = []
+        client = MagicMock()
+        client.chat.completions.create.return_value = iter([chunk("Once"), empty, chunk(None), chunk(" upon")])
+        mock_client_fn.return_value = client
+
+        chunks = list(stream_llm([{"role": "user", "content": "hi"}], api_key=api_key))
+
+        assert chunks == ["Once", " upon"]
+        assert client.chat.completions.create.call_args.kwargs["stream"] is True
+
 
 class TestStoryJudge:
     """Tests for StoryJudge behavior."""
@@ -82,6 +153,118 @@ class TestStoryJudge:
         assert "Invalid JSON" in feedback.critique
         assert feedback.score == 0
 
+    @patch("story_engine.call_llm")
+    def test_approval_bar_overrules_low_scores(self, mock_call, api_key):
+        import contextvars
+
+        mock_call.return_value = '{"approved": true, "critique": "Nice", "score": 6}'
+        judge = StoryJudge(api_key=api_key)
+
+        def run():
+            judge.begin_run(min_score=8)
+            return judge.evaluate("Story"), mock_call.call_args.kwargs["messages"][0]["content"]
+
+        feedback, system = contextvars.copy_context().run(run)
+
+        assert feedback.approved is False
+        assert feedback.critique.startswith("Nice") and "below the 8" in feedback.critique
+        assert "score of 8 or higher" in system
+        assert judge.evaluate("Story").approved is True
+
+    @patch("story_engine.call_llm")
+    def test_paragraph_mode_numbers_and_flags(self, mock_call, api_key):
+        mock_call.return_value = '{"approved": false, "critique": "P2 is scary", "score": 5, "flagged_paragraphs": [2, "x", 0]}'
+        judge = StoryJudge(api_key=api_key, by_paragraph=True)
+
+        feedback = judge.evaluate("First.\n\nSecond.")
+
+        assert feedback.flagged_paragraphs == [1]
+        assert "[2] Second." in mock_call.call_args.kwargs["messages"][1]["content"]
+
+    @patch("story_engine.call_llm")
+    def test_incremental_judge_sends_only_changed_paragraphs(self, mock_call, api_key):
+        mock_call.side_effect = [
+            '{"approved": false, "critique": "P3 is scary", "score": 5, "flagged_paragraphs": [3]}',
+            '{"approved": true, "critique": "PASS", "score": 9, "flagged_paragraphs": []}',
+        ]
+        judge = StoryJudge(api_key=api_key, incremental=True)
+        first = "Sam met a fox in the woods.\n\nThey shared berries.\n\nA monster roared!\n\nThey went home."
+        second = first.replace("A monster roared!", "An owl hooted softly.")
+
+        judge.evaluate(first)
+        feedback = judge.evaluate(second)
+
+        delta_prompt = mock_call.call_args.kwargs["messages"][1]["content"]
+        assert "[3] An owl hooted softly." in delta_prompt
+        assert "[1] (unchanged) Sam met a fox" in delta_prompt
+        assert feedback.approved is True
+
+    @patch("story_engine.call_llm")
+    def test_incremental_judge_keeps_unresolved_paragraphs(self, mock_call, api_key):
+        mock_call.side_effect = [
+            '{"approved": false, "critique": "P1 and P4 need work", "score": 4, "flagged_paragraphs": [1, 4]}',
+            '{"approved": true, "critique": "Better", "score": 8, "flagged_paragraphs": []}',
+        ]
+        judge = StoryJudge(api_key=api_key, incremental=True)
+        first = "Bad start.\n\nMiddle one.\n\nMiddle two.\n\nBad end."
+        second = first.replace("Bad end.", "Good end.")
+
+        judge.evaluate(first)
+        feedback = judge.evaluate(second)
+
+        assert feedback.approved is False
+        assert feedback.flagged_paragraphs == [0]
+        assert "Still unresolved" in feedback.critique
+
+    @patch("story_engine.call_llm")
+    def test_incremental_verdicts_are_scoped_to_a_run(self, mock_call, api_key):
+        import contextvars
+
+        mock_call.return_value = '{"approved": false, "critique": "Meh", "score": 5, "flagged_paragraphs": [3]}'
+        judge = StoryJudge(api_key=api_key, incremental=True)
+        first = "Sam met a fox in the woods.\n\nThey shared berries.\n\nA monster roared!\n\nThey went home."
+
+        def run(story):
+            judge.begin_run()
+            judge.evaluate(story)
+            return mock_call.call_args.kwargs["messages"][1]["content"]
+
+        contextvars.copy_context().run(run, first)
+        other_story = contextvars.copy_context().run(run, first.replace("A monster roared!", "An owl hooted."))
+
+        assert "(unchanged)" not in other_story
+
+    @patch("story_engine.call_llm")
+    def test_incremental_judge_full_review_when_mostly_changed(self, mock_call, api_key):
+        mock_call.return_value = '{"approved": false, "critique": "Meh", "score": 5, "flagged_paragraphs": []}'
+        judge = StoryJudge(api_key=api_key, incremental=True)
+
+        judge.evaluate("One.\n\nTwo.\n\nThree.")
+        judge.evaluate("Uno.\n\nDos.\n\nThree.")
+
+        assert "(unchanged)" not in mock_call.call_args.kwargs["messages"][1]["content"]
+
+    @patch("story_engine.call_llm")
+    def test_evaluate_and_revise_returns_revision(self, mock_call, api_key):
+        mock_call.return_value = '{"approved": false, "critique": "Too scary", "score": 4, "revised_story": "Calmer tale"}'
+        judge = StoryJudge(api_key=api_key)
+
+        feedback, revised = judge.evaluate_and_revise("Story")
+
+        assert feedback == StoryFeedback(approved=False, critique="Too scary", score=4)
+        assert revised == "Calmer tale"
+        assert "revised_story" in mock_call.call_args.kwargs["messages"][0]["content"]
+
+    @patch("story_engine.call_llm")
+    def test_evaluate_and_revise_ignores_revision_when_approved(self, mock_call, api_key):
+        mock_call.return_value = '{"approved": true, "critique": "PASS", "score": 9, "revised_story": "x"}'
+        judge = StoryJudge(api_key=api_key)
+
+        feedback, revised = judge.evaluate_and_revise("Story")
+
+        assert feedback.approved is True
+        assert revised is None
+
 
 class TestStoryOrchestrator:
     """Tests for StoryOrchestrator run loop."""
@@ -143,3 +326,720 @@ class TestStoryOrchestrator:
         assert result.iterations == 1
         assert result.final_story == "Draft-1"
         assert result.image_url is None
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_image_failure_keeps_story(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = mock_gen_class.return_value
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "Draft"
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_judge_class.return_value.evaluate.return_value = StoryFeedback(approved=True, critique="PASS", score=9)
+        mock_image_class.return_value.generate_image.side_effect = RuntimeError("DALL-E is down")
+
+        result = StoryOrchestrator(api_key=api_key).run("Request")
+
+        assert result.final_story == "Draft"
+        assert result.image_prompt == "Prompt"
+        assert result.image_url is None
+        assert result.degraded == ["illustration"]
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_exhausted_deadline_degrades_optional_stages(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = mock_gen_class.return_value
+        mock_gen.write_story.return_value = "Draft"
+        mock_judge_class.return_value.evaluate.return_value = StoryFeedback(approved=False, critique="Softer", score=5)
+
+        result = StoryOrchestrator(api_key=api_key).run("Request", retries=2, length="short", deadline=0)
+
+        assert result.final_story == "Draft"
+        assert result.outline == ""
+        assert result.iterations == 0
+        assert result.image_url is None
+        assert result.degraded == ["outline", "review", "illustration"]
+        mock_gen.create_outline.assert_not_called()
+        mock_gen.refine_story.assert_not_called()
+        mock_image_class.return_value.generate_image.assert_not_called()
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_generous_deadline_degrades_nothing(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = mock_gen_class.return_value
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "Draft"
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_judge_class.return_value.evaluate.return_value = StoryFeedback(approved=True, critique="PASS", score=9)
+        mock_image_class.return_value.generate_image.return_value = "https://img"
+
+        result = StoryOrchestrator(api_key=api_key, deadline=600).run("Request", length="short")
+
+        assert result.degraded == []
+        assert result.image_url == "https://img"
+        assert mock_image_class.return_value.generate_image.call_args.kwargs["timeout"] <= 60
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_judge_timeout_keeps_the_draft(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock(writer_temperature=0.85)
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "Draft"
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+        mock_judge_class.return_value = MagicMock(judge_temperature=0.15)
+        mock_judge_class.return_value.evaluate.side_effect = openai.APITimeoutError(request=MagicMock())
+        mock_image_class.return_value.generate_image.return_value = "https://img"
+        stats = JudgeStats()
+
+        orch = StoryOrchestrator(api_key=api_key, deadline=600, adaptive_budget=AdaptiveBudget(stats))
+        result = orch.run("Request", retries=2, length="medium")
+
+        assert result.final_story == "Draft"
+        assert result.feedback.approved is False
+        assert result.feedback_history == []
+        assert result.degraded == ["review"]
+        assert result.image_url == "https://img"
+        mock_gen.refine_story.assert_not_called()
+        assert stats.get(None, "medium", 0.85).runs == 0
+
+    def test_async_follower_survives_cancelled_leader(self, api_key):
+        from single_flight import SingleFlight
+
+        flight = SingleFlight()
+        leader, follower = (AsyncStoryOrchestrator(api_key=api_key, single_flight=flight) for _ in range(2))
+
+        async def stuck(*_):
+            await asyncio.sleep(5)
+
+        async def own(*_):
+            return "follower's own story"
+
+        leader._run, follower._run = stuck, own
+
+        async def main():
+            first = asyncio.ensure_future(leader.run("A fox"))
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(follower.run("A fox"))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(main()) == "follower's own story"
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_single_flight_keys_on_settings_and_variant(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock(api_key=api_key, writer_temperature=0.85)
+        mock_gen.write_story.return_value = "Draft"
+        mock_gen_class.return_value = mock_gen
+        mock_judge_class.return_value = MagicMock(judge_temperature=0.15)
+        mock_judge_class.return_value.evaluate.return_value = StoryFeedback(approved=True, critique="PASS", score=9)
+        flight = MagicMock()
+        flight.do.side_effect = lambda key, fn, cancel=None: (fn(), True)
+        orch = StoryOrchestrator(api_key=api_key, single_flight=flight)
+        preview = MagicMock()
+
+        result = orch.run("A  tiny dragon", genre="Funny", on_text=preview)
+        orch.run("A tiny dragon", genre="Funny")
+        orch.run("A tiny dragon", genre="Funny", variant="session-2")
+        orch.run("A tiny dragon", genre="Calm")
+        orch.incremental_judging = True
+        orch.run("A tiny dragon", genre="Funny")
+        orch.incremental_judging, orch.adaptive_budget = False, AdaptiveBudget(JudgeStats())
+        orch.run("A tiny dragon", genre="Funny")
+
+        keys = [c.args[0] for c in flight.do.call_args_list]
+        assert keys[0] == keys[1]
+        assert len(set(keys)) == 5
+        preview.assert_called_with(result.final_story)
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_adaptive_budget_caps_retries_and_records(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock(writer_temperature=0.85)
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "Draft"
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+        mock_judge = MagicMock(judge_temperature=0.15)
+        mock_judge.evaluate.return_value = StoryFeedback(approved=False, critique="Try again", score=3)
+        mock_judge_class.return_value = mock_judge
+        mock_image_class.return_value.generate_image.return_value = None
+        stats = JudgeStats()
+        budget = AdaptiveBudget(stats, min_samples=0)
+        budget.plan = MagicMock(return_value=JudgePlan(0, 0.05, "test", min_score=7))
+
+        orch = StoryOrchestrator(api_key=api_key, adaptive_budget=budget)
+        result = orch.run("Request", genre="Funny", length="short", retries=3)
+
+        assert result.iterations == 0
+        mock_gen.refine_story.assert_not_called()
+        mock_judge.begin_run.assert_called_once_with(0.05, 7)
+        assert mock_judge.judge_temperature == 0.15
+        budget.plan.assert_called_once_with("Funny", "short", 0.85, 3, 0.15)
+        assert stats.get("Funny", "short", 0.85).runs == 1
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_run_streams_draft_and_refinements(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story_stream.return_value = iter(["Dr", "aft"])
+        mock_gen.refine_story_stream.return_value = iter(["Re", "fined"])
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+
+        mock_judge = MagicMock()
+        mock_judge.evaluate.side_effect = [
+            StoryFeedback(approved=False, critique="Softer", score=4),
+            StoryFeedback(approved=True, critique="PASS", score=9),
+        ]
+        mock_judge_class.return_value = mock_judge
+        mock_image_class.return_value.generate_image.return_value = None
+
+        seen = []
+        orch = StoryOrchestrator(api_key=api_key)
+        result = orch.run("Request", retries=2, on_text=seen.append)
+
+        assert seen == ["Dr", "Draft", "Re", "Refined"]
+        assert result.final_story == "Refined"
+        mock_gen.write_story.assert_not_called()
+        mock_gen.refine_story_stream.assert_called_once_with("Draft", "Softer")
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_parallel_drafts_pick_best(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.side_effect = ["Draft-A", "Draft-B", "Draft-C"]
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+
+        verdicts = {
+            "Draft-A": StoryFeedback(approved=False, critique="Meh", score=5),
+            "Draft-B": StoryFeedback(approved=True, critique="PASS", score=8),
+            "Draft-C": StoryFeedback(approved=True, critique="PASS", score=9),
+        }
+        mock_judge = MagicMock()
+        mock_judge.evaluate.side_effect = lambda draft: verdicts[draft]
+        mock_judge_class.return_value = mock_judge
+        mock_image_class.return_value.generate_image.return_value = None
+
+        orch = StoryOrchestrator(api_key=api_key, parallel_drafts=3)
+        result = orch.run("Request", retries=2)
+
+        assert result.final_story == "Draft-C"
+        assert result.feedback_history == [verdicts["Draft-C"]]
+        assert result.iterations == 0
+        assert mock_gen.write_story.call_count == 3
+        assert all(c.kwargs["cache"] is False for c in mock_gen.write_story.call_args_list)
+        mock_gen.refine_story.assert_not_called()
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_parallel_drafts_refine_best_rejected(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.side_effect = ["Draft-A", "Draft-B"]
+        mock_gen.refine_story.return_value = "Refined"
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+
+        verdicts = {
+            "Draft-A": StoryFeedback(approved=False, critique="Too long", score=6),
+            "Draft-B": StoryFeedback(approved=False, critique="Scary", score=3),
+            "Refined": StoryFeedback(approved=True, critique="PASS", score=9),
+        }
+        mock_judge = MagicMock()
+        mock_judge.evaluate.side_effect = lambda draft: verdicts[draft]
+        mock_judge_class.return_value = mock_judge
+        mock_image_class.return_value.generate_image.return_value = None
+
+        orch = StoryOrchestrator(api_key=api_key, parallel_drafts=2)
+        result = orch.run("Request", retries=2)
+
+        mock_gen.refine_story.assert_called_once_with("Draft-A", "Too long")
+        assert result.final_story == "Refined"
+        assert result.iterations == 1
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_fused_review_halves_round_trips(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "Draft"
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+
+        fail_1 = StoryFeedback(approved=False, critique="Too long", score=4)
+        fail_2 = StoryFeedback(approved=False, critique="Still long", score=5)
+        fail_3 = StoryFeedback(approved=False, critique="Nearly", score=6)
+        mock_judge = MagicMock()
+        mock_judge.evaluate_and_revise.side_effect = [(fail_1, "Draft-1"), (fail_2, "Draft-2")]
+        mock_judge.evaluate.return_value = fail_3
+        mock_judge_class.return_value = mock_judge
+        mock_image_class.return_value.generate_image.return_value = None
+
+        orch = StoryOrchestrator(api_key=api_key, fused_review=True)
+        result = orch.run("Request", retries=2)
+
+        assert result.feedback_history == [fail_1, fail_2, fail_3]
+        assert result.iterations == 2
+        assert result.final_story == "Draft-2"
+        assert [c.args[0] for c in mock_judge.evaluate_and_revise.call_args_list] == ["Draft", "Draft-1"]
+        mock_judge.evaluate.assert_called_once_with("Draft-2")
+        mock_gen.refine_story.assert_not_called()
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_fused_review_falls_back_to_refine(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "Draft"
+        mock_gen.refine_story.return_value = "Refined"
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+
+        fail = StoryFeedback(approved=False, critique="Invalid JSON from judge. Content: ?", score=0)
+        ok = StoryFeedback(approved=True, critique="PASS", score=9)
+        mock_judge = MagicMock()
+        mock_judge.evaluate_and_revise.return_value = (fail, None)
+        mock_judge.evaluate.return_value = ok
+        mock_judge_class.return_value = mock_judge
+        mock_image_class.return_value.generate_image.return_value = None
+
+        result = StoryOrchestrator(api_key=api_key, fused_review=True).run("Request", retries=1)
+
+        mock_gen.refine_story.assert_called_once_with("Draft", fail.critique)
+        assert result.feedback_history == [fail, ok]
+        assert result.final_story == "Refined"
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_paragraph_refine_patches_flagged(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "A.\n\nB.\n\nC."
+        mock_gen.refine_paragraphs.return_value = "A.\n\nB2.\n\nC."
+        mock_gen.refine_story.return_value = "Rewritten"
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+
+        targeted = StoryFeedback(approved=False, critique="B is scary", score=5, flagged_paragraphs=[1])
+        everything = StoryFeedback(approved=False, critique="All wrong", score=2, flagged_paragraphs=[0, 1, 2])
+        ok = StoryFeedback(approved=True, critique="PASS", score=9)
+        mock_judge = MagicMock()
+        mock_judge.evaluate.side_effect = [targeted, everything, ok]
+        mock_judge_class.return_value = mock_judge
+        mock_image_class.return_value.generate_image.return_value = None
+
+        result = StoryOrchestrator(api_key=api_key, paragraph_refine=True).run("Request", retries=2)
+
+        mock_judge_class.assert_called_once_with(
+            judge_temperature=0.15, api_key=api_key, by_paragraph=True, incremental=False, cancel_token=None
+        )
+        mock_gen.refine_paragraphs.assert_called_once_with("A.\n\nB.\n\nC.", "B is scary", (1,))
+        mock_gen.refine_story.assert_called_once_with("A.\n\nB2.\n\nC.", "All wrong")
+        assert result.final_story == "Rewritten"
+        assert result.iterations == 2
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_prejudge_skips_llm_judge_when_decisive(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "The knight drew a knife."
+        mock_gen.refine_story.return_value = "Refined"
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+        ok = StoryFeedback(approved=True, critique="PASS", score=9)
+        mock_judge_class.return_value.evaluate.return_value = ok
+        mock_image_class.return_value.generate_image.return_value = None
+
+        orch = StoryOrchestrator(api_key=api_key, prejudge=True)
+        orch.prejudge = PreJudge(pass_confidence=1.01)  # reject-only, so the refined draft reaches the LLM judge
+        result = orch.run("Request", retries=2)
+
+        first = result.feedback_history[0]
+        assert first.approved is False and "knife" in first.critique
+        mock_gen.refine_story.assert_called_once_with("The knight drew a knife.", first.critique)
+        mock_judge_class.return_value.evaluate.assert_called_once_with("Refined")
+        assert result.feedback_history[1] == ok
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_prejudge_screens_parallel_drafts(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.side_effect = ["The knight drew a knife.", "The knight drew a map."]
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+        ok = StoryFeedback(approved=True, critique="PASS", score=9)
+        mock_judge_class.return_value.evaluate.return_value = ok
+        mock_image_class.return_value.generate_image.return_value = None
+
+        orch = StoryOrchestrator(api_key=api_key, parallel_drafts=2, prejudge=True)
+        orch.prejudge = PreJudge(pass_confidence=1.01)
+        result = orch.run("Request", retries=2)
+
+        mock_judge_class.return_value.evaluate.assert_called_once_with("The knight drew a map.")
+        assert result.final_story == "The knight drew a map."
+        assert result.feedback == ok
+
+    def _converge_mocks(self, mock_gen_class, mock_judge_class, mock_image_class, verdicts, refinements):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "Draft"
+        mock_gen.refine_story.side_effect = refinements
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+        mock_judge_class.return_value.evaluate.side_effect = verdicts
+        mock_image_class.return_value.generate_image.return_value = None
+        return mock_gen
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_converge_stops_on_regression_and_keeps_best(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        verdicts = [
+            StoryFeedback(approved=False, critique="Too long", score=4),
+            StoryFeedback(approved=False, critique="Ending is abrupt", score=7),
+            StoryFeedback(approved=False, critique="Too long again", score=5),
+        ]
+        mock_gen = self._converge_mocks(
+            mock_gen_class, mock_judge_class, mock_image_class, verdicts, ["Draft-1", "Draft-2", "Draft-3"]
+        )
+
+        result = StoryOrchestrator(api_key=api_key, converge=True).run("Request", retries=4)
+
+        assert mock_gen.refine_story.call_count == 2
+        assert result.feedback_history == verdicts
+        assert result.iterations == 2
+        assert result.final_story == "Draft-1"
+        assert result.feedback.score == 7
+        second_critique = mock_gen.refine_story.call_args_list[1].args[1]
+        assert second_critique.startswith("Ending is abrupt")
+        assert "- Too long" in second_critique
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_converge_stops_on_plateau(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        verdicts = [
+            StoryFeedback(approved=False, critique="Meh", score=6),
+            StoryFeedback(approved=False, critique="Still meh", score=6),
+        ]
+        mock_gen = self._converge_mocks(mock_gen_class, mock_judge_class, mock_image_class, verdicts, ["Draft-1"])
+
+        result = StoryOrchestrator(api_key=api_key, converge=True).run("Request", retries=3)
+
+        assert result.iterations == 1
+        assert result.final_story == "Draft-1"  # ties go to the newer draft
+        assert mock_gen.refine_story.call_count == 1
+
+    def _early_mocks(self, mock_gen_class, mock_judge_class, mock_image_class, refined):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "A gentle dragon blows bubbles for the village children."
+        mock_gen.refine_story.return_value = refined
+        mock_gen.illustration_prompt.side_effect = lambda text: f"Prompt for {text[:7]}"
+        mock_gen_class.return_value = mock_gen
+
+        mock_judge = MagicMock()
+        mock_judge.evaluate.side_effect = [
+            StoryFeedback(approved=False, critique="Tweak", score=6),
+            StoryFeedback(approved=True, critique="PASS", score=9),
+        ]
+        mock_judge_class.return_value = mock_judge
+
+        mock_image = MagicMock()
+        mock_image.generate_image.side_effect = lambda prompt, timeout=None: f"https://img/{prompt}"
+        mock_image_class.return_value = mock_image
+        return mock_gen, mock_image
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_early_illustration_reused_after_small_edit(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen, mock_image = self._early_mocks(
+            mock_gen_class, mock_judge_class, mock_image_class,
+            refined="A gentle dragon blows bubbles for all the village children.",
+        )
+
+        result = StoryOrchestrator(api_key=api_key, early_illustration=True).run("Request", retries=2)
+
+        mock_gen.illustration_prompt.assert_called_once_with("Outline")
+        assert mock_image.generate_image.call_count == 1
+        assert result.image_prompt == "Prompt for Outline"
+        assert result.iterations == 1
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_early_illustration_reissued_after_rewrite(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen, mock_image = self._early_mocks(
+            mock_gen_class, mock_judge_class, mock_image_class,
+            refined="Completely different: an owl teaches stars to sing at midnight.",
+        )
+
+        result = StoryOrchestrator(api_key=api_key, early_illustration=True).run("Request", retries=2)
+
+        assert mock_image.generate_image.call_count == 2
+        assert result.image_prompt == "Prompt for Complet"
+        assert result.image_url == "https://img/Prompt for Complet"
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_early_illustration_kept_when_redraw_fails(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen, mock_image = self._early_mocks(
+            mock_gen_class, mock_judge_class, mock_image_class,
+            refined="Completely different: an owl teaches stars to sing at midnight.",
+        )
+        mock_image.generate_image.side_effect = ["https://img/early", RuntimeError("content policy")]
+
+        result = StoryOrchestrator(api_key=api_key, early_illustration=True).run("Request", retries=2)
+
+        assert mock_image.generate_image.call_count == 2
+        assert (result.image_prompt, result.image_url) == ("Prompt for Outline", "https://img/early")
+        assert "illustration" not in result.degraded
+
+
+class TestAsyncStoryEngine:
+    """Tests for the asyncio orchestrator and its agents."""
+
+    @patch("story_engine.acall_llm", new_callable=AsyncMock)
+    def test_async_generator_shares_prompts(self, mock_call, api_key):
+        mock_call.return_value = "Async story"
+        gen = AsyncStoryGenerator(writer_temperature=0.9, api_key=api_key)
+
+        story = asyncio.run(gen.write_story("Request", outline="- beats", genre="🧚 Fairy Tale", length="long"))
+
+        assert story == "Async story"
+        args = mock_call.call_args.kwargs
+        assert args["temperature"] == 0.9
+        assert "🧚 Fairy Tale" in args["messages"][1]["content"]
+
+    @patch("story_engine.acall_llm", new_callable=AsyncMock)
+    def test_async_judge_parses_feedback(self, mock_call, api_key):
+        mock_call.return_value = '{"approved": false, "critique": "Too scary", "score": 3}'
+        judge = AsyncStoryJudge(api_key=api_key)
+
+        feedback = asyncio.run(judge.evaluate("Story"))
+
+        assert feedback == StoryFeedback(approved=False, critique="Too scary", score=3)
+
+    @patch("story_engine.AsyncImageGenerator")
+    @patch("story_engine.AsyncStoryJudge")
+    @patch("story_engine.AsyncStoryGenerator")
+    def test_async_run_matches_sync_result(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline = AsyncMock(return_value="Outline")
+        mock_gen.write_story = AsyncMock(return_value="Draft")
+        mock_gen.refine_story = AsyncMock(return_value="Refined")
+        mock_gen.illustration_prompt = AsyncMock(return_value="Prompt")
+        mock_gen_class.return_value = mock_gen
+
+        feedback_fail = StoryFeedback(approved=False, critique="Needs softer tone", score=4)
+        feedback_pass = StoryFeedback(approved=True, critique="PASS", score=9)
+        mock_judge = MagicMock()
+        mock_judge.evaluate = AsyncMock(side_effect=[feedback_fail, feedback_pass])
+        mock_judge_class.return_value = mock_judge
+
+        mock_image = MagicMock()
+        mock_image.generate_image = AsyncMock(return_value="https://example.com/img.png")
+        mock_image_class.return_value = mock_image
+
+        orch = AsyncStoryOrchestrator(api_key=api_key)
+        result = asyncio.run(orch.run("Request", genre="🐉 Adventure", length="medium", retries=2))
+
+        assert result.final_story == "Refined"
+        assert result.feedback_history == [feedback_fail, feedback_pass]
+        assert result.iterations == 1
+        assert result.image_url == "https://example.com/img.png"
+        mock_gen.refine_story.assert_awaited_once_with("Draft", "Needs softer tone")
+
+
+class TestRunBatch:
+    """Tests for bulk generation with bounded concurrency."""
+
+    def _orchestrator(self, api_key, run):
+        orch = StoryOrchestrator(api_key=api_key)
+        orch.run = run
+        return orch
+
+    def test_yields_every_job_and_isolates_failures(self, api_key):
+        def run(request, retries=2, genre=None, length=None):
+            if request == "boom":
+                raise RuntimeError("rate limited")
+            return f"{request}/{genre}/{length}/{retries}"
+
+        orch = self._orchestrator(api_key, run)
+        jobs = [("a", "😂 Funny", "short", 1), "boom", {"request": "c", "length": "long"}]
+
+        outcomes = sorted(orch.run_batch(jobs, concurrency=2), key=lambda o: o.index)
+
+        assert [o.ok for o in outcomes] == [True, False, True]
+        assert outcomes[0].result == "a/😂 Funny/short/1"
+        assert isinstance(outcomes[1].error, RuntimeError)
+        assert outcomes[2].result == "c/None/long/2"
+
+    def test_respects_concurrency_limit(self, api_key):
+        import threading
+        import time
+
+        lock = threading.Lock()
+        active = {"now": 0, "peak": 0}
+
+        def run(request, retries=2, genre=None, length=None):
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(0.01)
+            with lock:
+                active["now"] -= 1
+            return request
+
+        orch = self._orchestrator(api_key, run)
+        outcomes = list(orch.run_batch((str(i) for i in range(10)), concurrency=3))
+
+        assert len(outcomes) == 10
+        assert active["peak"] <= 3
+
+    def test_malformed_job_reported(self, api_key):
+        orch = self._orchestrator(api_key, lambda request, **_: request)
+
+        outcomes = list(orch.run_batch([("a", None, None, 1, "extra")]))
+
+        assert len(outcomes) == 1
+        assert isinstance(outcomes[0].error, TypeError)
+
+    def test_async_batch_completion_order(self, api_key):
+        async def run(request, retries=2, genre=None, length=None):
+            await asyncio.sleep(0.02 if request == "slow" else 0)
+            if request == "boom":
+                raise RuntimeError("nope")
+            return request
+
+        orch = AsyncStoryOrchestrator(api_key=api_key)
+        orch.run = run
+
+        async def collect():
+            return [o async for o in orch.run_batch(["slow", "fast", "boom"], concurrency=3)]
+
+        outcomes = asyncio.run(collect())
+
+        assert outcomes[-1].result == "slow"
+        assert {o.index for o in outcomes} == {0, 1, 2}
+        assert [o.ok for o in outcomes if o.index == 2] == [False]
+
+
+class TestRunIter:
+    """Tests for progressive stage events."""
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_yields_stage_events_in_order(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "Draft"
+        mock_gen.refine_story.return_value = "Refined"
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+        feedback_fail = StoryFeedback(approved=False, critique="Needs softer tone", score=4)
+        feedback_pass = StoryFeedback(approved=True, critique="PASS", score=9)
+        mock_judge_class.return_value.evaluate.side_effect = [feedback_fail, feedback_pass]
+        mock_image_class.return_value.generate_image.return_value = "https://example.com/img.png"
+
+        events = list(StoryOrchestrator(api_key=api_key).run_iter("Request", genre="🐉 Adventure", length="medium"))
+
+        assert events[:-1] == [
+            OutlineReady("Outline"),
+            DraftReady("Draft"),
+            JudgeVerdict(0, feedback_fail),
+            DraftRefined(1, "Refined"),
+            JudgeVerdict(1, feedback_pass),
+            IllustrationPrompt("Prompt"),
+            ImageReady("https://example.com/img.png"),
+        ]
+        assert isinstance(events[-1], StoryDone)
+        assert events[-1].result.final_story == "Refined"
+
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_failure_raises_from_iterator(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen_class.return_value.create_outline.return_value = "Outline"
+        mock_gen_class.return_value.write_story.side_effect = RuntimeError("boom")
+
+        events = StoryOrchestrator(api_key=api_key).run_iter("Request", length="medium")
+
+        assert next(events) == OutlineReady("Outline")
+        with pytest.raises(RuntimeError, match="boom"):
+            next(events)
+
+    @patch("story_engine.AsyncImageGenerator")
+    @patch("story_engine.AsyncStoryJudge")
+    @patch("story_engine.AsyncStoryGenerator")
+    def test_async_run_iter(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline = AsyncMock(return_value="Outline")
+        mock_gen.write_story = AsyncMock(return_value="Draft")
+        mock_gen.illustration_prompt = AsyncMock(return_value="Prompt")
+        mock_gen_class.return_value = mock_gen
+        feedback_pass = StoryFeedback(approved=True, critique="PASS", score=9)
+        mock_judge_class.return_value.evaluate = AsyncMock(return_value=feedback_pass)
+        mock_image_class.return_value.generate_image = AsyncMock(return_value=None)
+
+        async def collect():
+            return [e async for e in AsyncStoryOrchestrator(api_key=api_key).run_iter("Request", length="medium")]
+
+        events = asyncio.run(collect())
+
+        assert events[:-1] == [
+            OutlineReady("Outline"),
+            DraftReady("Draft"),
+            JudgeVerdict(0, feedback_pass),
+            IllustrationPrompt("Prompt"),
+        ]
+        assert events[-1].result.image_url is None
+        assert events[-1].result.degraded == ["illustration"]
+
+    @patch("story_engine.AsyncImageGenerator")
+    @patch("story_engine.AsyncStoryJudge")
+    @patch("story_engine.AsyncStoryGenerator")
+    def test_async_run_iter_streams_whole_texts(self, mock_gen_class, mock_judge_class, mock_image_class, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline = AsyncMock(return_value="Outline")
+        mock_gen.write_story = AsyncMock(return_value="Draft")
+        mock_gen.refine_story = AsyncMock(return_value="Refined")
+        mock_gen.illustration_prompt = AsyncMock(return_value="Prompt")
+        mock_gen_class.return_value = mock_gen
+        mock_judge_class.return_value.evaluate = AsyncMock(
+            side_effect=[StoryFeedback(approved=False, critique="Softer", score=5), StoryFeedback(approved=True, critique="PASS", score=9)]
+        )
+        mock_image_class.return_value.generate_image = AsyncMock(return_value=None)
+
+        async def collect():
+            orch = AsyncStoryOrchestrator(api_key=api_key)
+            return [e async for e in orch.run_iter("Request", retries=1, length="medium", stream=True)]
+
+        events = asyncio.run(collect())
+
+        assert [e.text for e in events if isinstance(e, StoryText)] == ["Draft", "Refined"]
+        assert events[-1].result.final_story == "Refined"
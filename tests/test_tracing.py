@@ -0,0 +1,146 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from stage_graph import Stage, run_stages
+from story_engine import StoryFeedback, StoryOrchestrator, call_llm
+from tracing import CallSpan, FileSink, MetricsRegistry, Trace, carry_context, record_call, use_trace
+
+
+def _response(text, prompt_tokens, completion_tokens):
+    resp = MagicMock()
+    resp.choices = [MagicMock()]
+    resp.choices[0].message.content = text
+    resp.usage.prompt_tokens = prompt_tokens
+    resp.usage.completion_tokens = completion_tokens
+    return resp
+
+
+class TestTrace:
+    """Tests for spans, cost and context propagation."""
+
+    def test_cost_uses_model_prices(self):
+        span = CallSpan(stage="story", model="gpt-4o-mini", wall=1.0, prompt_tokens=1_000_000, completion_tokens=1_000_000)
+
+        assert span.cost == pytest.approx(0.75)
+        assert CallSpan(stage="story", model="gpt-4o-mini", wall=0.0, prompt_tokens=10, cached=True).cost == 0.0
+        assert CallSpan(stage="image", model="dall-e-3", wall=5.0).cost == pytest.approx(0.04)
+
+    def test_spans_follow_context_into_worker_threads(self):
+        trace = Trace()
+        with use_trace(trace):
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                list(pool.map(carry_context(lambda i: record_call(CallSpan(stage=f"s{i}", model="m", wall=0.0))), range(2)))
+            record_call(CallSpan(stage="main", model="m", wall=0.0))
+        record_call(CallSpan(stage="outside", model="m", wall=0.0))
+
+        assert sorted(trace.by_stage()) == ["main", "s0", "s1"]
+
+    def test_run_stages_records_timings(self):
+        timings = {}
+        trace = Trace()
+        with use_trace(trace):
+            run_stages(
+                [Stage("a", lambda r: record_call(CallSpan(stage="a", model="m", wall=0.0))), Stage("b", lambda r: 1, after=("a",))],
+                timings=timings,
+            )
+
+        assert set(timings) == {"a", "b"}
+        assert [c.stage for c in trace.calls] == ["a"]
+
+    @patch("story_engine.get_cache", return_value=None)
+    @patch("story_engine._client")
+    def test_call_llm_records_usage(self, mock_client_fn, _mock_cache, api_key):
+        client = MagicMock()
+        client.chat.completions.create.return_value = _response("Once upon a time", 120, 30)
+        mock_client_fn.return_value = client
+
+        trace = Trace()
+        with use_trace(trace):
+            call_llm([{"role": "user", "content": "hi"}], api_key=api_key, stage="story")
+
+        [span] = trace.calls
+        assert span.stage == "story"
+        assert span.model == client.chat.completions.create.call_args.kwargs["model"]
+        assert (span.prompt_tokens, span.completion_tokens) == (120, 30)
+        assert span.error is None
+
+    @patch("story_engine.get_cache", return_value=None)
+    @patch("story_engine._client")
+    def test_call_llm_records_errors(self, mock_client_fn, _mock_cache, api_key):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = ValueError("bad request")
+        mock_client_fn.return_value = client
+
+        trace = Trace()
+        with use_trace(trace), pytest.raises(ValueError):
+            call_llm([{"role": "user", "content": "hi"}], api_key=api_key, stage="judge")
+
+        assert trace.calls[0].error == "ValueError"
+
+
+class TestExporters:
+    """Tests for the metrics registry and file sink."""
+
+    def _trace(self, walls):
+        trace = Trace(stages={"review": sum(walls)}, wall=sum(walls) + 1)
+        for wall in walls:
+            trace.add_call(CallSpan(stage="judge", model="gpt-4o-mini", wall=wall, prompt_tokens=100, completion_tokens=10))
+        return trace
+
+    def test_quantiles_per_stage(self):
+        metrics = MetricsRegistry()
+        metrics.export(self._trace([float(i) for i in range(1, 101)]))
+
+        q = metrics.quantiles("judge")
+        assert q[0.5] == pytest.approx(50.0, abs=1)
+        assert q[0.95] == pytest.approx(95.0, abs=1)
+        assert q[0.99] == pytest.approx(99.0, abs=1)
+        assert metrics.quantiles("pipeline:review")[0.5] == pytest.approx(5050.0)
+
+    def test_prometheus_text(self):
+        metrics = MetricsRegistry()
+        metrics.export(self._trace([1.0, 2.0]))
+
+        text = metrics.prometheus_text()
+        assert 'story_stage_seconds{stage="judge",quantile="0.95"} 2.000000' in text
+        assert 'story_prompt_tokens_total{stage="judge"} 200' in text
+        assert 'story_runs_total{stage="run"} 1' in text
+
+    def test_file_sink_appends_json_lines(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        sink = FileSink(str(path))
+        sink.export(self._trace([1.0]))
+        sink.export(self._trace([2.0]))
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert len(lines) == 2
+        assert lines[1]["calls"][0]["wall"] == 2.0
+        assert lines[0]["prompt_tokens"] == 100
+
+
+class TestOrchestratorTrace:
+    """Tests that a run attaches and exports its trace."""
+
+    @patch("story_engine.export_trace")
+    @patch("story_engine.ImageGenerator")
+    @patch("story_engine.StoryJudge")
+    @patch("story_engine.StoryGenerator")
+    def test_run_attaches_trace(self, mock_gen_class, mock_judge_class, mock_image_class, mock_export, api_key):
+        mock_gen = MagicMock()
+        mock_gen.create_outline.return_value = "Outline"
+        mock_gen.write_story.return_value = "Draft"
+        mock_gen.illustration_prompt.return_value = "Prompt"
+        mock_gen_class.return_value = mock_gen
+        mock_judge = MagicMock()
+        mock_judge.evaluate.return_value = StoryFeedback(approved=True, critique="PASS", score=9)
+        mock_judge_class.return_value = mock_judge
+        mock_image_class.return_value.generate_image.return_value = "https://example.com/img.png"
+
+        result = StoryOrchestrator(api_key=api_key).run("Request", genre="🐉 Adventure", length="medium")
+
+        assert set(result.trace.stages) == {"outline", "review", "illustration"}
+        assert result.trace.wall >= max(result.trace.stages.values())
+        mock_export.assert_called_once_with(result.trace)
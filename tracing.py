@@ -0,0 +1,245 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Protocol, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# USD per 1M (prompt, completion) tokens; images are priced per call.
+TOKEN_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+IMAGE_PRICES: Dict[str, float] = {"dall-e-3": 0.04}
+
+
+@dataclass
+class CallSpan:
+    """One API call (or response-cache hit) made while running a stage."""
+
+    stage: str
+    model: str
+    wall: float
+    queue_wait: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+    cached: bool = False
+    error: Optional[str] = None
+
+    @property
+    def cost(self) -> float:
+        if self.cached:
+            return 0.0
+        if self.model in IMAGE_PRICES:
+            return 0.0 if self.error else IMAGE_PRICES[self.model]
+        prompt_price, completion_price = TOKEN_PRICES.get(self.model, (0.0, 0.0))
+        return (self.prompt_tokens * prompt_price + self.completion_tokens * completion_price) / 1_000_000
+
+
+@dataclass
+class Trace:
+    """Structured record of one orchestrator run: wall time per pipeline stage and every call made."""
+
+    stages: Dict[str, float] = field(default_factory=dict)
+    calls: List[CallSpan] = field(default_factory=list)
+    wall: float = 0.0
+
+    def add_call(self, span: CallSpan) -> None:
+        # list.append is atomic, and a lock would stop results from being deep-copied.
+        self.calls.append(span)
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(c.prompt_tokens for c in self.calls)
+
+    @property
+    def completion_tokens(self) -> int:
+        return sum(c.completion_tokens for c in self.calls)
+
+    @property
+    def cost(self) -> float:
+        return sum(c.cost for c in self.calls)
+
+    def by_stage(self) -> Dict[str, List[CallSpan]]:
+        grouped: Dict[str, List[CallSpan]] = defaultdict(list)
+        for span in self.calls:
+            grouped[span.stage].append(span)
+        return dict(grouped)
+
+    def to_dict(self) -> dict:
+        return {
+            "wall": self.wall,
+            "stages": dict(self.stages),
+            "calls": [dict(asdict(c), cost=c.cost) for c in self.calls],
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost": self.cost,
+        }
+
+
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("story_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def use_trace(trace: Trace) -> Iterator[Trace]:
+    """Send spans recorded in this context (and threads started with its copy) to ``trace``."""
+    token = _current.set(trace)
+    started = time.monotonic()
+    try:
+        yield trace
+    finally:
+        trace.wall = time.monotonic() - started
+        _current.reset(token)
+
+
+def carry_context(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap ``fn`` so each call, e.g. on a worker thread, runs in a copy of the caller's context."""
+    context = contextvars.copy_context()
+    return lambda *args: context.copy().run(fn, *args)
+
+
+def record_call(span: CallSpan) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.add_call(span)
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class Exporter(Protocol):
+    def export(self, trace: Trace) -> None:
+        ...
+
+
+class MetricsRegistry:
+    """Aggregates traces into per-stage latency/token/cost series and renders Prometheus text."""
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latency: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._counters: Dict[Tuple[str, str], float] = defaultdict(float)
+
+    def export(self, trace: Trace) -> None:
+        with self._lock:
+            self._latency["run"].append(trace.wall)
+            self._counters[("run", "runs")] += 1
+            for name, wall in trace.stages.items():
+                self._latency[f"pipeline:{name}"].append(wall)
+            for span in trace.calls:
+                self._latency[span.stage].append(span.wall)
+                self._counters[(span.stage, "calls")] += 1
+                self._counters[(span.stage, "prompt_tokens")] += span.prompt_tokens
+                self._counters[(span.stage, "completion_tokens")] += span.completion_tokens
+                self._counters[(span.stage, "retries")] += span.retries
+                self._counters[(span.stage, "queue_wait_seconds")] += span.queue_wait
+                self._counters[(span.stage, "cost_usd")] += span.cost
+                self._counters[(span.stage, "cache_hits")] += int(span.cached)
+                self._counters[(span.stage, "errors")] += int(span.error is not None)
+
+    def quantiles(self, stage: str) -> Dict[float, float]:
+        with self._lock:
+            values = sorted(self._latency.get(stage, ()))
+        return {q: _quantile(values, q) for q in self.QUANTILES}
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            latency = {stage: sorted(values) for stage, values in self._latency.items()}
+            counters = dict(self._counters)
+        lines = [
+            "# HELP story_stage_seconds Wall time per stage (recent window).",
+            "# TYPE story_stage_seconds summary",
+        ]
+        for stage, values in sorted(latency.items()):
+            for q in self.QUANTILES:
+                lines.append(f'story_stage_seconds{{stage="{stage}",quantile="{q}"}} {_quantile(values, q):.6f}')
+            lines.append(f'story_stage_seconds_count{{stage="{stage}"}} {len(values)}')
+            lines.append(f'story_stage_seconds_sum{{stage="{stage}"}} {sum(values):.6f}')
+        names = sorted({name for _, name in counters})
+        for name in names:
+            lines.append(f"# TYPE story_{name}_total counter")
+            for (stage, counter), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append(f'story_{name}_total{{stage="{stage}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+
+class FileSink:
+    """Appends each trace as one JSON line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        line = json.dumps(trace.to_dict())
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+
+
+_metrics = MetricsRegistry()
+_exporters: List[Exporter] = [_metrics]
+if os.getenv("TRACE_PATH"):
+    _exporters.append(FileSink(os.environ["TRACE_PATH"]))
+
+
+def get_metrics() -> MetricsRegistry:
+    return _metrics
+
+
+def add_exporter(exporter: Exporter) -> None:
+    _exporters.append(exporter)
+
+
+def remove_exporter(exporter: Exporter) -> None:
+    if exporter in _exporters:
+        _exporters.remove(exporter)
+
+
+def export_trace(trace: Trace) -> None:
+    for exporter in list(_exporters):
+        try:
+            exporter.export(trace)
+        except Exception:
+            pass  # metrics must never fail a story
+
+
+def start_metrics_server(port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``get_metrics().prometheus_text()`` at /metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = _metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server